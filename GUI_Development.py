@@ -23,9 +23,38 @@ from tkinter import filedialog, messagebox, simpledialog
 from tkinter import ttk
 from tkinter import *
 from tkinter.ttk import *
+import argparse
+import filecmp
+import fnmatch
 import os
-import string
 import shutil
+import string
+import sys
+import zipfile
+
+from YSF_Model_Tools import check_model_geometry, coarse_model_filename, generate_coarse_models, \
+    collision_model_filename, generate_collision_models, compact_model_files, weld_model_files, \
+    fingerprint_model_files, find_duplicate_models
+from YSF_Install_Tools import InstallIndex, find_folder, find_lst_files, read_dat_identify
+from YSF_Pack_Tools import read_assembled_pack, link_file, remove_stale_files, find_mod_folder, replace_lst_lines, \
+    find_output_owners
+from YSF_DAT_Tools import write_dat_identify, read_variant_table, generate_dat_variants, DatTable, \
+    VARIANT_FILE_COLUMN, BALANCE_KEYS
+from YSF_Patch_Tools import make_patch, apply_patch
+from YSF_Build_Tools import AssemblyJournal, BuildPlan, copy_and_hash, discard_staging, finish_staging, format_size, \
+    hash_file, link_or_copy, plan_volumes, read_manifest, staging_folder_path, write_manifest, verify_pack, \
+    MANIFEST_SUFFIX
+from YSF_Source_Files import copy_source, is_archive, list_archive_members, \
+    make_archive_path, open_source, source_directory, source_exists, split_archive_path
+from YSF_Scenery_Tools import read_scenery_files, check_start_positions, check_placement_overlaps, ReferenceIndex
+from YSF_Pairing_Tools import ModelFileIndex, MODEL_SLOTS
+
+
+# Command line options that run a tool instead of opening the GUI.
+COMMAND_LINE_TOOLS = ('--build-entries', '--make-patch', '--apply-patch', '--dat-table', '--verify', '-h', '--help')
+
+# Prefix of the LST file names of each LST type. YSFlight loads the LST files whose names start with these.
+LST_FILE_PREFIXES = {'Aircraft': 'air', 'Ground': 'gro', 'Scenery': 'sce'}
 
 
 def main():
@@ -88,7 +117,7 @@ class PackBuilderGUI(Frame):
 
         # Define the the lst options
         self.lst_types = ['Aircraft', 'Ground', 'Scenery']  # validate mode inputs into functions
-        self.lst_file_prefixes = ['air', 'gnd', 'sce']  # Validate which lst file we are importing or exporting.
+        self.lst_file_prefixes = [LST_FILE_PREFIXES[lst_type] for lst_type in self.lst_types]  # Validate which lst file we are importing or exporting.
         self.current_mode = 'Aircraft'  # A variable to hold the shortened name of the tab currently displayed
         
         # Define the filetype options for the file selection gui, based on the allowable filetypes.
@@ -138,6 +167,13 @@ class PackBuilderGUI(Frame):
         self.setting_types = dict()
         self.build_default_settings()
 
+        # Index of the names installed in the YSFlight folder selected in the settings, loaded when first needed.
+        self.install_index = None
+
+        # File name index of the model files in the working directory, used to suggest the model files of a DAT file.
+        # It is built in the background once the settings are read.
+        self.model_file_index = ModelFileIndex()
+
         # Define variables that should move to a settings file.
         self.ask_before_delete_lst = IntVar(value=1)
 
@@ -155,6 +191,7 @@ class PackBuilderGUI(Frame):
         self.sce_listbox = None
         self.listbox_selection_mode = 'SINGLE'
         self.read_settings()  # Will create default settings dict if settings file not found.
+        self.index_model_folder(self.settings['working_directory'])
         # self.load_pack_configuration()
         self.gui_setup()
 
@@ -246,6 +283,7 @@ class PackBuilderGUI(Frame):
         # Assign class variables based on updated settings.
         self.WorkingDirectory.set(self.settings['working_directory'])
         self.UserName.set(self.settings['user_name'])
+        self.index_model_folder(self.settings['working_directory'])
 
     def build_default_settings(self):
         """Have a function to define all of the default settings"""
@@ -253,13 +291,45 @@ class PackBuilderGUI(Frame):
                               'preview_char_width': int,
                               'working_directory': os.PathLike,
                               'user_name': str,
-                              'ask_before_entry_removal': int}
+                              'ask_before_entry_removal': int,
+                              'check_model_geometry': int,
+                              'suggest_model_files': int,
+                              'generate_coarse_models': int,
+                              'coarse_target_polygons': int,
+                              'collision_face_budget': int,
+                              'compact_models': int,
+                              'minify_dats': int,
+                              'model_precision': int,
+                              'weld_models': int,
+                              'weld_tolerance': float,
+                              'check_scenery_files': int,
+                              'check_scenery_references': int,
+                              'placement_overlap_distance': float,
+                              'volume_size_mb': float,
+                              'duplicate_similarity': float,
+                              'ysflight_directory': os.PathLike}
 
         self.settings = {'preview_num_rows':15,
                          'preview_char_width':30,
                          'working_directory':os.path.normpath(os.sep),
                          'user_name':self.default_username,
-                         'ask_before_entry_removal':  1   # True / Yes = 1, False / No = 0
+                         'ask_before_entry_removal':  1,   # True / Yes = 1, False / No = 0
+                         'check_model_geometry': 1,  # Compare DAT positions against the models during validation
+                         'suggest_model_files': 1,  # Suggest the model files of a DAT file when it is selected
+                         'generate_coarse_models': 0,  # Generate coarse models for entries without one when exporting
+                         'coarse_target_polygons': 300,  # Face budget for generated coarse models
+                         'collision_face_budget': 64,  # Face budget for generated collision models
+                         'compact_models': 0,  # Re-encode DNM and SRF files with compact coordinates when exporting
+                         'minify_dats': 0,  # Strip comments, blank lines and padding from DAT files when exporting
+                         'model_precision': 4,  # Decimals kept for coordinates when compacting models
+                         'weld_models': 0,  # Weld coincident vertices and remove unused vertices when exporting
+                         'weld_tolerance': 0.0005,  # Distance in meters below which vertices are welded
+                         'check_scenery_files': 1,  # Check the structure of FLD files during validation
+                         'check_scenery_references': 1,  # Check the names used by FLD and YFS files during validation
+                         'placement_overlap_distance': 1.0,  # Ground objects closer than this in meters overlap
+                         'volume_size_mb': 0.0,  # Split exported packs into volumes of at most this size, 0 to not split
+                         'duplicate_similarity': 0.8,  # Share of faces two models need in common to be near duplicates
+                         'ysflight_directory': ""  # YSFlight installation to check for name collisions, if any
                          }
 
     def write_settings(self):
@@ -280,8 +350,9 @@ class PackBuilderGUI(Frame):
         with open(os.path.join(self.settings_directory, "settings.cfg"), mode='r') as settings_file:
             lines = settings_file.readlines()
 
-        # Skip the header and the version number
-        self.settings = dict()
+        # Skip the header and the version number. Start from the defaults so that settings added in newer versions
+        # of the tool are defined even if an older settings file does not have them.
+        self.build_default_settings()
         lines = lines[2:]
         for line in lines:
             key, value = line[:-1].split(self.pack_save_config_delimiter)
@@ -292,6 +363,8 @@ class PackBuilderGUI(Frame):
                         self.settings[key] = bool(value)
                     elif output_type is int:
                         self.settings[key] = int(value)
+                    elif output_type is float:
+                        self.settings[key] = float(value)
                     elif output_type is os.PathLike:
                         self.settings[key] = os.path.normpath(value)
                     elif output_type is str:
@@ -319,6 +392,10 @@ class PackBuilderGUI(Frame):
         FileMenu.add_command(label="New Project", command=self.new_pack_configuration)
         FileMenu.add_command(label="Open Project", command=self.load_pack_configuration)
         FileMenu.add_command(label="Save Project", command=self.save_pack_configuration)
+        FileMenu.add_command(label="Import Assembled Pack", command=self.import_assembled_pack)
+        FileMenu.add_separator()
+        FileMenu.add_command(label="Make Update Patch", command=self.make_update_patch)
+        FileMenu.add_command(label="Apply Update Patch", command=self.apply_update_patch)
         FileMenu.add_separator()
         FileMenu.add_command(label="Quit {}".format(self.title), command=self.quit_program)
         MenuBar.add_cascade(label="File", menu=FileMenu)
@@ -326,10 +403,19 @@ class PackBuilderGUI(Frame):
         # Set up the Edit Menu
         EditMenu = Menu(MenuBar, tearoff=0)
         EditMenu.add_command(label="Export Pack", command=self.assemble_pack)
+        EditMenu.add_command(label="Show Build Plan (Dry Run)", command=self.show_build_plan)
+        EditMenu.add_command(label="Deploy Pack to YSFlight (Linked)", command=self.deploy_pack)
+        EditMenu.add_command(label="Build Selected Into Existing Pack", command=self.build_selected_entries)
         EditMenu.add_command(label="Validate Pack", command=self.validate_pack_structure)
+        EditMenu.add_command(label="Verify Assembled Pack", command=self.verify_assembled_pack)
+        EditMenu.add_command(label="Export DAT Parameter Table", command=self.export_dat_table)
+        EditMenu.add_separator()
+        EditMenu.add_command(label="Generate Collision Models for Selected", command=self.generate_selected_collision_models)
+        EditMenu.add_command(label="Find Near-Duplicate Models", command=self.report_duplicate_models)
         EditMenu.add_separator()
         EditMenu.add_command(label="Edit LST Entry", command=lambda: self.copy_edit_lst_entry('edit'))
         EditMenu.add_command(label="Copy LST Entry", command=lambda: self.copy_edit_lst_entry('copy'))
+        EditMenu.add_command(label="Generate Variants of Selected Entry", command=self.generate_variants)
         EditMenu.add_separator()
         EditMenu.add_command(label="Move Selected LST Entry Up", command=lambda: self.move_selected_lst_entry('up'))
         EditMenu.add_command(label="Move Selected LST Entry Down", command=lambda: self.move_selected_lst_entry('down'))
@@ -746,8 +832,138 @@ class PackBuilderGUI(Frame):
             for idx in remove_indexes:
                 self.sce_listbox.delete(idx)
 
-    def validate_pack_structure(self):
+    def generate_selected_collision_models(self):
+        """Generate convex hull collision models for the selected aircraft or ground object LST entries.
+
+        The collision models are written next to each entry's visual model, or next to the zip archive holding it, and
+        the entries are updated to use them.
+        """
+        if self.current_mode == 'Aircraft':
+            listbox = self.air_listbox
+        elif self.current_mode == 'Ground':
+            listbox = self.gnd_listbox
+        else:
+            messagebox.showinfo(parent=self.parent,
+                                title="Collision Models",
+                                message="Collision models can only be generated for aircraft and ground objects.")
+            return
+
+        current_entries = listbox.get(0, END)
+        selected_names = [current_entries[idx] for idx in listbox.curselection()]
+        if len(selected_names) == 0:
+            return
+
+        # Entries that share a visual model share the collision model.
+        jobs = dict()
+        for name in selected_names:
+            visual_model = self.lst_entries[self.current_mode][name].Visual_Model
+            if visual_model and visual_model not in jobs:
+                jobs[visual_model] = os.path.join(source_directory(visual_model), collision_model_filename(visual_model))
+
+        existing = [path for path in jobs.values() if os.path.exists(path)]
+        if len(existing) > 0:
+            msg = "The following collision models already exist:\n"
+            for path in existing:
+                msg += "\n{}".format(os.path.basename(path))
+            msg += "\n\nDo you want to overwrite them?"
+            answer = messagebox.askyesno(parent=self.parent, title="Overwrite Collision Models?", message=msg,
+                                         default='no')
+            if not answer:
+                return
+
+        results = generate_collision_models(list(jobs.items()), int(self.settings['collision_face_budget']))
+
+        generated = dict()
+        failed = list()
+        for source, output, result in results:
+            if isinstance(result, Exception):
+                failed.append("\n{}: {}".format(os.path.basename(source), result))
+            else:
+                generated[source] = output
+                print("Generated collision model {} ({} vertices -> {} faces)".format(os.path.basename(output), *result))
+
+        for name in selected_names:
+            instance = self.lst_entries[self.current_mode][name]
+            if instance.Visual_Model in generated:
+                instance.Collision = generated[instance.Visual_Model]
+                self.unsaved_data = True
+
+        msg = "Generated {} collision model(s).".format(len(generated))
+        if len(failed) > 0:
+            msg += "\n\nThe following collision models could not be generated:" + "".join(failed)
+        messagebox.showinfo(parent=self.parent, title="Collision Models", message=msg)
+
+    def report_duplicate_models(self):
+        """Find the DNM and SRF files in the working directory whose geometry is identical or nearly identical, and
+        suggest a shared base model for each group.
+
+        Models that only differ in colours (ex: liveries) can be replaced by the base model when the colours are not
+        needed, and the report lists the LST entries using each model so that they can be pointed at the base model.
+        """
+        working_directory = self.WorkingDirectory.get()
+        archive_path = split_archive_path(working_directory)[0]
+        if is_archive(archive_path):
+            model_paths = [make_archive_path(archive_path, member)
+                           for member in list_archive_members(archive_path, ['dnm', 'srf'])]
+        else:
+            model_paths = list()
+            for folder, _, filenames in os.walk(working_directory):
+                model_paths.extend(os.path.join(folder, filename) for filename in filenames
+                                   if filename.lower().endswith(('.dnm', '.srf')))
+        if len(model_paths) < 2:
+            messagebox.showinfo(parent=self.parent, title="Near-Duplicate Models",
+                                message="Found fewer than two models in {}.".format(working_directory))
+            return
+
+        fingerprints = dict()
+        failed = list()
+        for path, result in fingerprint_model_files(sorted(model_paths)):
+            if isinstance(result, Exception):
+                failed.append("{}: {}".format(os.path.relpath(path, working_directory), result))
+            else:
+                fingerprints[path] = result
+        clusters = find_duplicate_models(fingerprints, float(self.settings['duplicate_similarity']))
+
+        # LST entries using each model, so the report shows which entries could share the base model.
+        users = dict()
+        for lst_type in ['Aircraft', 'Ground']:
+            for key, class_instance in self.lst_entries[lst_type].items():
+                for slot, path in class_instance.return_paths().items():
+                    if path and slot != 'DAT':
+                        users.setdefault(os.path.normcase(os.path.abspath(path)), list()).append(key)
+
+        def describe(path):
+            text = os.path.relpath(path, working_directory)
+            entries = users.get(os.path.normcase(os.path.abspath(path)), list())
+            if entries:
+                text += " (used by {})".format(", ".join(entries))
+            return text
+
+        kinds = {'identical': "identical file", 'geometry': "same geometry, other colours", 'similar': "similar"}
+        report = list()
+        if len(failed) > 0:
+            report += ["The following models could not be read:"] + failed + [""]
+        for cluster in clusters:
+            report.append("Base model: {}".format(describe(cluster['base'])))
+            for path, kind, similarity in cluster['members']:
+                report.append("    {}: {}, {:.0%} of faces shared".format(describe(path), kinds[kind], similarity))
+            report.append("    Reusable: {}".format(format_size(cluster['reusable_bytes'])))
+            report.append("")
+
+        summary = "Checked {} models and found {} group(s) of near-duplicate models.".format(len(fingerprints),
+                                                                                           len(clusters))
+        if len(clusters) > 0:
+            summary += " Sharing the base models could save up to {}.".format(
+                format_size(sum(cluster['reusable_bytes'] for cluster in clusters)))
+        print(summary + "\n" + "\n".join(report))
+        messagebox.showinfo(parent=self.parent, title="Near-Duplicate Models", message=shorten_report(summary, report))
+
+    def validate_pack_structure(self, ignore_lst_files=()):
         """Validate that filepaths still exist and that IDENTIFY and SCENERY NAMEs are unique
+
+        Inputs
+        ignore_lst_files (list): names of installed LST files to leave out of the installation name check, so that a
+                                 previous deployment of the same pack does not collide with itself.
         """
 
         # Ensure that all of the files in the air, ground, and scenery lst classes exist. If they do not, compile a report.
@@ -759,7 +975,7 @@ class PackBuilderGUI(Frame):
                 filepaths = class_instance.return_paths()
                 for file_type, path in filepaths.items():
                     if path:  # Ignore empty strings for non-defined files.
-                        if os.path.isfile(path) is False:
+                        if source_exists(path) is False:
                             missing_files.append([lst_type, key, file_type, path])
 
         # Alert the user if the pack structure is invalid due to missing files.
@@ -802,8 +1018,209 @@ class PackBuilderGUI(Frame):
             # TODO: Write Duplcate Name Log
             return False
 
+        # Verify that the names do not collide with content that is already installed in YSFlight.
+        if self.settings['ysflight_directory']:
+            if self.validate_install_collisions(ignore_lst_files) is False:
+                return False
+
+        # Optionally compare the DAT gear, cockpit and hit radius values against the models.
+        if int(self.settings['check_model_geometry']) == 1:
+            if self.validate_model_geometry() is False:
+                return False
+
+        # Optionally check the block structure of the scenery FLD files and the names they and the YFS files use.
+        if int(self.settings['check_scenery_files']) == 1 or int(self.settings['check_scenery_references']) == 1:
+            if self.validate_scenery_files() is False:
+                return False
+
         return True
 
+    def load_install_index(self):
+        """Load the saved index of the YSFlight installation and refresh it with the files that changed since.
+
+        Outputs
+        index (InstallIndex): index of the installation, or None if the installation folder does not exist.
+        """
+        install_directory = self.settings['ysflight_directory']
+        if not install_directory or os.path.isdir(install_directory) is False:
+            return None
+
+        index_file_path = os.path.join(self.settings_directory, "install_index.json")
+        if self.install_index is None or self.install_index.install_directory != os.path.normpath(install_directory):
+            self.install_index = InstallIndex.load(index_file_path, install_directory)
+
+        num_read = self.install_index.refresh()
+        if num_read > 0:
+            print("Read {} changed LST and DAT files from {}".format(num_read, install_directory))
+            try:
+                self.install_index.save(index_file_path)
+            except OSError:
+                print("Could not save the YSFlight installation index to {}".format(index_file_path))
+        return self.install_index
+
+    def validate_install_collisions(self, ignore_lst_files=()):
+        """Check the pack's IDENTIFY and map names against the content installed in YSFlight.
+
+        The pack may already be installed from a previous export, so the user can choose to continue.
+
+        Inputs
+        ignore_lst_files (list): names of installed LST files whose entries are not checked
+
+        Outputs
+        (bool): False if the user chose to stop because of the reported collisions.
+        """
+        index = self.load_install_index()
+        if index is None:
+            messagebox.showwarning(parent=self.parent,
+                                   title="YSFlight Folder Not Found",
+                                   message="Could not find the YSFlight folder {}. Skipping the check against the "
+                                           "installed aircraft, ground objects and sceneries.".format(
+                                       self.settings['ysflight_directory']))
+            return True
+
+        msg = ""
+        for lst_type in self.lst_types:
+            for key, instance in self.lst_entries[lst_type].items():
+                name = instance.map_name.replace(" ", "_") if lst_type == 'Scenery' else instance.IDENTIFY
+                for installed_name, source in index.lookup(lst_type, name, ignore_lst_files):
+                    msg += "\n{} - {} is already installed as {} ({})".format(lst_type, key, installed_name, source)
+
+        if len(msg) == 0:
+            return True
+
+        msg = "Found the following names that are already used in YSFlight:\n" + msg
+        msg += "\n\nDo you want to continue anyway?"
+        return messagebox.askyesno(parent=self.parent,
+                                   title="Installed Name Collisions Detected",
+                                   message=msg,
+                                   default='no')
+
+    def validate_model_geometry(self):
+        """Check the aircraft and ground object DAT positions against their collision and visual models.
+
+        Geometry problems do not stop the game from loading the pack, so the user can choose to continue.
+
+        Outputs
+        (bool): False if the user chose to stop because of the reported problems.
+        """
+        entries = list()
+        for lst_type in ['Aircraft', 'Ground']:
+            for key, class_instance in self.lst_entries[lst_type].items():
+                entries.append(["{} - {}".format(lst_type, key), lst_type, class_instance.DAT,
+                                class_instance.Visual_Model, class_instance.Collision])
+
+        issues = check_model_geometry(entries)
+        if len(issues) == 0:
+            return True
+
+        msg = "Found the following possible geometry problems:\n"
+        for name, issue in issues:
+            msg += "\n{}: {}".format(name, issue)
+        msg += "\n\nDo you want to continue anyway?"
+        return messagebox.askyesno(parent=self.parent,
+                                   title="Model Geometry Problems Detected",
+                                   message=msg,
+                                   default='no')
+
+    def validate_scenery_files(self):
+        """Read the FLD, STP and YFS files of the scenery entries in parallel and report structural problems, start
+        positions that do not fit the field and names that are not defined by the pack.
+
+        Broken FLD files and missing objects are only detected by the game when the map is loaded, so the user can
+        choose to continue.
+
+        Outputs
+        (bool): False if the user chose to stop because of the reported problems.
+        """
+        fld_keys = [key for key, class_instance in self.lst_entries['Scenery'].items() if class_instance.Map]
+        yfs_keys = [key for key, class_instance in self.lst_entries['Scenery'].items() if class_instance.Mission]
+        stp_keys = [key for key in fld_keys if self.lst_entries['Scenery'][key].Start_Position]
+        if int(self.settings['check_scenery_files']) == 0:
+            stp_keys = list()
+        summaries, missions, start_positions = read_scenery_files(
+            [self.lst_entries['Scenery'][key].Map for key in fld_keys],
+            [self.lst_entries['Scenery'][key].Mission for key in yfs_keys],
+            [self.lst_entries['Scenery'][key].Start_Position for key in stp_keys])
+
+        msg = ""
+        info = ""
+        if int(self.settings['check_scenery_files']) == 1:
+            for key, summary in zip(fld_keys, summaries):
+                print(summary.report())
+                for line_number, error in summary.errors:
+                    if line_number > 0:
+                        error = "line {}: {}".format(line_number, error)
+                    msg += "\nScenery - {}: {}".format(key, error)
+
+                # Large sceneries can have many stacked objects, only list the first few groups of them.
+                for overlap in check_placement_overlaps(summary, float(self.settings['placement_overlap_distance']),
+                                                        max_issues=10):
+                    msg += "\nScenery - {}: {}".format(key, overlap)
+            # Check the start positions against the regions of the same scenery's FLD file.
+            regions = {key: summary.regions for key, summary in zip(fld_keys, summaries)}
+            for key, stp in zip(stp_keys, start_positions):
+                for line_number, error in stp.errors + check_start_positions(stp, regions[key]):
+                    if line_number > 0:
+                        error = "line {}: {}".format(line_number, error)
+                    msg += "\nScenery - {} (STP): {}".format(key, error)
+            for key, (path, references) in zip(yfs_keys, missions):
+                if isinstance(references, Exception):
+                    msg += "\nScenery - {}: Could not read {}: {}".format(key, os.path.basename(path), references)
+
+        if int(self.settings['check_scenery_references']) == 1:
+            index = self.build_reference_index(fld_keys, summaries, yfs_keys, missions)
+            for category, name, sources in index.dangling():
+                msg += "\n{} {} is not in the pack. Used by {}".format(category, name, ", ".join(sorted(set(sources))))
+            # Without any scenery or mission files every ground object would be listed, so only check with them.
+            unused = index.unused('Ground') if len(fld_keys) + len(yfs_keys) > 0 else list()
+            if len(unused) > 0:
+                print("Ground objects not placed by any scenery or mission: {}".format(", ".join(unused)))
+                info = "The following ground objects are not placed by any scenery or mission of the pack: {}".format(
+                    ", ".join(unused[:20]))
+                if len(unused) > 20:
+                    info += " and {} more".format(len(unused) - 20)
+                info += ". This is not a problem if they are meant for other sceneries."
+
+        if len(msg) == 0:
+            if info:
+                messagebox.showinfo(parent=self.parent, title="Unused Ground Objects", message=info)
+            return True
+
+        msg = "Found the following problems in the scenery files:\n" + msg
+        msg += "\n\nNames that are not in the pack must already be installed in YSFlight."
+        if info:
+            msg += "\n\n" + info
+        msg += "\n\nDo you want to continue anyway?"
+        return messagebox.askyesno(parent=self.parent,
+                                   title="Scenery File Problems Detected",
+                                   message=msg,
+                                   default='no')
+
+    def build_reference_index(self, fld_keys, summaries, yfs_keys, missions):
+        """Index the names used by the scenery and mission files against the names defined by the pack.
+
+        Inputs
+        fld_keys (list): Scenery entry keys for each FLD summary
+        summaries (list): FieldSummary for each scenery entry FLD file
+        yfs_keys (list): Scenery entry keys for each mission
+        missions (list): [path, references or Exception] for each scenery entry YFS file
+
+        Outputs
+        index (ReferenceIndex): names used by the scenery and mission files
+        """
+        definitions = {'Aircraft': {instance.IDENTIFY: key for key, instance in self.lst_entries['Aircraft'].items()},
+                       'Ground': {instance.IDENTIFY: key for key, instance in self.lst_entries['Ground'].items()},
+                       'Scenery': {instance.map_name.replace(" ", "_"): key
+                                   for key, instance in self.lst_entries['Scenery'].items()}}
+        known_names = self.install_index.known_names() if self.install_index is not None else None
+        index = ReferenceIndex(definitions, known_names)
+        for key, summary in zip(fld_keys, summaries):
+            index.add_field_summary(summary, "Scenery - {} (FLD)".format(key))
+        for key, (path, references) in zip(yfs_keys, missions):
+            if isinstance(references, Exception) is False:
+                index.add_mission_references(references, "Scenery - {} (YFS)".format(key))
+        return index
+
     def new_pack_configuration(self):
         """This function is used to unload any and all saved and unsaved work to prepare for a new project
 
@@ -938,74 +1355,173 @@ class PackBuilderGUI(Frame):
                                     message='Did not open project: {}'.format(os.path.basename(input_filepath)))
                 return
 
-        # Import the raw data
-        with open(input_filepath, mode='r') as config_file:
-            input_data = config_file.readlines()
-            for idx, line in enumerate(input_data):
-                if line.endswith("\n"):
-                    input_data[idx] = line[:-1]
-
-        # Determine what the delimiter is. This should be in the second row. If it isn't then we should just default
-        # to the default delimiter in the tool.
-        if input_data[1].startswith("DELIMITER:"):
-            delimiter = input_data[1][10:]
-        else:
-            delimiter = self.pack_save_config_delimiter
-
         # Clear all previously loaded data and clear the listbox preview windows.
         self.clear_loaded_data(aircraft=True, ground=True, scenery=True)
 
-        # Load Aircraft
-        if 'END_AIRCRAFT' in input_data:
-            # We found at least one aircraft to process.
-            aircraft_blocks = split_list(input_data, ['AIRCRAFT', 'END_AIRCRAFT'])[1:-1]
-            for block in aircraft_blocks:
-                temp_dict = dict()
-                for line in block:
-                    if delimiter in line:  # Don't error out for the AIRCRAFT and END_AIRCRAFT lines.
-                        key, value = line.split(delimiter)
-                        temp_dict[key] = value
-                class_instance = AirGndLSTEntry()
-                class_instance.assign_values(temp_dict)
-                self.lst_entries['Aircraft'][class_instance.IDENTIFY] = class_instance
-                self.air_listbox.insert(END, class_instance.IDENTIFY)  # Insert into the preview listbox
-                print("Loaded Aircraft: " + class_instance.IDENTIFY)
-
-        # Load Ground Objects
-        if 'END_GROUND' in input_data:
-            # We found at least one ground object to process.
-            ground_blocks = split_list(input_data, ['GROUND', 'END_GROUND'])[1:-1]
-            for block in ground_blocks:
-                temp_dict = dict()
-                for line in block:
-                    key, value = line.split(delimiter)
-                    temp_dict[key] = value
-                class_instance = AirGndLSTEntry()
-                class_instance.assign_values(temp_dict)
-                self.lst_entries['Ground'][class_instance.IDENTIFY] = class_instance
-                self.gnd_listbox.insert(END, class_instance.IDENTIFY)  # Insert into the preview listbox
-                print("Loaded Ground Object: " + class_instance.IDENTIFY)
-
-        # Load Sceneries
-        if 'END_SCENERY' in input_data:
-            # We found at least one scenery to process.
-            scenery_blocks = split_list(input_data, ['SCENERY', 'END_SCENERY'])[1:-1]
-            for block in scenery_blocks:
-                temp_dict = dict()
-                for line in block:
-                    key, value = line.split(delimiter)
-                    temp_dict[key] = value
-                class_instance = SceLSTEntry()
-                class_instance.assign_values(temp_dict)
-                self.lst_entries['Scenery'][class_instance.map_name] = class_instance
-                self.sce_listbox.insert(END, class_instance.map_name)  # Insert into the preview listbox
-                print("Loaded Scenery: " + class_instance.map_name)
+        listboxes = {'Aircraft': self.air_listbox, 'Ground': self.gnd_listbox, 'Scenery': self.sce_listbox}
+        for lst_type, instances in read_pack_configuration(input_filepath, self.pack_save_config_delimiter).items():
+            for class_instance in instances:
+                name = class_instance.map_name if lst_type == 'Scenery' else class_instance.IDENTIFY
+                self.lst_entries[lst_type][name] = class_instance
+                listboxes[lst_type].insert(END, name)  # Insert into the preview listbox
+                print("Loaded {}: {}".format(lst_type, name))
 
         # Clear all entry fields.
         self.clear_entry_fields(aircraft=True, ground=True, scenery=True)
 
         # self.functionality_not_available_popup("load_pack_configuration")
 
+    def import_assembled_pack(self):
+        """Load the LST entries of an assembled pack as a new project, so that packs that only exist in their
+        assembled form can be edited without selecting all of their files again.
+        """
+        pack_directory = filedialog.askdirectory(parent=self.parent,
+                                                 title="Select the assembled pack's folder (holding the aircraft, "
+                                                       "ground and scenery folders)",
+                                                 initialdir=self.WorkingDirectory.get(),
+                                                 mustexist=True)
+        if not pack_directory:
+            return
+
+        entries = read_assembled_pack(pack_directory)
+        if len(entries) == 0:
+            messagebox.showerror(parent=self.parent,
+                                 title="No LST Entries Found",
+                                 message="Could not find any LST entries in the aircraft, ground or scenery folders "
+                                         "of {}".format(pack_directory))
+            return
+
+        # Detect if there are any LST entries in loaded. If there are we should prompt the user if they want to delete
+        # these entries
+        if len(self.lst_entries['Aircraft']) + len(self.lst_entries['Scenery']) + len(self.lst_entries['Ground']) > 0:
+            answer = messagebox.askyesno(parent=self.parent,
+                                         title='Remove Loaded LST Entries?',
+                                         message='Any currently loaded LST Entries will be overwritten by importing this pack. Do you want to import the pack?',
+                                         default='no')
+            if not answer:
+                return
+
+        # Clear all previously loaded data and clear the listbox preview windows.
+        self.clear_loaded_data(aircraft=True, ground=True, scenery=True)
+
+        listboxes = {'Aircraft': self.air_listbox, 'Ground': self.gnd_listbox, 'Scenery': self.sce_listbox}
+        skipped = list()
+        num_missing_files = 0
+        for lst_type, values in entries:
+            class_instance = SceLSTEntry() if lst_type == 'Scenery' else AirGndLSTEntry()
+            class_instance.assign_values(values)
+            key = class_instance.map_name if lst_type == 'Scenery' else class_instance.IDENTIFY
+
+            # Entries are stored by name, so entries without a name or with a name that is already used are skipped.
+            if not key or key in self.lst_entries[lst_type]:
+                skipped.append("{} - {}".format(lst_type, key or os.path.basename(values.get('DAT', ""))))
+                continue
+
+            num_missing_files += len([path for path in class_instance.return_paths().values()
+                                      if path and source_exists(path) is False])
+            self.lst_entries[lst_type][key] = class_instance
+            listboxes[lst_type].insert(END, key)  # Insert into the preview listbox
+
+        # Clear all entry fields.
+        self.clear_entry_fields(aircraft=True, ground=True, scenery=True)
+
+        msg = "Imported {} aircraft, {} ground objects and {} sceneries.".format(
+            len(self.lst_entries['Aircraft']), len(self.lst_entries['Ground']), len(self.lst_entries['Scenery']))
+        if num_missing_files > 0:
+            msg += "\n\n{} files referenced by the LST files could not be found.".format(num_missing_files)
+        if len(skipped) > 0:
+            msg += "\n\nSkipped the following entries with missing or duplicate names:\n" + "\n".join(skipped)
+        messagebox.showinfo(parent=self.parent,
+                            title="Imported Assembled Pack",
+                            message=msg)
+
+    def generate_variants(self):
+        """Generate variants of the selected aircraft or ground object from a CSV table of IDENTIFY names and DAT
+        values. Each variant gets its own DAT file, written from the selected entry's DAT file, and shares the entry's
+        model files.
+        """
+        if self.current_mode not in ['Aircraft', 'Ground']:
+            messagebox.showinfo(parent=self.parent,
+                                title="Generate Variants",
+                                message="Variants can only be generated for aircraft and ground objects.")
+            return
+        listbox = {'Aircraft': self.air_listbox, 'Ground': self.gnd_listbox}[self.current_mode]
+        current_entries = listbox.get(0, END)
+        selected_names = [current_entries[idx] for idx in listbox.curselection()]
+        if len(selected_names) != 1:
+            messagebox.showinfo(parent=self.parent,
+                                title="Generate Variants",
+                                message="Select the one LST entry to use as the template for the variants.")
+            return
+        template_entry = self.lst_entries[self.current_mode][selected_names[0]]
+
+        if self.use_testing_config_filepath is True:
+            csv_file_path = os.path.join(os.getcwd(), "variants.csv")
+            output_folder = os.path.join(os.getcwd(), "Variants")
+            os.makedirs(output_folder, exist_ok=True)
+        else:
+            csv_file_path = filedialog.askopenfilename(parent=self.parent,
+                                                       title="Select the CSV table of variants",
+                                                       initialdir=self.WorkingDirectory.get(),
+                                                       filetypes=[("CSV File", "*.csv"), ("All Files", "*.*")])
+            if not csv_file_path:
+                return
+            output_folder = filedialog.askdirectory(parent=self.parent,
+                                                    title="Select the folder to write the variant DAT files to",
+                                                    initialdir=os.path.dirname(csv_file_path))
+            if not output_folder:
+                return
+
+        try:
+            variants = read_variant_table(csv_file_path)
+        except (OSError, ValueError) as error:
+            messagebox.showerror(parent=self.parent,
+                                 title="Could Not Read Variants",
+                                 message="Could not read the variants in {}:\n\n{}".format(csv_file_path, error))
+            return
+
+        # Entries are stored by name, so variants with a name that is already used are skipped.
+        used_names = self.lst_entries[self.current_mode]
+        skipped = [variant['IDENTIFY'] for variant in variants if variant['IDENTIFY'] in used_names]
+        variants = [variant for variant in variants if variant['IDENTIFY'] not in used_names]
+
+        # Overwriting the template's own DAT file would change every variant made from it.
+        template_path = os.path.normcase(os.path.abspath(template_entry.DAT))
+        if any(os.path.normcase(os.path.abspath(os.path.join(output_folder, variant[VARIANT_FILE_COLUMN]))) ==
+               template_path for variant in variants):
+            messagebox.showerror(parent=self.parent,
+                                 title="Could Not Generate Variants",
+                                 message="A variant would overwrite the template DAT file {}.".format(template_entry.DAT))
+            return
+
+        existing = [variant[VARIANT_FILE_COLUMN] for variant in variants
+                    if os.path.exists(os.path.join(output_folder, variant[VARIANT_FILE_COLUMN]))]
+        if len(existing) > 0:
+            msg = "{} of the variant DAT files already exist in {}, including:\n".format(len(existing), output_folder)
+            msg += "\n".join(existing[:10])
+            msg += "\n\nDo you want to overwrite them?"
+            if not messagebox.askyesno(parent=self.parent, title="Overwrite DAT Files?", message=msg, default='no'):
+                return
+
+        num_generated = 0
+        try:
+            for lst_entry in generate_variant_entries(template_entry, variants, output_folder):
+                self.lst_entries[self.current_mode][lst_entry.IDENTIFY] = lst_entry
+                listbox.insert(END, lst_entry.IDENTIFY)
+                num_generated += 1
+        except OSError as error:
+            messagebox.showerror(parent=self.parent,
+                                 title="Could Not Generate Variants",
+                                 message="Stopped after {} variants, could not write a DAT file ({}).".format(
+                                     num_generated, error))
+        if num_generated > 0:
+            self.unsaved_data = True
+
+        msg = "Generated {} variants of {} in {}.".format(num_generated, selected_names[0], output_folder)
+        if len(skipped) > 0:
+            msg += "\n\nSkipped the following variants whose IDENTIFY is already in the pack:\n" + "\n".join(skipped)
+        messagebox.showinfo(parent=self.parent, title="Generated Variants", message=msg)
+
     def save_lst_entry(self):
         """Save the LST Entry from the active tab and insert it's LST Entry class instance into the appropriate list"""
 
@@ -1013,7 +1529,7 @@ class PackBuilderGUI(Frame):
         required_files_missing = list()
         for idx, (path, required) in enumerate(zip(self.current_paths[self.current_mode], self.required_files[self.current_mode])):
             # This method will verify that we don't have a "", or a non-set StringVar
-            if os.path.isfile(path.get()) is False and required is True:
+            if source_exists(path.get()) is False and required is True:
                 required_files_missing.append("\n- {}".format(self.labels[self.current_mode][idx]))
 
         # Alert the user that a file is missing.
@@ -1235,6 +1751,7 @@ class PackBuilderGUI(Frame):
         if path:
             # Set the appropriate variable
             self.WorkingDirectory.set(path)
+            self.index_model_folder(path)
 
     def select_file(self, file_position):
         """Select the file for the indicated position.
@@ -1276,13 +1793,27 @@ class PackBuilderGUI(Frame):
             if filetype.lower() in self.filetypes.keys():
                 gui_filetypes.append(self.filetypes[filetype.lower()][0])
 
+        gui_filetypes.append(("Zip Archive", "*.zip"))  # Files can be picked from inside zip archives.
         gui_filetypes.append(("All Files", "*.*"))  # Always give the user an option to select all files.
 
+        # When the working directory is a zip archive the file is picked from its contents, unless the user chooses
+        # to browse the folders instead.
+        path = ""
+        extensions = " ".join(file_type).split()
+        archive_path = split_archive_path(self.WorkingDirectory.get())[0]
+        browse = True
+        if is_archive(archive_path):
+            path, browse = self.select_archive_member(archive_path, prompt, extensions)
+
         # Get the filepath using GUI
-        path = filedialog.askopenfilename(parent=self,
-                                          title=prompt,
-                                          initialdir=self.WorkingDirectory.get(),
-                                          filetypes=gui_filetypes)
+        if browse:
+            initial_directory = os.path.dirname(archive_path) if is_archive(archive_path) else self.WorkingDirectory.get()
+            path = filedialog.askopenfilename(parent=self,
+                                              title=prompt,
+                                              initialdir=initial_directory,
+                                              filetypes=gui_filetypes)
+            if path and is_archive(path):
+                path = self.select_archive_member(path, prompt, extensions)[0]
 
         # Validate the path and process valid paths
         if path:  # Filters None and '' path values
@@ -1291,8 +1822,9 @@ class PackBuilderGUI(Frame):
             self.current_paths[self.current_mode][file_position].set(path)
             self.current_filenames[self.current_mode][file_position].set(os.path.basename(path))
 
-            # Store the directory that the user last selected
-            self.WorkingDirectory.set(os.path.dirname(path))
+            # Store the directory that the user last selected, or the archive the file was picked from.
+            archive_path, member = split_archive_path(path)
+            self.WorkingDirectory.set(archive_path if member is not None else os.path.dirname(path))
 
             # Update the aircraft and ground object names
             if self.current_mode in ['Aircraft', 'Ground'] and path.endswith(".dat") and file_position == 0:
@@ -1301,6 +1833,67 @@ class PackBuilderGUI(Frame):
             # Set the status of unsaved work
             self.unstored_data[self.current_mode] = True
 
+            # Offer the model files that look like they belong with the DAT file.
+            if self.current_mode in ['Aircraft', 'Ground'] and file_position == 0 and member is None and \
+                    self.settings['suggest_model_files'] == 1:
+                self.suggest_model_files(path)
+
+    def index_model_folder(self, folder):
+        """Add a folder to the model file index and refresh the index in the background.
+
+        Drive roots are not indexed, as listing a whole drive would take a long time.
+        """
+        if not folder or os.path.isdir(folder) is False:
+            return
+        folder = os.path.abspath(folder)
+        if os.path.dirname(folder) == folder:
+            return
+        self.model_file_index.add_root(folder)
+        self.model_file_index.start_refresh()
+
+    def suggest_model_files(self, dat_file_path):
+        """Suggest the visual, collision, cockpit and coarse models for a DAT file and fill the chosen ones in.
+
+        Inputs
+        dat_file_path (str): path to the DAT file that was selected
+        """
+        # The DAT file's own folder is listed right away, so its files are suggested even while the rest of the index
+        # is still being built.
+        dat_folder = os.path.dirname(os.path.abspath(dat_file_path))
+        if self.model_file_index.is_indexed(dat_folder) is False:
+            self.model_file_index.add_root(dat_folder)
+        self.model_file_index.refresh_folder(dat_folder)
+        self.model_file_index.start_refresh()
+
+        suggestions = self.model_file_index.suggest(dat_file_path)
+        if all(len(suggestions[slot]) == 0 for slot in MODEL_SLOTS):
+            return
+
+        picker = ModelFileSuggestionPicker(self, os.path.basename(dat_file_path), dat_folder, suggestions,
+                                           [path.get() for path in self.current_paths[self.current_mode][1:]])
+        for file_position, path in enumerate(picker.selected_paths, start=1):
+            if path:
+                self.current_paths[self.current_mode][file_position].set(path)
+                self.current_filenames[self.current_mode][file_position].set(os.path.basename(path))
+
+    def select_archive_member(self, archive_path, prompt, extensions):
+        """Let the user pick a file inside a zip archive.
+
+        Inputs
+        archive_path (str): path to the zip archive
+        prompt (str): text shown above the list of files
+        extensions (list): lower case extensions of the files to list
+
+        Outputs
+        path (str): source path of the selected file (ex: archive.zip!/folder/file.dnm), or "" if none was selected
+        browse (bool): True if the user chose to browse the folders instead
+        """
+        members = list_archive_members(archive_path, extensions)
+        picker = ArchiveMemberPicker(self, prompt, os.path.basename(archive_path), members)
+        if picker.selected_member:
+            return make_archive_path(archive_path, picker.selected_member), False
+        return "", picker.browse
+
     def on_tab_change(self, event):
         """Run a function when the air/gnd/sce tab changes"""
         # Set the current tab being displayed
@@ -1357,6 +1950,428 @@ class PackBuilderGUI(Frame):
             return
 
         # Ask the user where to export the pack to.
+        folderpath = self.ask_output_folder()
+        if folderpath is None:
+            return
+
+        # Get the pack name & username
+        names = self.ask_pack_and_user_names()
+        if names is None:
+            return
+        pack_name, username = names
+
+        # The pack is assembled in a staging folder next to the pack folder and moved into place once it is complete.
+        pack_folder = os.path.join(folderpath, pack_name)
+        staging_folder = staging_folder_path(pack_folder)
+        mod_folderpath = os.path.join(staging_folder, 'user', username, pack_name)
+
+        # Work out every output before writing anything, so that a build that cannot succeed stops straight away.
+        plan = self.make_build_plan(mod_folderpath)
+        problems = plan.source_problems()
+        if len(problems) > 0:
+            messagebox.showerror(parent=self.parent,
+                                 title="Cannot Assemble Pack",
+                                 message="The pack cannot be assembled:\n\n" + "\n".join(problems))
+            return
+        if os.path.exists(pack_folder):
+            # Need to ask user if they want to overwrite all files in this directory.
+            answer = messagebox.askyesno(parent=self.parent,
+                                         title="Overwrite Existing {} Folder?".format(pack_name),
+                                         message="Do you want to overwrite all previously compiled files for this mod?",
+                                         default="no")
+
+            if not answer:
+                messagebox.showinfo(parent=self.parent,
+                                    title="Did Not Copy Files",
+                                    message="Did not copy or overwrite files in the existing mod folder.")
+                return
+
+        if os.path.isdir(staging_folder):
+            answer = messagebox.askyesno(parent=self.parent,
+                                         title="Resume Assembling {}?".format(pack_name),
+                                         message="A previous assembly of this pack did not finish. Do you want to resume it? Select No to start over.",
+                                         default="yes")
+            if not answer:
+                discard_staging(staging_folder)
+
+        # Keep the outputs of a previous run that still match the journal.
+        journal = AssemblyJournal(staging_folder, plan.signatures)
+        num_recorded = len(journal.records)
+        num_unchanged = journal.verify()
+        if num_recorded > 0:
+            print("Resuming assembly, {} of {} completed files are unchanged".format(num_unchanged, num_recorded))
+
+        # Only the kept outputs count towards the space the build needs, so check it once they are known.
+        problems = plan.space_problems(folderpath, journal.num_bytes_recorded())
+        if len(problems) > 0:
+            messagebox.showerror(parent=self.parent,
+                                 title="Cannot Assemble Pack",
+                                 message="The pack cannot be assembled:\n\n" + "\n".join(problems))
+            return
+
+        # Create the mod folder
+        try:
+            os.makedirs(mod_folderpath, exist_ok=True)
+        except OSError:
+            messagebox.showerror(parent=self.parent,
+                                 title="Unable to make Mod Folder",
+                                 message="Unable to make the mod folder to copy files to. Please try again.")
+            return
+
+        # Optionally generate coarse models for the aircraft and ground objects that do not have one. The generated
+        # models are written straight into the mod folder and used for the empty coarse slot of the LST lines.
+        generated_coarse = dict()
+        if int(self.settings['generate_coarse_models']) == 1:
+            generated_coarse = self.generate_missing_coarse_models(mod_folderpath, journal)
+
+        # Make the LST Files
+        lst_filepaths = list()
+        for prefix, lst_type in zip(self.lst_file_prefixes, self.lst_types):
+            if len(self.lst_entries[lst_type]) == 0:
+                # A resumed assembly may have written this LST file before its entries were removed. Left in place it
+                # would be moved into the pack, pointing at files that are no longer there.
+                stale_folderpath = os.path.join(staging_folder, lst_type.lower())
+                stale_filepath = os.path.join(stale_folderpath, "{}{}.lst".format(prefix, pack_name))
+                if os.path.exists(stale_filepath):
+                    os.remove(stale_filepath)
+                    if len(os.listdir(stale_folderpath)) == 0:
+                        os.rmdir(stale_folderpath)
+            else:
+                # Make folder for the type of lst file.
+                lst_folderpath = os.path.join(staging_folder, lst_type.lower())
+                if os.path.exists(lst_folderpath) is False:
+                    os.mkdir(lst_folderpath)
+
+                # Generate LST filename
+                filename = "{}{}.lst".format(prefix, pack_name)
+                filepath = os.path.join(lst_folderpath, filename)
+
+                # Assemble lst lines
+                lst_lines = list()
+                for instance in self.lst_entries[lst_type].values():
+                    if lst_type == 'Scenery':
+                        lst_lines.append(instance.make_lst_entry(pack_name, username) + "\n")
+                    else:
+                        coarse = generated_coarse.get(instance.Visual_Model, "")
+                        lst_lines.append(instance.make_lst_entry(pack_name, username, coarse) + "\n")
+
+                # Write the lst file
+                with open(filepath, mode='w') as lst_file:
+                    lst_file.writelines(lst_lines)
+                journal.record(filepath, [])
+                lst_filepaths.append(filepath)
+
+        # Move the various mod files into the [PackName]/user/[UserName]/PackName] folder. The LST lines reference the
+        # files directly in this folder, so do not sort them into sub folders.
+        copy_jobs = dict(plan.outputs)
+
+        # Optionally weld and/or re-encode the models instead of copying them as they are.
+        model_jobs = list()
+        model_options = ""
+        if int(self.settings['weld_models']) == 1 or int(self.settings['compact_models']) == 1:
+            model_jobs = [[source, output] for output, source in copy_jobs.items()
+                          if source.lower().endswith(('.dnm', '.srf'))]
+            for _, output in model_jobs:
+                del copy_jobs[output]
+            model_options = "weld={} {} {} compact={}".format(self.settings['weld_models'],
+                                                              self.settings['weld_tolerance'],
+                                                              self.settings['model_precision'],
+                                                              self.settings['compact_models'])
+            model_jobs = [[source, output] for source, output in model_jobs
+                          if journal.is_complete(output, [source], model_options) is False]
+
+        # DAT files whose IDENTIFY line differs from their entry are rewritten instead of copied, and when minifying
+        # every DAT file is, so that both happen in the same pass over the file.
+        minify = int(self.settings['minify_dats']) == 1
+        dat_jobs = dict()
+        for lst_type in ['Aircraft', 'Ground']:
+            for instance in self.lst_entries[lst_type].values():
+                output = os.path.join(mod_folderpath, instance.dat_new_name or os.path.basename(instance.DAT))
+                identify = instance.IDENTIFY.strip()  # Configurations may hold names with the DAT line's spacing
+                if output in copy_jobs and (minify or read_dat_identify(instance.DAT) != identify):
+                    dat_jobs[output] = [instance.DAT, identify]
+                    del copy_jobs[output]
+
+        for output, source in copy_jobs.items():
+            if journal.is_complete(output, [source]):
+                continue
+            try:
+                journal.record(output, [source], result=copy_and_hash(source, output))
+            except OSError as error:
+                messagebox.showerror(parent=self.parent,
+                                     title="Could Not Copy Files",
+                                     message="Could not copy {} ({}). Fix the problem and assemble the pack again to resume from this file.".format(os.path.basename(source), error))
+                return
+
+        dat_sizes = [0, 0]
+        for output, (source, identify) in dat_jobs.items():
+            dat_options = "identify={} minify={}".format(identify, int(minify))
+            if journal.is_complete(output, [source], dat_options):
+                continue
+            try:
+                size_before, size_after = write_dat_identify(source, output, identify, minify)
+            except OSError as error:
+                messagebox.showerror(parent=self.parent,
+                                     title="Could Not Write DAT File",
+                                     message="Could not write {} ({}). Fix the problem and assemble the pack again to resume from this file.".format(os.path.basename(source), error))
+                return
+            journal.record(output, [source], dat_options)
+            dat_sizes[0] += size_before
+            dat_sizes[1] += size_after
+        if minify and dat_sizes[0] > 0:
+            msg = "Minifying the DAT files saved {} ({} -> {}).".format(format_size(dat_sizes[0] - dat_sizes[1]),
+                                                                         format_size(dat_sizes[0]),
+                                                                         format_size(dat_sizes[1]))
+            print(msg)
+            messagebox.showinfo(parent=self.parent, title="Minified DAT Files", message=msg)
+
+        self.write_pack_models(model_jobs)
+        for source, output in model_jobs:
+            journal.record(output, [source], model_options)
+
+        if journal.num_resumed > 0:
+            print("Kept {} files from the previous assembly".format(journal.num_resumed))
+
+        # Remove files a resumed assembly made for entries that have since been removed, and list the hashes of the
+        # pack's files, taken while they were written, so that installed copies of the pack can be verified.
+        manifest_path = os.path.join(mod_folderpath, pack_name + MANIFEST_SUFFIX)
+        pack_files = [output for output in list(plan.outputs) + list(plan.generated)
+                      if journal.relative_path(output) in journal.records] + lst_filepaths
+        remove_stale_files(mod_folderpath, pack_files + [manifest_path])
+        manifest = dict()
+        for path in pack_files:
+            record = journal.records[journal.relative_path(path)]
+            manifest[record['output']] = [record['size'], record['blake2']]
+        write_manifest(manifest_path, staging_folder, manifest)
+
+        try:
+            finish_staging(staging_folder, pack_folder)
+        except OSError as error:
+            messagebox.showerror(parent=self.parent,
+                                 title="Could Not Move Pack Into Place",
+                                 message="The pack was assembled in {} but could not be moved to {} ({}).".format(staging_folder, pack_folder, error))
+            return
+
+        # Optionally split the pack into volumes that fit the upload limits of the hosting sites.
+        volumes = self.plan_pack_volumes(plan, generated_coarse, journal)
+        if len(volumes) > 1:
+            self.write_pack_volumes(volumes, folderpath, pack_name, username, staging_folder, generated_coarse, journal)
+
+    def plan_pack_volumes(self, plan, generated_coarse=None, journal=None):
+        """Split the pack's entries into volumes no larger than the volume size setting, using the sizes from the build
+        plan.
+
+        Inputs:
+        plan (BuildPlan): build plan of the pack
+        generated_coarse (dict): visual model path to the coarse models that were generated, or None to count every
+                                 coarse model in the plan
+        journal (AssemblyJournal): journal of the finished assembly, whose sizes replace the estimates of the plan for
+                                   generated, welded and compacted models
+
+        Outputs:
+        volumes (list): [entries, output paths, bytes] for each volume, or an empty list if the pack is not split.
+        """
+        size_cap = int(float(self.settings['volume_size_mb']) * 1024 * 1024)
+        if size_cap <= 0:
+            return list()
+
+        entry_files = dict()
+        for entry, outputs in plan.entries.items():
+            entry_files[entry] = [output for output in outputs if output in plan.outputs or generated_coarse is None
+                                  or plan.generated[output] in generated_coarse]
+        file_sizes = {output: plan.output_size(output) for output in list(plan.outputs) + list(plan.generated)}
+        if journal is not None:
+            for output in file_sizes:
+                record = journal.records.get(journal.relative_path(output))
+                if record is not None:
+                    file_sizes[output] = record['size']
+        return plan_volumes(entry_files, file_sizes, size_cap)
+
+    def write_pack_volumes(self, volumes, folderpath, pack_name, username, staging_folder, generated_coarse, journal):
+        """Write each volume as a pack of its own ([PackName]_Volume1, ...) next to the assembled pack.
+
+        The files are hard linked from the assembled pack when possible. Every volume has its own LST files, named
+        after the volume, so that all of the volumes can be installed together.
+
+        Inputs:
+        volumes (list): [entries, output paths, bytes] for each volume from plan_pack_volumes
+        folderpath (str): folder holding the assembled pack
+        pack_name (str): name of the pack
+        username (str): YSFlight username of the pack
+        staging_folder (str): folder the pack was assembled in, which the output paths of the plan are in
+        generated_coarse (dict): visual model path to the path of the generated coarse model
+        journal (AssemblyJournal): journal of the finished assembly, with the hashes of the files for the manifests
+        """
+        pack_folder = os.path.join(folderpath, pack_name)
+        mod_folder_parts = ['user', username, pack_name]
+        for name in os.listdir(folderpath):
+            suffix = name[len(pack_name + "_Volume"):]
+            if name.startswith(pack_name + "_Volume") and suffix.isdigit():
+                discard_staging(os.path.join(folderpath, name))  # Volumes of a previous export
+
+        size_cap = int(float(self.settings['volume_size_mb']) * 1024 * 1024)
+        report = ["Split {} into {} volumes of at most {}:\n".format(pack_name, len(volumes), format_size(size_cap))]
+        for number, (entries, outputs, size) in enumerate(volumes, start=1):
+            volume_folder = os.path.join(folderpath, "{}_Volume{}".format(pack_name, number))
+            for output in sorted(outputs):
+                relative_path = os.path.relpath(output, staging_folder)
+                volume_path = os.path.join(volume_folder, relative_path)
+                os.makedirs(os.path.dirname(volume_path), exist_ok=True)
+                link_or_copy(os.path.join(pack_folder, relative_path), volume_path)
+
+            manifest = {os.path.relpath(output, staging_folder).replace(os.sep, "/"): None for output in outputs}
+            for prefix, lst_type in zip(self.lst_file_prefixes, self.lst_types):
+                lst_lines = list()
+                for entry_type, name in entries:
+                    if entry_type != lst_type:
+                        continue
+                    instance = self.lst_entries[lst_type][name]
+                    if lst_type == 'Scenery':
+                        lst_lines.append(instance.make_lst_entry(pack_name, username) + "\n")
+                    else:
+                        coarse = generated_coarse.get(instance.Visual_Model, "")
+                        lst_lines.append(instance.make_lst_entry(pack_name, username, coarse) + "\n")
+                if len(lst_lines) > 0:
+                    os.makedirs(os.path.join(volume_folder, lst_type.lower()), exist_ok=True)
+                    filename = "{}{}_{}.lst".format(prefix, pack_name, number)
+                    with open(os.path.join(volume_folder, lst_type.lower(), filename), mode='w') as lst_file:
+                        lst_file.writelines(lst_lines)
+                    manifest["{}/{}".format(lst_type.lower(), filename)] = hash_file(os.path.join(volume_folder,
+                                                                                                 lst_type.lower(),
+                                                                                                 filename))
+
+            # The volume's files are the same as in the pack, so their hashes come from the pack's journal.
+            for path in manifest:
+                if manifest[path] is None:
+                    manifest[path] = [journal.records[path]['size'], journal.records[path]['blake2']]
+            write_manifest(os.path.join(volume_folder, *mod_folder_parts, "{}_{}{}".format(pack_name, number,
+                                                                                         MANIFEST_SUFFIX)),
+                           volume_folder, manifest)
+
+            line = "Volume {}: {} entries, {}".format(number, len(entries), format_size(size))
+            if size > size_cap:
+                line += " (larger than the limit, these entries cannot be split)"
+            report.append(line)
+        print("\n".join(report))
+        messagebox.showinfo(parent=self.parent, title="Split Pack Into Volumes", message="\n".join(report))
+
+    def verify_assembled_pack(self):
+        """Check an assembled or installed pack against its manifest and report missing, modified and extra files."""
+        if self.use_testing_config_filepath is True:
+            manifest_path = os.path.join(os.getcwd(), "TestPack", "user", "UserName", "TestPack",
+                                         "TestPack" + MANIFEST_SUFFIX)
+        else:
+            manifest_path = filedialog.askopenfilename(parent=self.parent,
+                                                       title="Select the manifest in the pack's user folder",
+                                                       initialdir=self.settings['ysflight_directory'] or os.getcwd(),
+                                                       filetypes=(("Pack Manifest", "*" + MANIFEST_SUFFIX),
+                                                                  ("All Files", "*.*")))
+            if not manifest_path:
+                return
+
+        try:
+            results = verify_pack(manifest_path)
+        except (OSError, ValueError, KeyError) as error:
+            messagebox.showerror(parent=self.parent,
+                                 title="Could Not Read Manifest",
+                                 message="Could not read the pack manifest {} ({}).".format(manifest_path, error))
+            return
+
+        report = format_verify_results(results)
+        print("\n".join(report))
+        title = "Pack Verified" if len(report) == 1 else "Pack Has Problems"
+        messagebox.showinfo(parent=self.parent, title=title, message="\n".join(report[:30]))
+
+    def export_dat_table(self):
+        """Export the numeric DAT values of every aircraft and ground object to a CSV or Parquet table, and report the
+        values that stand out from the rest of the pack.
+        """
+        entries = [[name, class_instance.DAT] for lst_type in ['Aircraft', 'Ground']
+                   for name, class_instance in self.lst_entries[lst_type].items() if class_instance.DAT]
+        if len(entries) == 0:
+            messagebox.showinfo(parent=self.parent, title="DAT Parameter Table",
+                                message="There are no aircraft or ground objects in the pack.")
+            return
+
+        if self.use_testing_config_filepath is True:
+            table_path = os.path.join(os.getcwd(), "dat_table.csv")
+        else:
+            table_path = filedialog.asksaveasfilename(parent=self.parent,
+                                                      title="Save the DAT parameter table",
+                                                      initialdir=self.WorkingDirectory.get(),
+                                                      defaultextension=".csv",
+                                                      filetypes=[("CSV File", "*.csv"), ("Parquet File", "*.parquet")])
+            if not table_path:
+                return
+
+        try:
+            report = write_dat_table(entries, table_path)
+        except (OSError, ImportError) as error:
+            messagebox.showerror(parent=self.parent, title="Could Not Export Table",
+                                 message="Could not write {} ({}).".format(table_path, error))
+            return
+        print("\n".join(report))
+        messagebox.showinfo(parent=self.parent, title="DAT Parameter Table", message="\n".join(report))
+
+    def make_update_patch(self):
+        """Make a patch that updates the previous version of an assembled pack to the current version."""
+        filetypes = (("Pack Manifest", "*" + MANIFEST_SUFFIX), ("All Files", "*.*"))
+        old_manifest_path = filedialog.askopenfilename(parent=self.parent, filetypes=filetypes,
+                                                       title="Select the manifest of the previous version of the pack")
+        if not old_manifest_path:
+            return
+        new_manifest_path = filedialog.askopenfilename(parent=self.parent, filetypes=filetypes,
+                                                       title="Select the manifest of the new version of the pack")
+        if not new_manifest_path:
+            return
+        patch_path = filedialog.asksaveasfilename(parent=self.parent,
+                                                  title="Save the update patch",
+                                                  defaultextension=".zip",
+                                                  filetypes=(("Zip Archive", "*.zip"), ("All Files", "*.*")))
+        if not patch_path:
+            return
+
+        try:
+            summary = make_patch(old_manifest_path, new_manifest_path, patch_path)
+        except (OSError, ValueError, KeyError) as error:
+            messagebox.showerror(parent=self.parent,
+                                 title="Could Not Make Patch",
+                                 message="Could not make the update patch ({}).".format(error))
+            return
+        messagebox.showinfo(parent=self.parent, title="Made Update Patch", message=format_patch_summary(summary))
+
+    def apply_update_patch(self):
+        """Update an installed or assembled pack with a patch from make_update_patch."""
+        patch_path = filedialog.askopenfilename(parent=self.parent,
+                                                title="Select the update patch",
+                                                filetypes=(("Zip Archive", "*.zip"), ("All Files", "*.*")))
+        if not patch_path:
+            return
+        manifest_path = filedialog.askopenfilename(parent=self.parent,
+                                                   title="Select the manifest of the pack to update",
+                                                   initialdir=self.settings['ysflight_directory'] or os.getcwd(),
+                                                   filetypes=(("Pack Manifest", "*" + MANIFEST_SUFFIX),
+                                                              ("All Files", "*.*")))
+        if not manifest_path:
+            return
+
+        try:
+            num_changed = apply_patch(patch_path, manifest_path)
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile) as error:
+            messagebox.showerror(parent=self.parent,
+                                 title="Could Not Apply Patch",
+                                 message="The pack was not changed. Could not apply the update patch ({}).".format(error))
+            return
+        messagebox.showinfo(parent=self.parent,
+                            title="Applied Update Patch",
+                            message="Updated {} file(s) of the pack.".format(num_changed))
+
+    def ask_output_folder(self):
+        """Ask the user for the folder to assemble the pack in.
+
+        Outputs
+        folderpath (str): existing folder, or None if the selected folder does not exist.
+        """
         if self.use_testing_config_filepath is True:
             folderpath = os.getcwd()
         else:
@@ -1374,9 +2389,73 @@ class PackBuilderGUI(Frame):
             messagebox.showerror(parent=self.parent,
                                  title="Invalid Output Folder Selected",
                                  message="Please select a folder to assemble the Pack in")
+            return None
+        return folderpath
+
+    def make_build_plan(self, mod_folderpath):
+        """Work out the output path of every file of the pack and read the size of every source file once.
+
+        Inputs:
+        mod_folderpath (str): folder that the pack's files are written to.
+
+        Outputs:
+        plan (BuildPlan): outputs, sizes and collisions of the build.
+        """
+        plan = BuildPlan()
+        for lst_type in self.lst_types:
+            for name, instance in self.lst_entries[lst_type].items():
+                for file_type, source in instance.return_paths().items():
+                    if not source:
+                        continue
+                    filename = os.path.basename(source)
+                    if file_type == 'DAT' and instance.dat_new_name:
+                        filename = instance.dat_new_name  # The LST line references the renamed DAT file.
+                    plan.add(source, os.path.join(mod_folderpath, filename), (lst_type, name))
+
+        # Generated coarse models are smaller than the visual models they are made from.
+        if int(self.settings['generate_coarse_models']) == 1:
+            coarse_jobs = self.plan_coarse_models(mod_folderpath)
+            for lst_type in ['Aircraft', 'Ground']:
+                for name, instance in self.lst_entries[lst_type].items():
+                    if instance.Visual_Model in coarse_jobs and not instance.Coarse:
+                        plan.add_generated(instance.Visual_Model, coarse_jobs[instance.Visual_Model], (lst_type, name))
+
+        plan.stat_sources()
+        return plan
+
+    def show_build_plan(self):
+        """Show what assembling the pack would write, without writing anything."""
+        folderpath = self.ask_output_folder()
+        if folderpath is None:
             return
+        names = self.ask_pack_and_user_names()
+        if names is None:
+            return
+        pack_name, username = names
 
-        # Get the pack name & username
+        pack_folder = os.path.join(folderpath, pack_name)
+        plan = self.make_build_plan(os.path.join(pack_folder, 'user', username, pack_name))
+        problems = plan.problems(folderpath)
+        free = shutil.disk_usage(folderpath).free
+
+        report = plan.report(folderpath)
+        print("\n".join(report + problems))
+        msg = "{}\n{} free in {}".format(report[0], format_size(free), folderpath)
+        volumes = self.plan_pack_volumes(plan)
+        if len(volumes) > 1:
+            msg += "\nSplit into {} volumes of {}".format(len(volumes), ", ".join(format_size(i[2]) for i in volumes))
+        if len(problems) > 0:
+            msg += "\n\nThe pack cannot be assembled:\n" + "\n".join(problems)
+        else:
+            msg += "\n\nNo problems found. The full list of files is printed to the console."
+        messagebox.showinfo(parent=self.parent, title="Build Plan for {}".format(pack_name), message=msg)
+
+    def ask_pack_and_user_names(self):
+        """Ask the user for the pack name and, if it is not stored in the settings, their YSFlight username.
+
+        Outputs
+        names (tuple): (pack name, username), or None if the user did not provide them.
+        """
         if self.use_testing_config_filepath is True:
             pack_name = "TestPack"
             username = "UserName"
@@ -1395,81 +2474,299 @@ class PackBuilderGUI(Frame):
                     messagebox.showerror(parent=self.parent,
                                          title="Could not determine username for this pack.",
                                          message="Without a username this pack cannot be assembled.")
-                    return
+                    return None
 
                 self.UserName.set(username)
 
-        # Make the pack folder if it doesn't exist
-        pack_folder = os.path.join(folderpath, pack_name)
-        if os.path.exists(pack_folder) is False:
-            os.mkdir(pack_folder)
+        if not pack_name:
+            return None
+        return pack_name, username
 
-        # Make the LST Files
-        for prefix, lst_type in zip(self.lst_file_prefixes, self.lst_types):
-            if len(self.lst_entries[lst_type]) > 0:
-                # Make folder for the type of lst file.
-                lst_folderpath = os.path.join(pack_folder, lst_type.lower())
-                if os.path.exists(lst_folderpath) is False:
-                    os.mkdir(lst_folderpath)
+    def deploy_pack(self):
+        """Deploy the pack into the YSFlight installation selected in the settings for testing.
 
-                # Generate LST filename
-                filename = "{}{}.lst".format(prefix, pack_name)
-                filepath = os.path.join(lst_folderpath, filename)
+        The LST files are written into the installation's aircraft, ground and scenery folders and the pack's files are
+        linked into the users/[UserName]/[PackName] folder instead of being copied, so deploying does not depend on the
+        size of the models and edits made to the source files show up the next time the game is started. Only the DAT
+        files whose IDENTIFY line has to be rewritten are written out. The export options that change the models
+        (coarse model generation, welding and compacting) are not applied.
+        """
+        install_directory = self.settings['ysflight_directory']
+        if not install_directory or os.path.isdir(install_directory) is False:
+            messagebox.showerror(parent=self.parent,
+                                 title="YSFlight Folder Not Set",
+                                 message="Select the YSFlight folder in the settings before deploying the pack.")
+            return
 
-                # Determine if the lst file exists and if we should overwrite it.
-                if os.path.exists(filepath):
-                    answer = messagebox.askyesno(parent=self.parent,
-                                                 title="Existing LST File Detected",
-                                                 message="A previously created {} LST file was found. Do you want to overwrite this LST file?".format(lst_type.upper()),
-                                                 default='no')
-                    if not answer:
-                        return
+        names = self.ask_pack_and_user_names()
+        if names is None:
+            return
+        pack_name, username = names
+        lst_filenames = ["{}{}.lst".format(prefix, pack_name) for prefix in self.lst_file_prefixes]
 
-                # Assemble lst lines
-                lst_lines = list()
-                for instance in self.lst_entries[lst_type].values():
-                    lst_lines.append(instance.make_lst_entry(pack_name, username) + "\n")
+        if self.validate_pack_structure(ignore_lst_files=lst_filenames) is False:
+            messagebox.showinfo(parent=self.parent,
+                                title="Invalid Pack Structure Detected",
+                                message="Detected errors. Will not deploy the pack.")
+            return
 
-                # Write the lst file
-                with open(filepath, mode='w') as lst_file:
-                    lst_file.writelines(lst_lines)
+        # The files go in the folder that the LST lines point at.
+        pack_folder = os.path.dirname(make_pack_filepath("placeholder", pack_name, username).strip('"'))
+        deploy_folderpath = os.path.join(install_directory, *pack_folder.split("/"))
+        os.makedirs(deploy_folderpath, exist_ok=True)
+
+        # Write the LST Files into the installation's LST folders.
+        for lst_filename, lst_type in zip(lst_filenames, self.lst_types):
+            lst_folderpath = find_folder(install_directory, lst_type.lower()) or os.path.join(install_directory,
+                                                                                             lst_type.lower())
+            lst_filepath = os.path.join(lst_folderpath, lst_filename)
+            if len(self.lst_entries[lst_type]) == 0:
+                if os.path.isfile(lst_filepath):
+                    os.remove(lst_filepath)  # Remove entries of a previous deployment.
+                continue
+            os.makedirs(lst_folderpath, exist_ok=True)
+            with open(lst_filepath, mode='w') as lst_file:
+                lst_file.writelines(instance.make_lst_entry(pack_name, username) + "\n"
+                                    for instance in self.lst_entries[lst_type].values())
+
+        # Rewrite the DAT files whose IDENTIFY line differs from the entry, link everything else.
+        outputs = dict()
+        dat_jobs = dict()
+        for lst_type in self.lst_types:
+            for instance in self.lst_entries[lst_type].values():
+                for file_type, source in instance.return_paths().items():
+                    if not source:
+                        continue
+                    if lst_type != 'Scenery' and file_type == 'DAT':
+                        output = os.path.join(deploy_folderpath, instance.dat_new_name or os.path.basename(source))
+                        identify = instance.IDENTIFY.strip()
+                        if instance.dat_new_name or read_dat_identify(source) != identify:
+                            dat_jobs[output] = [source, identify]
+                            continue
+                    else:
+                        output = os.path.join(deploy_folderpath, os.path.basename(source))
+                    outputs[output] = source
+
+        methods = dict()
+        failed = list()
+        for output, source in outputs.items():
+            try:
+                if split_archive_path(source)[1] is not None:
+                    copy_source(source, output)  # Files inside zip archives cannot be linked.
+                    method = 'copied from archive'
+                else:
+                    method = link_file(source, output)
+            except OSError as error:
+                failed.append("\n{}: {}".format(os.path.basename(source), error))
+                continue
+            methods[method] = methods.get(method, 0) + 1
+
+        for output, (source, identify) in dat_jobs.items():
+            try:
+                if os.path.lexists(output):
+                    os.remove(output)  # Do not write through a link to the source file.
+                write_dat_identify(source, output, identify)
+            except OSError as error:
+                failed.append("\n{}: {}".format(os.path.basename(source), error))
+                continue
+            methods['rewritten DAT'] = methods.get('rewritten DAT', 0) + 1
+
+        removed = remove_stale_files(deploy_folderpath, list(outputs) + list(dat_jobs))
+
+        msg = "Deployed {} to {}\n".format(pack_name, deploy_folderpath)
+        for method, count in sorted(methods.items()):
+            msg += "\n{} file(s): {}".format(count, method)
+        if len(removed) > 0:
+            msg += "\n\nRemoved {} file(s) left from a previous deployment.".format(len(removed))
+        if len(failed) > 0:
+            msg += "\n\nThe following files could not be deployed:" + "".join(failed)
+        messagebox.showinfo(parent=self.parent, title="Deployed Pack", message=msg)
+
+    def write_pack_models(self, jobs):
+        """Weld and/or compact the pack's models according to the settings, writing them to their output paths.
 
-        # Create the mod folder
-        mod_folderpath = os.path.join(pack_folder, 'user', username, pack_name)
-        if os.path.exists(mod_folderpath):
-            # Need to ask user if they want to overwrite all files in this directory.
-            answer = messagebox.askyesno(parent=self.parent,
-                                         title="Overwrite Existing {} Folder?".format(pack_name),
-                                         message="Do you want to overwrite all previously compiled files for this mod?",
-                                         default="no")
+        Inputs:
+        jobs (list): [source path, output path] pairs
+        """
+        if int(self.settings['weld_models']) == 1 and len(jobs) > 0:
+            self.weld_pack_models(jobs)
+            # The welded models are already in the mod folder, so compact them in place.
+            jobs = [[output, output] for _, output in jobs]
 
-            if not answer:
-                messagebox.showinfo(parent=self.parent,
-                                    title="Did Not Copy Files",
-                                    message="Did not copy or overwrite files in the existing mod folder.")
+        if int(self.settings['compact_models']) == 1 and len(jobs) > 0:
+            self.compact_pack_models(jobs)
+
+    def build_selected_entries(self):
+        """Copy the files of the selected LST entries into a previously assembled pack and update their LST lines,
+        leaving the rest of the pack as it is.
+        """
+        listbox = {'Aircraft': self.air_listbox, 'Ground': self.gnd_listbox, 'Scenery': self.sce_listbox}[self.current_mode]
+        current_entries = listbox.get(0, END)
+        selected_names = [current_entries[idx] for idx in listbox.curselection()]
+        if len(selected_names) == 0:
+            messagebox.showinfo(parent=self.parent,
+                                title="No Entries Selected",
+                                message="Select the LST entries to build into the pack.")
+            return
+
+        if self.use_testing_config_filepath is True:
+            pack_directory = os.path.join(os.getcwd(), "TestPack")
+        else:
+            pack_directory = filedialog.askdirectory(parent=self.parent,
+                                                     title="Select the assembled pack to update.")
+            if not pack_directory:
                 return
+
+        username = self.UserName.get()
+        if username == self.default_username:
+            username = ""
+
+        model_writer = None
+        if int(self.settings['weld_models']) == 1 or int(self.settings['compact_models']) == 1:
+            model_writer = self.write_pack_models
+
+        entries = [[self.current_mode, self.lst_entries[self.current_mode][name]] for name in selected_names]
         try:
-            os.mkdir(mod_folderpath)
-        except:
+            report = build_entries_into_pack(pack_directory, entries, username, model_writer,
+                                             minify_dats=int(self.settings['minify_dats']) == 1)
+        except OSError as error:
             messagebox.showerror(parent=self.parent,
-                                 title="Unable to make Mod Folder",
-                                 message="Unable to make the mod folder to copy files to. Please try again.")
+                                 title="Could Not Update Pack",
+                                 message="Could not update the pack in {} ({}).".format(pack_directory, error))
             return
+        messagebox.showinfo(parent=self.parent, title="Updated Pack", message="\n".join(report))
 
-        # Move the various mod files into the [PackName]/user/[UserName]/PackName] folder.
-        for lst_type in self.lst_types:
+    def weld_pack_models(self, jobs):
+        """Write copies of the pack's models with coincident vertices welded and unused vertices removed, and report
+        the vertex and face counts for each file.
+
+        Files that cannot be processed are copied as they are.
+
+        Inputs:
+        jobs (list): [source path, output path] pairs
+        """
+        results = weld_model_files(jobs,
+                                   tolerance=float(self.settings['weld_tolerance']),
+                                   precision=int(self.settings['model_precision']))
+
+        failed = list()
+        report = list()
+        vertices = [0, 0]
+        for source, output, result in results:
+            if isinstance(result, Exception):
+                copy_source(source, output)
+                failed.append("{}: copied without welding ({})".format(os.path.basename(source), result))
+            else:
+                vertices[0] += result[0]
+                vertices[1] += result[2]
+                report.append("{}: {} -> {} vertices, {} -> {} faces".format(os.path.basename(source), result[0],
+                                                                           result[2], result[1], result[3]))
+        summary = "Welding {} model(s) removed {} of {} vertices, {} could not be welded.".format(
+            len(report), vertices[0] - vertices[1], vertices[0], len(failed))
+        print(summary + "\n" + "\n".join(failed + report))
+        messagebox.showinfo(parent=self.parent, title="Welded Models", message=shorten_report(summary, failed + report))
+
+    def compact_pack_models(self, jobs):
+        """Write compact copies of the pack's models and report the bytes saved for each file.
+
+        Files that cannot be re-encoded are copied as they are, or left as they are when compacting in place.
+
+        Inputs:
+        jobs (list): [source path, output path] pairs
+        """
+        results = compact_model_files(jobs, precision=int(self.settings['model_precision']))
+
+        failed = list()
+        report = list()
+        total_saved = 0
+        for source, output, result in results:
+            if isinstance(result, Exception):
+                if os.path.normcase(os.path.abspath(source)) == os.path.normcase(os.path.abspath(output)):
+                    # Compacting in place after welding, the welded file is already at the output path.
+                    failed.append("{}: left as it is ({})".format(os.path.basename(source), result))
+                    continue
+                copy_source(source, output)
+                failed.append("{}: copied without compacting ({})".format(os.path.basename(source), result))
+            else:
+                before, after = result
+                total_saved += before - after
+                report.append("{}: {} -> {} bytes ({} saved)".format(os.path.basename(source), before, after,
+                                                                     before - after))
+        summary = "Compacting {} model(s) saved {} bytes in total, {} could not be compacted.".format(
+            len(report), total_saved, len(failed))
+        print(summary + "\n" + "\n".join(failed + report))
+        messagebox.showinfo(parent=self.parent, title="Compacted Models",
+                            message=shorten_report(summary, failed + report))
+
+    def plan_coarse_models(self, mod_folderpath):
+        """Choose the output paths of the coarse models generated for the aircraft and ground objects without one.
+
+        Inputs:
+        mod_folderpath (str): folder that the pack's model files are copied to.
+
+        Outputs:
+        jobs (dict): visual model path to the path of its coarse model.
+        """
+        jobs = dict()
+        used_filenames = set(os.path.basename(path).lower()
+                             for lst_type in self.lst_types
+                             for instance in self.lst_entries[lst_type].values()
+                             for path in instance.return_paths().values() if path)
+        for lst_type in ['Aircraft', 'Ground']:
             for instance in self.lst_entries[lst_type].values():
-                source_paths = instance.return_paths()
-                output_paths = [os.path.join(mod_folderpath, lst_type.lower(), os.path.basename(i)) for i in source_paths]
+                if instance.Coarse or not instance.Visual_Model or instance.Visual_Model in jobs:
+                    continue
+
+                # Avoid overwriting another file in the mod folder if two visual models have the same filename.
+                filename = coarse_model_filename(instance.Visual_Model)
+                name, extension = os.path.splitext(filename)
+                count = 1
+                while filename.lower() in used_filenames:
+                    count += 1
+                    filename = "{}_{}{}".format(name, count, extension)
+                used_filenames.add(filename.lower())
+                jobs[instance.Visual_Model] = os.path.join(mod_folderpath, filename)
+
+        return jobs
+
+    def generate_missing_coarse_models(self, mod_folderpath, journal=None):
+        """Generate simplified coarse models for the aircraft and ground objects that do not have a coarse model.
 
-                for source, output in zip(source_paths, output_paths):
-                    try:
-                        shutil.copy(source, output)
-                    except PermissionError:
-                        messagebox.showerror(parent=self.parent,
-                                             title="Permissions Error",
-                                             message="Could not copy file(s) due to insufficient permissions. Please try selecting a different mod folder.")
-                        return
+        Models are simplified in parallel worker processes. Entries that share a visual model share the coarse model.
+
+        Inputs:
+        mod_folderpath (str): folder that the pack's model files are copied to.
+        journal (AssemblyJournal): journal of a resumed assembly. Coarse models it lists as complete are not remade.
+
+        Outputs:
+        generated (dict): visual model path to the path of the generated coarse model.
+        """
+        jobs = self.plan_coarse_models(mod_folderpath)
+        generated = dict()
+        options = "coarse={}".format(self.settings['coarse_target_polygons'])
+        if journal is not None:
+            for source, output in list(jobs.items()):
+                if journal.is_complete(output, [source], options):
+                    generated[source] = output
+                    del jobs[source]
+
+        results = generate_coarse_models(list(jobs.items()), int(self.settings['coarse_target_polygons']))
+
+        failed = list()
+        for source, output, result in results:
+            if isinstance(result, Exception):
+                failed.append("\n{}: {}".format(os.path.basename(source), result))
+            else:
+                generated[source] = output
+                if journal is not None:
+                    journal.record(output, [source], options)
+                print("Generated coarse model {} ({} -> {} faces)".format(os.path.basename(output), *result))
+
+        if len(failed) > 0:
+            messagebox.showwarning(parent=self.parent,
+                                   title="Could Not Generate Coarse Models",
+                                   message="The following coarse models could not be generated and will be left out of the LST file:" + "".join(failed))
+        return generated
 
 
 
@@ -1501,13 +2798,19 @@ class AirGndLSTEntry:
             if key in self.__dict__.keys():
                 setattr(self, key.replace(" ", "_"), value)
 
-    def make_lst_entry(self, pack_name, user_name):
-        """Make a single string for a line in the LST File."""
+    def make_lst_entry(self, pack_name, user_name, generated_coarse=""):
+        """Make a single string for a line in the LST File.
+
+        Inputs:
+        pack_name (str): name of the pack
+        user_name (str): YSFlight username for the user/[UserName] folder
+        generated_coarse (str): path of a generated coarse model to use if this entry has no coarse model defined.
+        """
         parts = [make_pack_filepath(self.DAT, pack_name, user_name, self.dat_new_name),
                  make_pack_filepath(self.Visual_Model, pack_name, user_name),
                  make_pack_filepath(self.Collision, pack_name, user_name),
                  make_pack_filepath(self.Cockpit, pack_name, user_name),
-                 make_pack_filepath(self.Coarse, pack_name, user_name)]
+                 make_pack_filepath(self.Coarse or generated_coarse, pack_name, user_name)]
         return " ".join(parts)
 
     def write_save_config_data(self):
@@ -1531,8 +2834,8 @@ class AirGndLSTEntry:
 
         # Move the files to the new locations
         for source, destination in zip(original_paths, output_paths):
-            if os.path.isfile(source):
-                shutil.copyfile(source, destination)
+            if source_exists(source):
+                copy_source(source, destination)
             else:
                 raise FileNotFoundError("Could not find file {} for {}.".format(source, self.IDENTIFY))
 
@@ -1600,11 +2903,11 @@ def extract_identify_from_dat(dat_file_path):
     """
 
     # Validate the dat file exists and is a dat file
-    if dat_file_path.endswith(".dat") is False or os.path.isfile(dat_file_path) is False:
+    if dat_file_path.endswith(".dat") is False or source_exists(dat_file_path) is False:
         return ""
 
     # Import DAT File
-    with open(dat_file_path, mode='r', errors='ignore') as dat_file:
+    with open_source(dat_file_path, mode='r', errors='ignore') as dat_file:
         dat = dat_file.readlines()
         for idx, line in enumerate(dat):
             if line.endswith("\n"):
@@ -1625,9 +2928,361 @@ def extract_identify_from_dat(dat_file_path):
         name = name.split('"')[1]  # Remove the quotation marks and extract contents within them.
         # NOTE: Most Ground Object Identify Lines do not have quotation marks
 
-    return name
+    return name.strip()
+
+
+
+def read_pack_configuration(input_filepath, default_delimiter=":="):
+    """Read a pack configuration file written by save_pack_configuration.
+
+    inputs
+    input_filepath (str): path to the pack configuration file
+    default_delimiter (str): delimiter between keys and values if the file does not record one
+
+    outputs
+    entries (dict): LST type to the list of AirGndLSTEntry or SceLSTEntry instances, in the order of the file
+    """
+    # Import the raw data
+    with open(input_filepath, mode='r') as config_file:
+        input_data = [line.rstrip("\n") for line in config_file.readlines()]
+
+    # Determine what the delimiter is. This should be in the second row. If it isn't then we should just default
+    # to the default delimiter in the tool.
+    if len(input_data) > 1 and input_data[1].startswith("DELIMITER:"):
+        delimiter = input_data[1][10:]
+    else:
+        delimiter = default_delimiter
+
+    entries = dict()
+    for lst_type, block_names, entry_class in [['Aircraft', ['AIRCRAFT', 'END_AIRCRAFT'], AirGndLSTEntry],
+                                               ['Ground', ['GROUND', 'END_GROUND'], AirGndLSTEntry],
+                                               ['Scenery', ['SCENERY', 'END_SCENERY'], SceLSTEntry]]:
+        entries[lst_type] = list()
+        if block_names[1] not in input_data:
+            continue
+        for block in split_list(input_data, block_names)[1:-1]:
+            temp_dict = dict()
+            for line in block:
+                if delimiter in line:  # Don't error out for the block name lines.
+                    key, value = line.split(delimiter, 1)
+                    temp_dict[key] = value
+            class_instance = entry_class()
+            class_instance.assign_values(temp_dict)
+            entries[lst_type].append(class_instance)
+    return entries
 
 
+def build_entries_into_pack(pack_directory, entries, username="", model_writer=None, dry_run=False, minify_dats=False):
+    """Copy the files of some LST entries into a previously assembled pack and update their lines in its LST files.
+
+    Only the files of the given entries are written, so fixing one entry of a large pack does not rebuild the pack. The
+    pack's manifest, if it has one, is updated with the hashes of the written files so that the pack still verifies.
+    Files that belong to other entries of the pack, by their LST lines or the manifest, are never overwritten.
+
+    inputs
+    pack_directory (str): folder of the assembled pack. Its name is the pack name.
+    entries (list): [LST type, AirGndLSTEntry or SceLSTEntry] for each entry to build
+    username (str): YSFlight username of the pack. Found from the pack's user folder if empty.
+    model_writer (function): called with [source, output] pairs to write the DNM and SRF models, or None to copy them
+    dry_run (bool): only report the files that would be written
+    minify_dats (bool): strip comments and blank lines from the DAT files as they are written
+
+    outputs
+    report (list): lines describing what was updated. Raises OSError if the build cannot succeed.
+    """
+    pack_directory = os.path.normpath(pack_directory)
+    pack_name = os.path.basename(pack_directory)
+    mod_folderpath = find_mod_folder(pack_directory, pack_name, username or None)
+    if mod_folderpath is None:
+        if not username:
+            raise FileNotFoundError("Could not find the user/[UserName]/{} folder of the pack".format(pack_name))
+        mod_folderpath = os.path.join(pack_directory, 'user', username, pack_name)
+    username = os.path.basename(os.path.dirname(mod_folderpath))
+
+    report = list()
+    plan = BuildPlan()
+    new_lines = {lst_type: list() for lst_type in LST_FILE_PREFIXES}
+    dat_jobs = dict()  # DAT output path to the IDENTIFY name written into it
+    built_entries = list()
+    for lst_type, instance in entries:
+        name = instance.map_name if lst_type == 'Scenery' else instance.IDENTIFY
+        sources = [source for source in instance.return_paths().values() if source]
+        missing = [source for source in sources if source_exists(source) is False]
+        if len(missing) > 0:
+            report.append("{}: skipped, missing {}".format(name, ", ".join(os.path.basename(i) for i in missing)))
+            continue
+        dat_output = ""
+        for file_type, source in instance.return_paths().items():
+            if not source:
+                continue
+            filename = os.path.basename(source)
+            if file_type == 'DAT' and instance.dat_new_name:
+                filename = instance.dat_new_name  # The LST line references the renamed DAT file.
+            if file_type == 'DAT' and lst_type != 'Scenery':
+                dat_output = os.path.join(mod_folderpath, filename)
+                dat_jobs[dat_output] = instance.IDENTIFY.strip()
+            plan.add(source, os.path.join(mod_folderpath, filename))
+        built_entries.append([lst_type, name, dat_output])
+        new_lines[lst_type].append([name, instance.make_lst_entry(pack_name, username)])
+
+    # The selected entries only know their own files, so check the outputs against the rest of the pack.
+    manifest_path = os.path.join(mod_folderpath, pack_name + MANIFEST_SUFFIX)
+    listed_paths = list()
+    if os.path.isfile(manifest_path):
+        root_folder, manifest = read_manifest(manifest_path)
+        listed_paths = [os.path.join(root_folder, *path.split("/")) for path in manifest]
+    claimed, shared = find_output_owners(pack_directory, built_entries, plan.outputs, listed_paths)
+    for output in list(claimed):
+        # Writing the same file again changes nothing for its other users (ex: a new livery using a shared model).
+        source = plan.outputs[output]
+        if claimed[output] and os.path.isfile(source) and os.path.isfile(output) and \
+                filecmp.cmp(source, output, shallow=False):
+            shared[output] = claimed.pop(output)
+    for output, names in sorted(shared.items()):
+        report.append("{}: shared with {}, which will use the new file".format(os.path.basename(output),
+                                                                             ", ".join(names)))
+
+    plan.stat_sources()
+    problems = plan.problems(pack_directory)
+    for output, names in sorted(claimed.items()):
+        if names:
+            problems.append("{} is used by other entries of the pack ({})".format(os.path.basename(output),
+                                                                              ", ".join(names)))
+        else:
+            problems.append("{} is already part of the pack but not used by the entries being built".format(
+                os.path.basename(output)))
+    if dry_run:
+        return report + plan.report(pack_directory) + problems
+    if len(problems) > 0:
+        raise OSError("The entries cannot be built: " + "; ".join(problems))
+    os.makedirs(mod_folderpath, exist_ok=True)
+
+    model_jobs = list()
+    if model_writer is not None:
+        model_jobs = [[source, output] for output, source in plan.outputs.items()
+                      if source.lower().endswith(('.dnm', '.srf'))]
+    written = dict()  # Output path to [size in bytes, BLAKE2b hex digest]
+    for output, source in plan.outputs.items():
+        if output in dat_jobs:
+            write_dat_identify(source, output, dat_jobs[output], minify_dats)
+            written[output] = hash_file(output)
+        elif model_writer is None or source.lower().endswith(('.dnm', '.srf')) is False:
+            written[output] = copy_and_hash(source, output)
+    if len(model_jobs) > 0:
+        model_writer(model_jobs)
+        for _, output in model_jobs:
+            written[output] = hash_file(output)
+    report.append("Wrote {} file(s) to {}".format(len(plan.outputs), mod_folderpath))
+
+    # Update the lines in place, using the pack's existing LST file if it has one.
+    existing_lst_files = find_lst_files(pack_directory)
+    for lst_type, lines in new_lines.items():
+        if len(lines) == 0:
+            continue
+        lst_filepaths = existing_lst_files[lst_type]
+        matching = [path for path in lst_filepaths if os.path.basename(path).lower().endswith(pack_name.lower() + ".lst")]
+        if len(matching) > 0 or len(lst_filepaths) > 0:
+            lst_filepath = (matching or lst_filepaths)[0]
+        else:
+            lst_folderpath = find_folder(pack_directory, lst_type.lower()) or os.path.join(pack_directory,
+                                                                                          lst_type.lower())
+            os.makedirs(lst_folderpath, exist_ok=True)
+            lst_filepath = os.path.join(lst_folderpath, "{}{}.lst".format(LST_FILE_PREFIXES[lst_type], pack_name))
+        num_replaced, num_added = replace_lst_lines(lst_filepath, pack_directory, lst_type, lines)
+        written[lst_filepath] = hash_file(lst_filepath)
+        report.append("{}: replaced {} line(s), added {} line(s)".format(os.path.basename(lst_filepath),
+                                                                          num_replaced, num_added))
+
+    if os.path.isfile(manifest_path):
+        root_folder, manifest = read_manifest(manifest_path)
+        for path, result in written.items():
+            manifest[os.path.relpath(path, root_folder).replace(os.sep, "/")] = result
+        write_manifest(manifest_path, root_folder, manifest)
+        report.append("{}: updated {} file(s)".format(os.path.basename(manifest_path), len(written)))
+    return report
+
+
+def build_entries_from_command_line(args):
+    """Build entries of a saved pack configuration into an assembled pack, selected by the --build-entries options.
+
+    inputs
+    args (argparse.Namespace): parsed command line arguments
+
+    outputs
+    report (list): lines describing what was updated. Raises OSError if the build cannot succeed.
+    """
+    entries = list()
+    for lst_type, instances in read_pack_configuration(args.build_entries).items():
+        if args.category and lst_type not in args.category:
+            continue
+        for instance in instances:
+            name = instance.map_name if lst_type == 'Scenery' else instance.IDENTIFY
+            if args.identify and not any(fnmatch.fnmatch(name.upper(), pattern.upper()) for pattern in args.identify):
+                continue
+            entries.append([lst_type, instance])
+
+    if len(entries) == 0:
+        return ["No entries of {} match the selection".format(args.build_entries)]
+    return build_entries_into_pack(args.pack, entries, args.username, dry_run=args.dry_run,
+                                   minify_dats=args.minify_dats)
+
+
+def run_command_line(arguments):
+    """Run one of the command line tools without opening the GUI.
+
+    Problems that stop a tool are printed and exit with status 1, as does --verify when the pack does not match its
+    manifest.
+
+    inputs
+    arguments (list): command line arguments after the script name
+    """
+    parser = argparse.ArgumentParser(description="Build, patch and check YSFlight packs without opening the GUI.")
+    command = parser.add_mutually_exclusive_group(required=True)
+    command.add_argument('--build-entries', metavar='CONFIG',
+                         help="build entries of a pack configuration (.cfg) file into the assembled pack given by "
+                              "--pack, updating their LST lines in place")
+    command.add_argument('--make-patch', nargs=3, metavar=('OLD_MANIFEST', 'NEW_MANIFEST', 'PATCH'),
+                         help="write an update patch from the old version of a pack to the new version")
+    command.add_argument('--apply-patch', nargs=2, metavar=('PATCH', 'MANIFEST'),
+                         help="update the pack of the manifest in place with a patch")
+    command.add_argument('--dat-table', nargs=2, metavar=('CONFIG', 'OUTPUT'),
+                         help="write the DAT parameter table of a pack configuration to a .csv or .parquet file")
+    command.add_argument('--verify', metavar='MANIFEST',
+                         help="check an installed or assembled pack against its manifest")
+
+    build_options = parser.add_argument_group("--build-entries options")
+    build_options.add_argument('--pack', help="folder of the assembled pack to update")
+    build_options.add_argument('--username', default="", help="YSFlight username, found from the pack if not given")
+    build_options.add_argument('--identify', action='append', default=[],
+                               help="IDENTIFY or map name pattern to build (ex: 'MIG-23*'), may be repeated")
+    build_options.add_argument('--category', action='append', default=[], choices=list(LST_FILE_PREFIXES),
+                               help="LST type to build, may be repeated")
+    build_options.add_argument('--dry-run', action='store_true', help="list the files that would be written and stop")
+    build_options.add_argument('--minify-dats', action='store_true',
+                               help="strip comments and blank lines from DAT files")
+    args = parser.parse_args(arguments)
+    if args.build_entries and not args.pack:
+        parser.error("--build-entries needs --pack")
+
+    problems = False
+    try:
+        if args.build_entries:
+            report = build_entries_from_command_line(args)
+        elif args.make_patch:
+            report = [format_patch_summary(make_patch(*args.make_patch))]
+        elif args.apply_patch:
+            try:
+                report = ["Updated {} file(s) of the pack.".format(apply_patch(*args.apply_patch))]
+            except zipfile.BadZipFile as error:
+                raise ValueError("{} is not a patch ({})".format(args.apply_patch[0], error))
+        elif args.dat_table:
+            report = export_dat_table_from_configuration(*args.dat_table)
+        else:
+            results = verify_pack(args.verify)
+            report = format_verify_results(results)
+            problems = len(results['missing'] + results['modified'] + results['extra']) > 0
+    except (OSError, ValueError, KeyError, ImportError) as error:
+        if args.apply_patch:
+            print("The pack was not changed. {}".format(error))
+        else:
+            print(error)
+        sys.exit(1)
+
+    for line in report:
+        print(line)
+    if problems:
+        sys.exit(1)
+
+
+def write_dat_table(entries, table_path, max_outliers=20):
+    """Write the numeric DAT values of some entries to a CSV or Parquet table, by the extension of table_path.
+
+    inputs
+    entries (list): [entry name, dat file path] pairs
+    table_path (str): path of the .csv or .parquet file to write
+    max_outliers (int): largest number of outliers listed in the report
+
+    outputs
+    report (list): lines describing the table, the range of the balance values and their outliers
+    """
+    table = DatTable.from_dat_files(entries)
+    if table_path.lower().endswith(".parquet"):
+        table.to_parquet(table_path)
+    else:
+        table.to_csv(table_path)
+
+    report = ["Wrote {} DAT variables of {} entries to {}.".format(len(table.keys), len(entries), table_path), ""]
+    balance_keys = [key for key in BALANCE_KEYS if key in table.keys]
+    for key, (count, minimum, median, maximum) in table.summary(balance_keys).items():
+        report.append("{}: {} values, {:g} to {:g}, median {:g} {}".format(key, count, minimum, maximum, median,
+                                                                          table.units.get(key, "")).rstrip())
+    outliers = table.outliers(balance_keys)
+    if len(outliers) > 0:
+        report.append("\nValues that stand out from the rest of the pack:")
+        for name, key, value, median, _ in outliers[:max_outliers]:
+            report.append("{}: {} {:g} {} (median {:g})".format(name, key, value, table.units.get(key, ""), median))
+        if len(outliers) > max_outliers:
+            report.append("... and {} more".format(len(outliers) - max_outliers))
+    return report
+
+
+def export_dat_table_from_configuration(config_file_path, table_path):
+    """Write the DAT parameter table of the aircraft and ground objects of a saved pack configuration.
+
+    outputs
+    report (list): lines describing the table, as from write_dat_table
+    """
+    entries = [[instance.IDENTIFY, instance.DAT]
+               for lst_type, instances in read_pack_configuration(config_file_path).items() if lst_type != 'Scenery'
+               for instance in instances if instance.DAT]
+    return write_dat_table(entries, table_path)
+
+
+def generate_variant_entries(template_entry, variants, output_folder):
+    """Write a DAT file for each variant of an aircraft or ground object and make its LST entry.
+
+    inputs
+    template_entry (AirGndLSTEntry): entry whose DAT file is the template and whose model files the variants share
+    variants (iterable): {DAT variable: value} for each variant, with its IDENTIFY, as from read_variant_table
+    output_folder (str): folder to write the variant dat files to
+
+    outputs
+    Yields an AirGndLSTEntry for each variant once its DAT file is written.
+    """
+    for identify, dat_file_path in generate_dat_variants(template_entry.DAT, variants, output_folder):
+        lst_entry = AirGndLSTEntry()
+        lst_entry.assign_values(template_entry.write_save_config_data())
+        lst_entry.DAT = dat_file_path
+        lst_entry.IDENTIFY = identify
+        lst_entry.dat_rename = False
+        lst_entry.dat_new_name = ""
+        yield lst_entry
+
+
+def format_verify_results(results):
+    """Describe the results of verify_pack, one line per problem after a summary line."""
+    report = ["{} file(s) match the manifest".format(results['ok'])]
+    for key, description in [['missing', "Missing"], ['modified', "Modified"], ['extra', "Not in the manifest"]]:
+        for path in results[key]:
+            report.append("{}: {}".format(description, path))
+    return report
+
+
+def shorten_report(summary, lines, max_lines=30):
+    """Return a summary followed by the first max_lines lines of a report, short enough to show in a message box."""
+    message = [summary, ""] + lines[:max_lines]
+    if len(lines) > max_lines:
+        message.append("... and {} more, see the console for the full list.".format(len(lines) - max_lines))
+    return "\n".join(message)
+
+
+def format_patch_summary(summary):
+    """Describe the summary returned by make_patch."""
+    return ("Added {} file(s), removed {}, replaced {} and stored {} as deltas.\n"
+            "The patch is {}, the full pack is {}.".format(summary['added'], summary['removed'], summary['replaced'],
+                                                           summary['delta'], format_size(summary['patch_size']),
+                                                           format_size(summary['full_size'])))
+
 
 def make_pack_filepath(raw_filepath, pack_name, user_name, new_filename=""):
     if len(raw_filepath) == 0:
@@ -1655,6 +3310,90 @@ class Dialog(Frame):
         self.pack(fill='both',expand=True)
 
 
+class ArchiveMemberPicker(Dialog):
+    """List the files inside a zip archive and let the user pick one, in place of the file selection dialog."""
+    def __init__(self, parent, prompt, archive_name, members, title="Select File in Archive"):
+        super().__init__(parent, title)
+        self.parent = parent
+        self.members = members
+        self.selected_member = ""
+        self.browse = False
+
+        Main = Frame(self.applet)
+        Label(Main, text="{}\n{}".format(prompt, archive_name)).grid(row=0, column=0, columnspan=3, sticky="W")
+        self.member_listbox = Listbox(Main, width=60, height=15, selectmode=SINGLE)
+        self.member_listbox.grid(row=1, column=0, columnspan=2, sticky="NSEW")
+        scrollbar = Scrollbar(Main, orient=VERTICAL, command=self.member_listbox.yview)
+        scrollbar.grid(row=1, column=2, sticky="NS")
+        self.member_listbox.config(yscrollcommand=scrollbar.set)
+        for member in self.members:
+            self.member_listbox.insert(END, member)
+        self.member_listbox.bind("<Double-Button-1>", lambda event: self.select_member())
+
+        Button(Main, text="Browse Folders", command=self.browse_folders).grid(row=2, column=0, sticky="NSEW")
+        Button(Main, text="Cancel", command=self.applet.destroy).grid(row=2, column=1, sticky="NSEW")
+        Button(Main, text="Select", command=self.select_member).grid(row=2, column=2, sticky="NSEW")
+        Main.pack()
+
+        # Wait for the user to make a choice before returning to the caller.
+        self.applet.wait_window()
+
+    def select_member(self):
+        """Store the selected file and close."""
+        selection = self.member_listbox.curselection()
+        if selection:
+            self.selected_member = self.members[selection[0]]
+            self.applet.destroy()
+
+    def browse_folders(self):
+        """Close and let the caller show the regular file selection dialog."""
+        self.browse = True
+        self.applet.destroy()
+
+
+class ModelFileSuggestionPicker(Dialog):
+    """Show the suggested model files of a DAT file and let the user fill them all in with one click."""
+    def __init__(self, parent, dat_name, dat_folder, suggestions, current_paths, title="Suggested Model Files"):
+        super().__init__(parent, title)
+        self.parent = parent
+        self.selected_paths = ["" for _ in MODEL_SLOTS]
+
+        # Suggestions are shown relative to the DAT file's folder. Slots that already have a file default to keeping it.
+        self.choices = list()
+        self.selections = list()
+        for slot, current_path in zip(MODEL_SLOTS, current_paths):
+            names = {os.path.relpath(path, dat_folder): path for path, _ in suggestions[slot]}
+            self.choices.append(names)
+            default = "" if current_path or len(names) == 0 else next(iter(names))
+            self.selections.append(StringVar(value=default))
+
+        Main = Frame(self.applet)
+        Label(Main, text="Model files that look like they belong with {}:".format(dat_name)
+              ).grid(row=0, column=0, columnspan=2, sticky="W")
+        for row_num, slot in enumerate(MODEL_SLOTS, start=1):
+            Label(Main, text=slot + ":").grid(row=row_num, column=0, sticky="W")
+            OptionMenu(Main,
+                       self.selections[row_num - 1],
+                       self.selections[row_num - 1].get(),
+                       "",
+                       *self.choices[row_num - 1]
+                       ).grid(row=row_num, column=1, sticky="EW")
+
+        row_num = len(MODEL_SLOTS) + 1
+        Button(Main, text="Cancel", command=self.applet.destroy).grid(row=row_num, column=0, sticky="NSEW")
+        Button(Main, text="Fill", command=self.fill).grid(row=row_num, column=1, sticky="NSEW")
+        Main.pack()
+
+        # Wait for the user to make a choice before returning to the caller.
+        self.applet.wait_window()
+
+    def fill(self):
+        """Store the chosen files and close. Slots left blank keep their current file."""
+        self.selected_paths = [choices.get(selection.get(), "")
+                               for choices, selection in zip(self.choices, self.selections)]
+        self.applet.destroy()
+
+
 class Settings(Dialog):
     """Provide a convenient way to set the program's settings in a custom GUI."""
     def __init__(self, parent, title="Settings"):
@@ -1676,6 +3415,22 @@ class Settings(Dialog):
         self.selected_num_rows = StringVar(value=str(self.parent.settings['preview_num_rows']))
         self.selected_char_width = StringVar(value=str(self.parent.settings['preview_char_width']))
         self.ask_before_delete_entry = IntVar(value=self.parent.settings['ask_before_entry_removal'])
+        self.check_model_geometry = IntVar(value=self.parent.settings['check_model_geometry'])
+        self.suggest_model_files = IntVar(value=self.parent.settings['suggest_model_files'])
+        self.generate_coarse_models = IntVar(value=self.parent.settings['generate_coarse_models'])
+        self.coarse_target_polygons = StringVar(value=str(self.parent.settings['coarse_target_polygons']))
+        self.collision_face_budget = StringVar(value=str(self.parent.settings['collision_face_budget']))
+        self.compact_models = IntVar(value=self.parent.settings['compact_models'])
+        self.minify_dats = IntVar(value=self.parent.settings['minify_dats'])
+        self.model_precision = StringVar(value=str(self.parent.settings['model_precision']))
+        self.weld_models = IntVar(value=self.parent.settings['weld_models'])
+        self.weld_tolerance = StringVar(value=str(self.parent.settings['weld_tolerance']))
+        self.volume_size_mb = StringVar(value=str(self.parent.settings['volume_size_mb']))
+        self.duplicate_similarity = StringVar(value=str(self.parent.settings['duplicate_similarity']))
+        self.check_scenery_files = IntVar(value=self.parent.settings['check_scenery_files'])
+        self.check_scenery_references = IntVar(value=self.parent.settings['check_scenery_references'])
+        self.placement_overlap_distance = StringVar(value=str(self.parent.settings['placement_overlap_distance']))
+        self.YSFlight_Directory = StringVar(value=self.parent.settings['ysflight_directory'])
 
         self.build_settings_gui()
 
@@ -1692,6 +3447,11 @@ class Settings(Dialog):
         Entry(Main, textvariable=self.Working_Directory, width=30).grid(row=row_num, column=1, sticky="WE")
         Button(Main, text="Select Folder", command=self.select_working_folder).grid(row=row_num, column=2, sticky="NSEW")
 
+        row_num += 1
+        Label(Main, text="YSFlight Directory").grid(row=row_num, column=0, sticky="W")
+        Entry(Main, textvariable=self.YSFlight_Directory, width=30).grid(row=row_num, column=1, sticky="WE")
+        Button(Main, text="Select Folder", command=self.select_ysflight_folder).grid(row=row_num, column=2, sticky="NSEW")
+
         row_num += 1
         Label(Main, text="Preview Rows:").grid(row=row_num, column=0, sticky="W")
         OptionMenu(Main,
@@ -1714,6 +3474,82 @@ class Settings(Dialog):
                     variable=self.ask_before_delete_entry
                     ).grid(row=row_num, column=0, columnspan=3, sticky="EW")
 
+        row_num += 1
+        Checkbutton(Main,
+                    text="Check DAT positions against models when validating?",
+                    variable=self.check_model_geometry
+                    ).grid(row=row_num, column=0, columnspan=3, sticky="EW")
+
+        row_num += 1
+        Checkbutton(Main,
+                    text="Suggest model files when a DAT file is selected?",
+                    variable=self.suggest_model_files
+                    ).grid(row=row_num, column=0, columnspan=3, sticky="EW")
+
+        row_num += 1
+        Checkbutton(Main,
+                    text="Generate missing coarse models when exporting?",
+                    variable=self.generate_coarse_models
+                    ).grid(row=row_num, column=0, columnspan=3, sticky="EW")
+
+        row_num += 1
+        Label(Main, text="Coarse Model Faces:").grid(row=row_num, column=0, sticky="W")
+        Entry(Main, textvariable=self.coarse_target_polygons, width=10).grid(row=row_num, column=1, sticky="W")
+
+        row_num += 1
+        Label(Main, text="Collision Model Faces:").grid(row=row_num, column=0, sticky="W")
+        Entry(Main, textvariable=self.collision_face_budget, width=10).grid(row=row_num, column=1, sticky="W")
+
+        row_num += 1
+        Checkbutton(Main,
+                    text="Compact DNM and SRF files when exporting?",
+                    variable=self.compact_models
+                    ).grid(row=row_num, column=0, columnspan=3, sticky="EW")
+
+        row_num += 1
+        Checkbutton(Main,
+                    text="Strip comments and padding from DAT files when exporting?",
+                    variable=self.minify_dats
+                    ).grid(row=row_num, column=0, columnspan=3, sticky="EW")
+
+        row_num += 1
+        Label(Main, text="Model Decimals:").grid(row=row_num, column=0, sticky="W")
+        Entry(Main, textvariable=self.model_precision, width=10).grid(row=row_num, column=1, sticky="W")
+
+        row_num += 1
+        Checkbutton(Main,
+                    text="Weld duplicate vertices in DNM and SRF files when exporting?",
+                    variable=self.weld_models
+                    ).grid(row=row_num, column=0, columnspan=3, sticky="EW")
+
+        row_num += 1
+        Label(Main, text="Weld Distance (m):").grid(row=row_num, column=0, sticky="W")
+        Entry(Main, textvariable=self.weld_tolerance, width=10).grid(row=row_num, column=1, sticky="W")
+
+        row_num += 1
+        Label(Main, text="Volume Size (MB, 0 = off):").grid(row=row_num, column=0, sticky="W")
+        Entry(Main, textvariable=self.volume_size_mb, width=10).grid(row=row_num, column=1, sticky="W")
+
+        row_num += 1
+        Label(Main, text="Duplicate Model Similarity (0-1):").grid(row=row_num, column=0, sticky="W")
+        Entry(Main, textvariable=self.duplicate_similarity, width=10).grid(row=row_num, column=1, sticky="W")
+
+        row_num += 1
+        Checkbutton(Main,
+                    text="Check FLD file structure when validating?",
+                    variable=self.check_scenery_files
+                    ).grid(row=row_num, column=0, columnspan=3, sticky="EW")
+
+        row_num += 1
+        Checkbutton(Main,
+                    text="Check names used by FLD and YFS files when validating?",
+                    variable=self.check_scenery_references
+                    ).grid(row=row_num, column=0, columnspan=3, sticky="EW")
+
+        row_num += 1
+        Label(Main, text="Overlap Distance (m):").grid(row=row_num, column=0, sticky="W")
+        Entry(Main, textvariable=self.placement_overlap_distance, width=10).grid(row=row_num, column=1, sticky="W")
+
         row_num += 1
         Separator(Main).grid(row=row_num, column=1, columnspan=2, sticky="EW", pady=5)
 
@@ -1730,7 +3566,38 @@ class Settings(Dialog):
         self.parent.settings['preview_num_rows'] = int(self.selected_num_rows.get())
         self.parent.settings['working_directory'] = self.Working_Directory.get()
         self.parent.settings['user_name'] = self.UserName.get()
+        self.parent.settings['ysflight_directory'] = self.YSFlight_Directory.get()
         self.parent.settings['ask_before_entry_removal'] = int(self.ask_before_delete_entry.get())
+        self.parent.settings['check_model_geometry'] = int(self.check_model_geometry.get())
+        self.parent.settings['suggest_model_files'] = int(self.suggest_model_files.get())
+        self.parent.settings['generate_coarse_models'] = int(self.generate_coarse_models.get())
+        if self.coarse_target_polygons.get().strip().isdigit():
+            self.parent.settings['coarse_target_polygons'] = max(1, int(self.coarse_target_polygons.get()))
+        if self.collision_face_budget.get().strip().isdigit():
+            self.parent.settings['collision_face_budget'] = max(4, int(self.collision_face_budget.get()))
+        self.parent.settings['compact_models'] = int(self.compact_models.get())
+        self.parent.settings['minify_dats'] = int(self.minify_dats.get())
+        if self.model_precision.get().strip().isdigit():
+            self.parent.settings['model_precision'] = min(6, int(self.model_precision.get()))
+        self.parent.settings['weld_models'] = int(self.weld_models.get())
+        try:
+            self.parent.settings['weld_tolerance'] = max(0.0, float(self.weld_tolerance.get()))
+        except ValueError:
+            pass  # Keep the previous weld distance
+        try:
+            self.parent.settings['volume_size_mb'] = max(0.0, float(self.volume_size_mb.get()))
+        except ValueError:
+            pass  # Keep the previous volume size
+        try:
+            self.parent.settings['duplicate_similarity'] = min(1.0, max(0.0, float(self.duplicate_similarity.get())))
+        except ValueError:
+            pass  # Keep the previous similarity
+        self.parent.settings['check_scenery_files'] = int(self.check_scenery_files.get())
+        self.parent.settings['check_scenery_references'] = int(self.check_scenery_references.get())
+        try:
+            self.parent.settings['placement_overlap_distance'] = max(0.0, float(self.placement_overlap_distance.get()))
+        except ValueError:
+            pass  # Keep the previous overlap distance
 
         # Close the window
         self.applet.destroy()
@@ -1749,6 +3616,15 @@ class Settings(Dialog):
             # Set the appropriate variable
             self.Working_Directory.set(path)
 
+    def select_ysflight_folder(self):
+        """Select the YSFlight installation to check the pack's names against."""
+        prompt = "Select the Directory where YSFlight is installed."
+        path = filedialog.askdirectory(parent=self, title=prompt, mustexist=True, initialdir=self.YSFlight_Directory.get())
+
+        # Validate the path
+        if path:
+            self.YSFlight_Directory.set(path)
+
 
 def split_list(input_list, delimiter_element):
     """Split a list into a list of lists based on a delimiter element or elements, deleting empty lists along the way
@@ -1786,5 +3662,8 @@ def split_list(input_list, delimiter_element):
 
 # Run the program. This must be at the end of the file.
 if __name__ == "__main__":
-    main()
-    
+    if any(argument in COMMAND_LINE_TOOLS for argument in sys.argv[1:]):
+        run_command_line(sys.argv[1:])
+    else:
+        main()
+
@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Helpers for assembling packs in a staging folder that can be resumed after an interruption.
+
+A pack is assembled in a staging folder next to the final pack folder ([PackName].partial). Every output file that is
+completed is added to a journal in the staging folder along with its size, BLAKE2 hash and the signature of the source
+files it was made from. If assembly stops part way through (full disk, closed program), the next run keeps the outputs
+that still match the journal and only makes the rest. Once everything is done the staging folder is renamed to the
+pack folder, so a pack folder is never left half written.
+
+Before anything is written, a build plan works out every output path and the number of bytes to write from a single stat
+of each source file, so that builds that cannot succeed (missing files, two files with the same name, not enough disk
+space) are stopped straight away.
+
+A finished pack includes a manifest of the size and BLAKE2 hash of every file, taken from the journal, so the hashes
+come from the data as it was copied. verify_pack hashes an installed pack against its manifest in parallel to find
+files that are missing, modified or should not be there.
+"""
+
+
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from YSF_Source_Files import open_source, source_signature
+
+
+# Suffix of the staging folder and name of the journal file inside it.
+STAGING_SUFFIX = ".partial"
+JOURNAL_FILENAME = "assembly_journal.jsonl"
+
+# Bytes read at a time when copying and hashing files.
+CHUNK_SIZE = 1024 * 1024
+
+# Extension of the manifest file written in the pack's mod folder, and the version of its layout.
+MANIFEST_SUFFIX = ".manifest"
+MANIFEST_VERSION = 1
+
+
+def hash_file(path, chunk_size=CHUNK_SIZE):
+    """Return [size in bytes, BLAKE2b hex digest] of a file on disk."""
+    digest = hashlib.blake2b()
+    size = 0
+    with open(path, mode='rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    return [size, digest.hexdigest()]
+
+
+def copy_and_hash(source_path, output_path, chunk_size=CHUNK_SIZE):
+    """Copy a source file, on disk or in an archive, hashing the data as it is written so it is only read once.
+
+    outputs
+    result (list): [size in bytes, BLAKE2b hex digest] of the copied file
+    """
+    digest = hashlib.blake2b()
+    size = 0
+    with open_source(source_path, mode='rb') as source, open(output_path, mode='wb') as output:
+        for chunk in iter(lambda: source.read(chunk_size), b""):
+            output.write(chunk)
+            digest.update(chunk)
+            size += len(chunk)
+    if os.path.isfile(source_path):
+        shutil.copymode(source_path, output_path)
+    return [size, digest.hexdigest()]
+
+
+def staging_folder_path(pack_folder):
+    """Return the path of the staging folder used while assembling the pack folder."""
+    return os.path.normpath(pack_folder) + STAGING_SUFFIX
+
+
+def finish_staging(staging_folder, pack_folder):
+    """Remove the journal and move the staging folder into place as the pack folder.
+
+    A previous pack folder is moved aside first and only deleted once the new pack is in place, so one of the two is
+    complete at all times.
+    """
+    journal_path = os.path.join(staging_folder, JOURNAL_FILENAME)
+    if os.path.exists(journal_path):
+        os.remove(journal_path)
+
+    old_folder = None
+    if os.path.exists(pack_folder):
+        old_folder = os.path.normpath(pack_folder) + ".old"
+        if os.path.exists(old_folder):
+            shutil.rmtree(old_folder)
+        os.rename(pack_folder, old_folder)
+    os.rename(staging_folder, pack_folder)
+    if old_folder is not None:
+        shutil.rmtree(old_folder, ignore_errors=True)
+
+
+def discard_staging(staging_folder):
+    """Delete a staging folder left by an assembly that will not be resumed."""
+    shutil.rmtree(staging_folder, ignore_errors=True)
+
+
+def format_size(num_bytes):
+    """Return a number of bytes as a short readable string (ex: 1.5 MB)."""
+    for unit in ['bytes', 'KB', 'MB', 'GB']:
+        if abs(num_bytes) < 1024 or unit == 'GB':
+            return "{} {}".format(num_bytes, unit) if unit == 'bytes' else "{:.1f} {}".format(num_bytes, unit)
+        num_bytes /= 1024
+
+
+class BuildPlan:
+    """The output files of a build and the source files they are made from.
+
+    Output paths are compared without regard to case, as YSFlight is mostly run on Windows, so two sources that would
+    be written to the same file are reported as a collision instead of one silently replacing the other.
+    """
+    def __init__(self):
+        self.outputs = dict()  # Output path to source path
+        self.generated = dict()  # Output path to source path of generated files, at most the size of the source
+        self.claims = dict()  # Lower case output path to the source paths that would be written to it
+        self.entries = dict()  # LST entry to the output paths it uses
+        self.signatures = dict()  # Source path to [modification time in ns, size in bytes], or None if missing
+
+    def add(self, source_path, output_path, entry=None):
+        """Add an output file that is copied or converted from a source file.
+
+        inputs
+        source_path (str): path to the source file
+        output_path (str): path the file is written to
+        entry (tuple): LST entry (ex: (LST type, IDENTIFY)) that uses the file, if any
+        """
+        sources = self.claims.setdefault(os.path.normcase(output_path).lower(), list())
+        if source_path not in sources:
+            sources.append(source_path)
+        self.outputs.setdefault(output_path, source_path)
+        if entry is not None:
+            self.entries.setdefault(entry, list()).append(output_path)
+
+    def add_generated(self, source_path, output_path, entry=None):
+        """Add a generated output (ex: a coarse model) whose size is estimated by the size of its source."""
+        sources = self.claims.setdefault(os.path.normcase(output_path).lower(), list())
+        if source_path not in sources:
+            sources.append(source_path)
+        self.generated[output_path] = source_path
+        if entry is not None:
+            self.entries.setdefault(entry, list()).append(output_path)
+
+    def stat_sources(self, max_workers=8):
+        """Read the signature of every source file once, in parallel, for the size estimate and the journal."""
+        sources = sorted(set(self.outputs.values()).union(self.generated.values()) - set(self.signatures))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            self.signatures.update(zip(sources, executor.map(source_signature, sources)))
+
+    def missing(self):
+        """Return the source files that could not be found."""
+        return sorted(source for source, signature in self.signatures.items() if signature is None)
+
+    def collisions(self):
+        """Return [output path, [source paths]] for the outputs that more than one source would be written to."""
+        return [[output, sources] for output, sources in sorted(self.claims.items()) if len(sources) > 1]
+
+    def output_size(self, output_path):
+        """Return the size in bytes of an output, estimated from its source."""
+        signature = self.signatures.get(self.outputs.get(output_path) or self.generated.get(output_path))
+        return signature[1] if signature is not None else 0
+
+    def total_bytes(self):
+        """Return the number of bytes the build will write."""
+        return sum(self.output_size(output) for output in list(self.outputs) + list(self.generated))
+
+    def problems(self, output_folder, num_bytes_written=0):
+        """Return the reasons the build cannot succeed, or an empty list.
+
+        inputs
+        output_folder (str): existing folder the build is written in, used to find the free disk space
+        num_bytes_written (int): bytes already written by a previous run that will be kept
+        """
+        return self.source_problems() + self.space_problems(output_folder, num_bytes_written)
+
+    def source_problems(self):
+        """Return the missing source files and the outputs that several sources would be written to."""
+        problems = list()
+        for source in self.missing():
+            problems.append("Missing source file: {}".format(source))
+        for output, sources in self.collisions():
+            problems.append("{} would be written by each of: {}".format(os.path.basename(output), ", ".join(sources)))
+        return problems
+
+    def space_problems(self, output_folder, num_bytes_written=0):
+        """Return a problem if the disk holding output_folder does not have room for the rest of the build."""
+        required = self.total_bytes() - num_bytes_written
+        free = shutil.disk_usage(output_folder).free
+        if required > free:
+            return ["The build needs {} but only {} is free in {}".format(format_size(required), format_size(free),
+                                                                        output_folder)]
+        return list()
+
+    def report(self, root_folder):
+        """Return the lines of a dry run report listing every output, relative to root_folder, and its size."""
+        lines = ["{} file(s), {} to write".format(len(self.outputs) + len(self.generated),
+                                                  format_size(self.total_bytes()))]
+        for output, source in sorted(self.outputs.items()):
+            signature = self.signatures.get(source)
+            size = format_size(signature[1]) if signature is not None else "missing"
+            lines.append("{}  ({}) <- {}".format(os.path.relpath(output, root_folder), size, source))
+        for output, source in sorted(self.generated.items()):
+            lines.append("{}  (up to {}) <- generated from {}".format(os.path.relpath(output, root_folder),
+                                                                      format_size(self.output_size(output)), source))
+        return lines
+
+
+def write_manifest(manifest_path, root_folder, files):
+    """Write the manifest of a pack.
+
+    inputs
+    manifest_path (str): path of the manifest, inside the pack's mod folder
+    root_folder (str): folder holding the pack's aircraft, ground, scenery and user folders
+    files (dict): path relative to root_folder, with / separators, to [size in bytes, BLAKE2b hex digest]
+    """
+    data = {'version': MANIFEST_VERSION,
+            'manifest': os.path.relpath(manifest_path, root_folder).replace(os.sep, "/"),
+            'files': {path: {'size': size, 'blake2': digest} for path, (size, digest) in sorted(files.items())}}
+    with open(manifest_path, mode='w') as manifest_file:
+        json.dump(data, manifest_file, indent=1)
+
+
+def read_manifest(manifest_path):
+    """Read a pack manifest.
+
+    outputs
+    root_folder (str): folder the paths of the manifest are relative to, found from where the manifest is
+    files (dict): relative path to [size in bytes, BLAKE2b hex digest]
+    """
+    with open(manifest_path, mode='r') as manifest_file:
+        data = json.load(manifest_file)
+    if data.get('version') != MANIFEST_VERSION:
+        raise ValueError("{} is not a version {} pack manifest".format(manifest_path, MANIFEST_VERSION))
+    root_folder = os.path.abspath(manifest_path)
+    for _ in data['manifest'].split("/"):
+        root_folder = os.path.dirname(root_folder)
+    return root_folder, {path: [value['size'], value['blake2']] for path, value in data['files'].items()}
+
+
+def verify_pack(manifest_path, max_workers=None):
+    """Check the files of an installed or extracted pack against its manifest.
+
+    Files are hashed in a thread pool. hashlib releases the GIL while hashing, so the work is spread over every core
+    and the disk is kept busy. Files whose size is wrong are reported without being read. Extra files are only looked
+    for in the folder holding the manifest, as the pack may be installed in a YSFlight folder with other content, and
+    the other manifests in that folder, such as those of the pack's other volumes, and the files they list are allowed.
+
+    inputs
+    manifest_path (str): path to the pack's manifest
+    max_workers (int): number of threads, None for the ThreadPoolExecutor default
+
+    outputs
+    results (dict): 'missing', 'modified' and 'extra' lists of relative paths, and the number of 'ok' files
+    """
+    root_folder, files = read_manifest(manifest_path)
+    results = {'missing': list(), 'modified': list(), 'extra': list(), 'ok': 0}
+
+    def check(item):
+        path, (size, digest) = item
+        full_path = os.path.join(root_folder, *path.split("/"))
+        try:
+            if os.path.getsize(full_path) != size:
+                return 'modified'
+            return 'ok' if hash_file(full_path) == [size, digest] else 'modified'
+        except OSError:
+            return 'missing'
+
+    items = sorted(files.items())
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for (path, _), result in zip(items, executor.map(check, items)):
+            if result == 'ok':
+                results['ok'] += 1
+            else:
+                results[result].append(path)
+
+    manifest_folder = os.path.dirname(os.path.abspath(manifest_path))
+    listed = {os.path.normcase(os.path.join(root_folder, *path.split("/"))) for path in files}
+    listed.add(os.path.normcase(os.path.abspath(manifest_path)))
+    found = [os.path.join(folder, name) for folder, _, names in os.walk(manifest_folder) for name in names]
+
+    # The volumes of a split pack share the folder, so the other manifests and the files they list are not extra.
+    for path in found:
+        if path.lower().endswith(MANIFEST_SUFFIX) and os.path.normcase(path) not in listed:
+            try:
+                other_root, other_files = read_manifest(path)
+            except (OSError, ValueError, KeyError):
+                continue
+            listed.add(os.path.normcase(path))
+            listed.update(os.path.normcase(os.path.join(other_root, *other.split("/"))) for other in other_files)
+
+    for path in found:
+        if os.path.normcase(path) not in listed:
+            results['extra'].append(os.path.relpath(path, root_folder).replace(os.sep, "/"))
+    results['extra'].sort()
+    return results
+
+
+def plan_volumes(entry_files, file_sizes, size_cap):
+    """Split the entries of a pack into volumes of at most size_cap bytes.
+
+    Entries that share files (ex: several DAT files using one visual model) are grouped with a union-find so that the
+    shared files are only needed in one volume. The groups are placed with first-fit decreasing bin packing. A group
+    that does not fit in a volume by itself is split into its entries, each of which brings its own copy of the shared
+    files to the volume it is placed in, and an entry larger than the cap gets a volume of its own.
+
+    inputs
+    entry_files (dict): entry to the list of files it uses
+    file_sizes (dict): file to its size in bytes
+    size_cap (int): maximum number of bytes in a volume
+
+    outputs
+    volumes (list): [entries, files, bytes] for each volume, entries in the order of entry_files
+    """
+    parent = dict()
+
+    def find(item):
+        while parent.setdefault(item, item) != item:
+            parent[item] = parent[parent[item]]  # Path halving
+            item = parent[item]
+        return item
+
+    order = {entry: idx for idx, entry in enumerate(entry_files)}
+    for entry, files in entry_files.items():
+        find(("entry", entry))
+        for file in files:
+            parent[find(("file", file))] = find(("entry", entry))
+
+    groups = dict()
+    for entry in entry_files:
+        groups.setdefault(find(("entry", entry)), list()).append(entry)
+
+    items = list()
+    for entries in groups.values():
+        files = {file for entry in entries for file in entry_files[entry]}
+        size = sum(file_sizes.get(file, 0) for file in files)
+        if size <= size_cap or len(entries) == 1:
+            items.append([size, entries, files])
+        else:
+            for entry in entries:
+                files = set(entry_files[entry])
+                items.append([sum(file_sizes.get(file, 0) for file in files), [entry], files])
+
+    volumes = list()
+    for size, entries, files in sorted(items, key=lambda item: (-item[0], order[item[1][0]])):
+        for volume in volumes:
+            added = sum(file_sizes.get(file, 0) for file in files - volume[1])
+            if volume[2] + added <= size_cap:
+                volume[0].extend(entries)
+                volume[1].update(files)
+                volume[2] += added
+                break
+        else:
+            volumes.append([list(entries), set(files), size])
+
+    for volume in volumes:
+        volume[0].sort(key=order.get)
+    return volumes
+
+
+def link_or_copy(source_path, output_path):
+    """Hard link a file on disk to a new path, or copy it if the two paths cannot share the file."""
+    if os.path.lexists(output_path):
+        os.remove(output_path)
+    try:
+        os.link(source_path, output_path)
+    except OSError:
+        shutil.copy2(source_path, output_path)
+
+
+class AssemblyJournal:
+    """Record of the completed outputs in a staging folder.
+
+    Records are appended to a JSON lines file and flushed to disk one at a time, so a record is only present if its
+    output was completely written. A line cut short by a crash is ignored when the journal is read.
+
+    inputs
+    staging_folder (str): folder the pack is assembled in
+    signatures (dict): source path to signature from a BuildPlan, so the source files are not checked again
+    """
+    def __init__(self, staging_folder, signatures=None):
+        self.staging_folder = staging_folder
+        self.signatures = signatures if signatures is not None else dict()
+        self.journal_path = os.path.join(staging_folder, JOURNAL_FILENAME)
+        self.records = dict()  # Output path relative to the staging folder to its record
+        self.num_resumed = 0
+        self.load()
+
+    def relative_path(self, output_path):
+        """Return the journal key of an output path."""
+        return os.path.relpath(output_path, self.staging_folder).replace(os.sep, "/")
+
+    def source_signature(self, source_path):
+        """Return the signature of a source file, reading it only if it is not known yet."""
+        if source_path not in self.signatures:
+            self.signatures[source_path] = source_signature(source_path)
+        return self.signatures[source_path]
+
+    def num_bytes_recorded(self):
+        """Return the total size of the outputs in the journal."""
+        return sum(record['size'] for record in self.records.values())
+
+    def load(self):
+        """Read the journal file, if there is one."""
+        self.records = dict()
+        try:
+            with open(self.journal_path, mode='r') as journal_file:
+                for line in journal_file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # Incomplete line written when the assembly was interrupted.
+                    self.records[record['output']] = record
+        except OSError:
+            pass
+
+    def verify(self, max_workers=8):
+        """Drop the records whose output file no longer matches its recorded size and hash.
+
+        outputs
+        num_valid (int): number of outputs that can be kept
+        """
+        def matches(record):
+            path = os.path.join(self.staging_folder, *record['output'].split("/"))
+            try:
+                if os.path.getsize(path) != record['size']:
+                    return False
+                return hash_file(path) == [record['size'], record['blake2']]
+            except OSError:
+                return False
+
+        records = list(self.records.values())
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            valid = list(executor.map(matches, records))
+        self.records = {record['output']: record for record, ok in zip(records, valid) if ok}
+        return len(self.records)
+
+    def is_complete(self, output_path, sources, options=""):
+        """Return True if the output was completed from the same source files with the same options."""
+        record = self.records.get(self.relative_path(output_path))
+        if record is None or record['options'] != options:
+            return False
+        if record['sources'] != [[source, self.source_signature(source)] for source in sources]:
+            return False
+        self.num_resumed += 1
+        return True
+
+    def record(self, output_path, sources, options="", result=None):
+        """Add a completed output to the journal.
+
+        inputs
+        output_path (str): path of the completed output file in the staging folder
+        sources (list): paths of the files the output was made from
+        options (str): settings that change the output (ex: weld tolerance), so a change of settings remakes it
+        result (list): [size, BLAKE2b hex digest] of the output if already known from copy_and_hash
+        """
+        size, digest = result if result is not None else hash_file(output_path)
+        record = {'output': self.relative_path(output_path),
+                  'sources': [[source, self.source_signature(source)] for source in sources],
+                  'options': options,
+                  'size': size,
+                  'blake2': digest}
+        self.records[record['output']] = record
+        with open(self.journal_path, mode='a') as journal_file:
+            journal_file.write(json.dumps(record) + "\n")
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
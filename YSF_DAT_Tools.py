@@ -0,0 +1,568 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Helpers for reading and writing YSFlight aircraft and ground object DAT files.
+
+DAT files are plain text files with one variable per line. Each line starts with an 8 character keyword followed by one
+or more values. Values can carry unit suffixes (ex: 1.44m, 7.0t) and lines can have in-line comments starting with #.
+"""
+
+
+import csv
+import os
+import re
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from YSF_Source_Files import open_source, source_signature
+
+
+# Conversion factors to SI units for the unit suffixes used by YSFlight DAT files. The unit is found by stripping the
+# numeric part of the value, so the keys must be lowercase.
+LENGTH_UNITS = {'m': 1.0, 'cm': 0.01, 'mm': 0.001, 'km': 1000.0, 'ft': 0.3048, 'in': 0.0254}
+
+# Unit suffixes of DAT values to [conversion factor, unit] for the parameter table. Masses and thrusts are kept in kg
+# (thrust in kilograms-force, as the DAT files give it), lengths in m, speeds in m/s and angles in degrees. Mach numbers
+# and percentages cannot be converted without more information, so they are kept as they are.
+VALUE_UNITS = {'kg': [1.0, 'kg'], 't': [1000.0, 'kg'], 'lb': [0.45359237, 'kg'],
+               'm': [1.0, 'm'], 'cm': [0.01, 'm'], 'mm': [0.001, 'm'], 'km': [1000.0, 'm'], 'ft': [0.3048, 'm'],
+               'in': [0.0254, 'm'],
+               'm^2': [1.0, 'm^2'], 'ft^2': [0.09290304, 'm^2'],
+               'kt': [1852.0 / 3600.0, 'm/s'], 'km/h': [1.0 / 3.6, 'm/s'], 'm/s': [1.0, 'm/s'],
+               'deg': [1.0, 'deg'], 'rad': [180.0 / np.pi, 'deg'],
+               'mach': [1.0, 'Mach'], '%': [1.0, '%']}
+
+# A number followed by an optional unit suffix (ex: -1.44m, 58.0m^2, 0.9MACH).
+VALUE_PATTERN = re.compile(r'^([-+]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][-+]?[0-9]+)?)(.*)$')
+
+# DAT variables that are compared to balance the aircraft of a pack.
+BALANCE_KEYS = ['THRAFTBN', 'THRMILIT', 'WEIGHCLN', 'WEIGFUEL', 'WEIGLOAD']
+
+# DAT variables whose lines are kept as they are when DAT files are minified, apart from the surrounding whitespace, so
+# that names are never changed.
+VERBATIM_DAT_KEYS = {'IDENTIFY', 'SUBSTNAM'}
+
+# DAT path to [signature, {DAT variable: [value, unit]}], so that each DAT file is only read again when it changes.
+_dat_values = dict()
+
+# DAT variables holding positions relative to the aircraft/ground object origin, and the hit test radius.
+POSITION_KEYS = ['COCKPITP', 'LEFTGEAR', 'RIGHGEAR', 'WHELGEAR']
+RADIUS_KEYS = ['HTRADIUS']
+
+# Column of a variant table holding the file name of the variant's DAT file. Not a DAT variable, as those have no "_".
+VARIANT_FILE_COLUMN = 'DAT_FILE'
+
+# Characters that are replaced when a DAT file name is made from an IDENTIFY name.
+UNSAFE_FILENAME_PATTERN = re.compile(r'[^A-Za-z0-9_.-]+')
+
+# DAT path to [signature, DatTemplate], so that a template is only parsed again when its file changes.
+_dat_templates = dict()
+
+
+def split_dat_tokens(line, comments=True, keep_quotes=False):
+    """Split a line of a DAT, FLD, STP or YFS file into tokens.
+
+    Quoted values (ex: IDENTIFY "F-16C_FIGHTINGFALCON") are returned as a single token without the quotation marks.
+
+    inputs
+    line (str): a single line of the file
+    comments (bool): True to ignore everything after a # that is not between quotation marks
+    keep_quotes (bool): True to keep the quotation marks in the tokens, so that the text between them is unchanged
+
+    outputs
+    tokens (list): tokens of the line, starting with its keyword
+    """
+    if '"' not in line:
+        # Most lines have no quotation marks, str.split is much faster than going through the characters.
+        return (line.split('#', 1)[0] if comments else line).split()
+
+    tokens = list()
+    token = ""
+    quoted = False  # An empty pair of quotation marks is still a token
+    in_quotes = False
+    for character in line.rstrip("\r\n"):
+        if character == '"':
+            in_quotes = not in_quotes
+            quoted = True
+            if keep_quotes:
+                token += character
+            continue
+        if in_quotes is False and comments and character == '#':
+            break  # Rest of the line is a comment
+        if in_quotes is False and character in " \t":
+            if token or quoted:
+                tokens.append(token)
+                token = ""
+                quoted = False
+            continue
+        token += character
+    if token or quoted:
+        tokens.append(token)
+    return tokens
+
+
+def split_dat_line(line):
+    """Split a DAT file line into its keyword and value tokens, ignoring in-line comments and REM lines.
+
+    inputs
+    line (str): a single line of a DAT file
+
+    outputs
+    key (str): the DAT variable name, or "" for blank and comment lines
+    tokens (list): the value tokens that follow the DAT variable name
+    """
+    tokens = split_dat_tokens(line)
+    if len(tokens) == 0 or tokens[0].upper() == 'REM':
+        return "", []
+    return tokens[0].upper(), tokens[1:]
+
+
+def parse_dat_value(token, units=None):
+    """Convert a DAT value token (ex: "-1.65m") to a float in SI units.
+
+    inputs
+    token (str): value token from a DAT file
+    units (dict): Lowercase unit suffix to conversion factor. If None, any suffix is ignored.
+
+    outputs
+    value (float): converted value. Raises ValueError if the number or the unit cannot be interpreted.
+    """
+    token = token.strip()
+    idx = len(token)
+    while idx > 0 and (token[idx - 1].isalpha() or token[idx - 1] == '/'):
+        idx -= 1
+    number, unit = token[:idx], token[idx:].lower()
+
+    value = float(number)
+    if units is not None and unit:
+        if unit not in units:
+            raise ValueError("Unrecognized unit '{}' in DAT value '{}'".format(unit, token))
+        value *= units[unit]
+    return value
+
+
+def read_dat_keys(dat_file_path, keys):
+    """Read the tokens for the requested DAT variables. Only the first occurrence of each variable is kept.
+
+    inputs
+    dat_file_path (str): path to where the dat file is
+    keys (list): DAT variable names to look for
+
+    outputs
+    values (dict): DAT variable name to list of value tokens for the variables that were found.
+    """
+    wanted = set(keys)
+    values = dict()
+    with open_source(dat_file_path, mode='r', errors='ignore') as dat_file:
+        for line in dat_file:
+            key, tokens = split_dat_line(line)
+            if key in wanted and key not in values:
+                values[key] = tokens
+                if len(values) == len(wanted):
+                    break
+    return values
+
+
+def parse_dat_quantity(token):
+    """Convert a DAT value token to a number in the units of VALUE_UNITS.
+
+    outputs
+    value (float): converted value, or None if the token is not a number with a known unit
+    unit (str): unit of the converted value, "" for values without a unit suffix
+    """
+    match = VALUE_PATTERN.match(token.strip())
+    if match is None:
+        return None, ""
+    number, suffix = match.groups()
+    if not suffix:
+        return float(number), ""
+    if suffix.lower() not in VALUE_UNITS:
+        return None, ""
+    factor, unit = VALUE_UNITS[suffix.lower()]
+    return float(number) * factor, unit
+
+
+def read_dat_values(dat_file_path):
+    """Read the numeric value of every DAT variable, converted to the units of VALUE_UNITS.
+
+    Only the first value of the first line of each variable is kept. The values are cached and only read again when
+    the file's modification time or size changes.
+
+    inputs
+    dat_file_path (str): path to where the dat file is
+
+    outputs
+    values (dict): DAT variable to [value, unit]
+    """
+    signature = source_signature(dat_file_path)
+    cached = _dat_values.get(dat_file_path)
+    if cached is not None and signature is not None and cached[0] == signature:
+        return cached[1]
+
+    values = dict()
+    with open_source(dat_file_path, mode='r', errors='ignore') as dat_file:
+        for line in dat_file:
+            key, tokens = split_dat_line(line)
+            if key and key not in values and len(tokens) > 0:
+                value, unit = parse_dat_quantity(tokens[0])
+                if value is not None:
+                    values[key] = [value, unit]
+    _dat_values[dat_file_path] = [signature, values]
+    return values
+
+
+class DatTable:
+    """Numeric DAT values of many aircraft or ground objects in a NumPy structured array, one row per DAT file.
+
+    The 'name' and 'path' fields hold the entry name and the DAT path, and each DAT variable is a float field in the
+    units of VALUE_UNITS. Variables missing from a DAT file are NaN, so whole columns can be compared at once
+    (ex: table.data[table.data['WEIGHCLN'] > 20000.0]['name']).
+
+    inputs
+    data (np.ndarray): structured array of the rows
+    units (dict): DAT variable to the unit of its column
+    """
+    def __init__(self, data, units):
+        self.data = data
+        self.units = units
+        self.keys = [name for name in data.dtype.names if name not in ('name', 'path')]
+
+    @classmethod
+    def from_dat_files(cls, entries, keys=None, max_workers=8):
+        """Read the DAT files of many entries into a table.
+
+        inputs
+        entries (list): [entry name, dat file path] pairs
+        keys (list): DAT variables to keep. Every numeric variable found in any of the DAT files if None.
+        max_workers (int): number of threads reading the DAT files
+
+        outputs
+        table (DatTable): the table. DAT files that cannot be read give rows of NaN.
+        """
+        def read_values(path):
+            try:
+                return read_dat_values(path)
+            except (OSError, ValueError):
+                return dict()
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            all_values = list(executor.map(read_values, [path for _, path in entries]))
+
+        if keys is None:
+            keys = sorted(set(key for values in all_values for key in values))
+        units = dict()
+        for values in all_values:
+            for key in keys:
+                if key not in units and key in values and values[key][1]:
+                    units[key] = values[key][1]
+
+        name_length = max([len(name) for name, _ in entries] + [1])
+        path_length = max([len(path) for _, path in entries] + [1])
+        dtype = [('name', 'U{}'.format(name_length)), ('path', 'U{}'.format(path_length))] + \
+                [(key, 'f8') for key in keys]
+        data = np.zeros(len(entries), dtype=dtype)
+        data['name'] = [name for name, _ in entries]
+        data['path'] = [path for _, path in entries]
+        for key in keys:
+            data[key] = [values[key][0] if key in values else np.nan for values in all_values]
+        return cls(data, units)
+
+    def column(self, key):
+        """Return the values of a DAT variable for every row, NaN where it is missing."""
+        return self.data[key]
+
+    def select(self, key, minimum=-np.inf, maximum=np.inf):
+        """Return the rows whose value of a DAT variable is within [minimum, maximum]."""
+        values = self.data[key]
+        return self.data[(values >= minimum) & (values <= maximum)]
+
+    def summary(self, keys=None):
+        """Return {DAT variable: [number of values, minimum, median, maximum]}, ignoring missing values."""
+        summary = dict()
+        for key in keys or self.keys:
+            values = self.data[key][np.isfinite(self.data[key])]
+            if len(values) == 0:
+                summary[key] = [0, np.nan, np.nan, np.nan]
+            else:
+                summary[key] = [len(values), float(values.min()), float(np.median(values)), float(values.max())]
+        return summary
+
+    def outliers(self, keys=None, threshold=3.5):
+        """Find the values that are far from the rest of their column.
+
+        Uses the modified z-score, 0.6745 * (value - median) / median absolute deviation, which a few extreme values
+        do not distort the way they distort the mean and the standard deviation. All columns are scored at once.
+
+        inputs
+        keys (list): DAT variables to check, all columns if None
+        threshold (float): smallest absolute score reported
+
+        outputs
+        outliers (list): [entry name, DAT variable, value, column median, score], largest scores first
+        """
+        keys = [key for key in (keys or self.keys) if key in self.keys]
+        if len(keys) == 0 or len(self.data) == 0:
+            return list()
+        values = np.column_stack([self.data[key] for key in keys])
+        with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # Columns without any value
+            medians = np.nanmedian(values, axis=0)
+            deviations = np.nanmedian(np.abs(values - medians), axis=0)
+            scores = 0.6745 * (values - medians) / deviations
+        # Columns whose values are mostly identical have no deviation, any other value in them stands out.
+        scores = np.where((deviations == 0) & (values != medians) & np.isfinite(values), np.inf, scores)
+
+        outliers = list()
+        for row, col in zip(*np.nonzero(np.abs(np.nan_to_num(scores, nan=0.0)) >= threshold)):
+            outliers.append([str(self.data['name'][row]), keys[col], float(values[row, col]), float(medians[col]),
+                             float(scores[row, col])])
+        outliers.sort(key=lambda outlier: -abs(outlier[4]))
+        return outliers
+
+    def column_names(self):
+        """Column headers for exports, with the unit of each DAT variable (ex: WEIGHCLN (kg))."""
+        return ['name', 'path'] + ["{} ({})".format(key, self.units[key]) if key in self.units else key
+                                   for key in self.keys]
+
+    def to_csv(self, csv_file_path):
+        """Write the table to a CSV file. Missing values are left empty."""
+        with open(csv_file_path, mode='w', newline='', encoding='utf-8') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(self.column_names())
+            for row in self.data.tolist():
+                writer.writerow(list(row[:2]) + ["" if np.isnan(value) else repr(value) for value in row[2:]])
+
+    def to_parquet(self, parquet_file_path):
+        """Write the table to a Parquet file. Needs the optional pyarrow package."""
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("Writing Parquet files needs the pyarrow package (pip install pyarrow)")
+        columns = [pyarrow.array(self.data['name']), pyarrow.array(self.data['path'])] + \
+                  [pyarrow.array(self.data[key], from_pandas=True) for key in self.keys]
+        pyarrow.parquet.write_table(pyarrow.Table.from_arrays(columns, names=self.column_names()), parquet_file_path)
+
+
+def read_dat_geometry(dat_file_path):
+    """Read the positional DAT variables used for geometry checks.
+
+    Missing or unreadable variables are reported as NaN so that many DAT files can be stacked into a single array.
+
+    inputs
+    dat_file_path (str): path to where the dat file is
+
+    outputs
+    positions (np.ndarray): (len(POSITION_KEYS), 3) array of positions in meters, ordered as POSITION_KEYS
+    radius (float): HTRADIUS in meters
+    """
+    values = read_dat_keys(dat_file_path, POSITION_KEYS + RADIUS_KEYS)
+
+    positions = np.full((len(POSITION_KEYS), 3), np.nan)
+    for idx, key in enumerate(POSITION_KEYS):
+        tokens = values.get(key, [])
+        if len(tokens) >= 3:
+            try:
+                positions[idx] = [parse_dat_value(token, LENGTH_UNITS) for token in tokens[:3]]
+            except ValueError:
+                pass  # Leave as NaN so the check reports the variable as unusable.
+
+    radius = np.nan
+    tokens = values.get('HTRADIUS', [])
+    if len(tokens) >= 1:
+        try:
+            radius = parse_dat_value(tokens[0], LENGTH_UNITS)
+        except ValueError:
+            pass
+
+    return positions, radius
+
+
+def minify_dat_line(line):
+    """Strip a DAT file line down to what the game reads.
+
+    REM lines, comment lines and blank lines give "". Other lines lose their in-line comment and have the whitespace
+    between their tokens reduced to single spaces, while text between quotation marks is kept exactly as it is.
+    IDENTIFY and SUBSTNAM lines only lose their surrounding whitespace.
+
+    inputs
+    line (str): a single line of a DAT file, with or without its line ending
+
+    outputs
+    line (str): the minified line without a line ending
+    """
+    tokens = split_dat_tokens(line, keep_quotes=True)
+    if len(tokens) == 0 or tokens[0].upper() == 'REM':
+        return ""
+    if tokens[0].upper() in VERBATIM_DAT_KEYS:
+        return line.strip()
+    return " ".join(tokens)
+
+
+def write_dat_identify(dat_file_path, output_path, identify=None, minify=False):
+    """Write a copy of a DAT file with its IDENTIFY line replaced and optionally minified, one line at a time.
+
+    Only the first IDENTIFY line is replaced, and one is added at the end if there is none. Without minify all other
+    lines, including their line endings, are written unchanged.
+
+    inputs
+    dat_file_path (str): path to where the dat file is
+    output_path (str): path to write the new dat file to
+    identify (str): name to write on the IDENTIFY line, or None to keep the file's IDENTIFY line
+    minify (bool): True to remove comments, blank lines and padding with minify_dat_line
+
+    outputs
+    sizes (tuple): file size in bytes before and after
+    """
+    replaced = identify is None
+    line = "\n"
+    size_before = 0
+    # latin-1 maps every byte to a character, so text in other encodings is written back unchanged and the number of
+    # characters is the number of bytes.
+    with open_source(dat_file_path, mode='r', encoding='latin-1', newline='') as dat_file, \
+            open(output_path, mode='w', encoding='latin-1', newline='') as output:
+        for line in dat_file:
+            size_before += len(line)
+            if replaced is False and split_dat_line(line)[0] == 'IDENTIFY':
+                ending = line[len(line.rstrip("\r\n")):] or "\n"
+                line = 'IDENTIFY "{}"{}'.format(identify, ending)
+                replaced = True
+            if minify is True:
+                line = minify_dat_line(line)
+                if not line:
+                    continue
+                line += "\n"
+            output.write(line)
+        if replaced is False:
+            separator = "" if line.endswith("\n") else "\n"
+            output.write('{}IDENTIFY "{}"\n'.format(separator, identify))
+    return size_before, os.path.getsize(output_path)
+
+
+class DatTemplate:
+    """A parsed DAT file used to write variants of it, with some of its variables replaced.
+
+    inputs
+    lines (list): lines of the DAT file with their line endings
+    """
+    def __init__(self, lines):
+        self.lines = lines
+        self.key_lines = dict()  # DAT variable to the index of its first line
+        for idx, line in enumerate(lines):
+            key = split_dat_line(line)[0]
+            if key and key not in self.key_lines:
+                self.key_lines[key] = idx
+        self.line_ending = "\n"
+        if lines and lines[0].endswith("\r\n"):
+            self.line_ending = "\r\n"
+
+    @classmethod
+    def load(cls, dat_file_path):
+        """Parse a DAT file, or return the template parsed before if the file did not change since."""
+        signature = source_signature(dat_file_path)
+        cached = _dat_templates.get(dat_file_path)
+        if cached is None or signature is None or cached[0] != signature:
+            # latin-1 maps every byte to a character, so text in other encodings is written back unchanged.
+            with open_source(dat_file_path, mode='r', encoding='latin-1', newline='') as dat_file:
+                cached = [signature, cls(dat_file.readlines())]
+            _dat_templates[dat_file_path] = cached
+        return cached[1]
+
+    def render(self, values):
+        """Return the text of the DAT file with variables replaced.
+
+        The first line of each variable is replaced, and variables the template does not have are added before the
+        AUTOCALC line, so that they are used by the calculation, or at the end. All other lines are kept unchanged.
+
+        inputs
+        values (dict): DAT variable to its new value text (ex: {'WEIGHCLN': '12.5t'}). IDENTIFY values are quoted.
+        """
+        lines = list(self.lines)
+        added = list()
+        for key, value in values.items():
+            if key == 'IDENTIFY':
+                text = 'IDENTIFY "{}"'.format(value)
+            else:
+                text = "{} {}".format(key, value)
+            if key in self.key_lines:
+                line = lines[self.key_lines[key]]
+                lines[self.key_lines[key]] = text + (line[len(line.rstrip("\r\n")):] or self.line_ending)
+            else:
+                added.append(text + self.line_ending)
+        if 'AUTOCALC' in self.key_lines:
+            idx = self.key_lines['AUTOCALC']
+            return "".join(lines[:idx] + added + lines[idx:])
+        if added and lines and not lines[-1].endswith("\n"):
+            lines[-1] += self.line_ending
+        return "".join(lines + added)
+
+
+def read_variant_table(csv_file_path):
+    """Read a table of DAT variants from a CSV file.
+
+    The first row holds the column names: IDENTIFY, an optional DAT_FILE column with the file name of each variant's
+    DAT file, and the DAT variables to replace (ex: WEIGHCLN). Empty cells keep the template's value.
+
+    inputs
+    csv_file_path (str): path to the CSV file
+
+    outputs
+    variants (list): {DAT variable: value} for each row, with the DAT_FILE column if there is one. Raises ValueError
+                     for rows without an IDENTIFY, and for IDENTIFY names or file names used by more than one row.
+    """
+    variants = list()
+    identifies = dict()
+    filenames = dict()
+    problems = list()
+    with open(csv_file_path, mode='r', newline='', encoding='utf-8-sig', errors='replace') as csv_file:
+        reader = csv.reader(csv_file)
+        header = [column.strip().upper() for column in next(reader, [])]
+        if 'IDENTIFY' not in header:
+            raise ValueError("{} does not have an IDENTIFY column".format(os.path.basename(csv_file_path)))
+        for row_num, row in enumerate(reader, start=2):
+            if not any(cell.strip() for cell in row):
+                continue
+            variant = {key: cell.strip() for key, cell in zip(header, row) if key and cell.strip()}
+            identify = variant.get('IDENTIFY', "")
+            if not identify:
+                problems.append("Row {} has no IDENTIFY".format(row_num))
+                continue
+            filename = os.path.basename(variant.get(VARIANT_FILE_COLUMN, "")) or variant_filename(identify)
+            variant[VARIANT_FILE_COLUMN] = filename
+            for label, name, seen in (("IDENTIFY", identify, identifies), ("file name", filename, filenames)):
+                if name.upper() in seen:
+                    problems.append("Row {} uses the {} {} like row {}".format(row_num, label, name,
+                                                                               seen[name.upper()]))
+                seen.setdefault(name.upper(), row_num)
+            variants.append(variant)
+    if problems:
+        raise ValueError("\n".join(problems))
+    return variants
+
+
+def variant_filename(identify):
+    """Make a DAT file name from an IDENTIFY name."""
+    return UNSAFE_FILENAME_PATTERN.sub("_", identify).strip("_") + ".dat"
+
+
+def generate_dat_variants(template_path, variants, output_folder):
+    """Write a DAT file for each variant of a template DAT file, one at a time.
+
+    inputs
+    template_path (str): path to the template dat file
+    variants (iterable): {DAT variable: value} for each variant, as from read_variant_table
+    output_folder (str): folder to write the dat files to
+
+    outputs
+    Yields [IDENTIFY, dat file path] for each variant once its file is written.
+    """
+    template = DatTemplate.load(template_path)
+    for variant in variants:
+        values = {key: value for key, value in variant.items() if key != VARIANT_FILE_COLUMN}
+        filename = variant.get(VARIANT_FILE_COLUMN) or variant_filename(values['IDENTIFY'])
+        output_path = os.path.join(output_folder, filename)
+        with open(output_path, mode='w', encoding='latin-1', errors='replace', newline='') as output:
+            output.write(template.render(values))
+        yield [values['IDENTIFY'], output_path]
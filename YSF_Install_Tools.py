@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Helpers for indexing the aircraft, ground objects and sceneries of a YSFlight installation.
+
+YSFlight finds its content through the LST files in the aircraft, ground and scenery folders of the installation. Each
+aircraft and ground object LST line starts with the path of a DAT file, whose IDENTIFY line holds the name used by the
+game. Each scenery LST line starts with the name of the map.
+
+Reading every DAT file of a large installation takes a while, so the index is saved as a JSON file along with the
+modification time and size of every file that was read. Refreshing the index only reads the files that changed.
+"""
+
+
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from YSF_DAT_Tools import read_dat_keys
+
+
+# LST type to the installation folder holding its LST files.
+LST_FOLDERS = {'Aircraft': 'aircraft', 'Ground': 'ground', 'Scenery': 'scenery'}
+
+# A quoted field, possibly empty, or a run of characters without spaces.
+LST_FIELD_PATTERN = re.compile(r'"([^"]*)"|([^\s"]+)')
+
+# Increment when the layout of the saved index changes so that old index files are rebuilt.
+INDEX_VERSION = 1
+
+
+def split_lst_line(line):
+    """Split an LST line into its fields.
+
+    Fields are separated by spaces or tabs. Quoted fields can contain spaces, and an empty pair of quotation marks is
+    kept as an empty field so that the position of the optional files is preserved.
+
+    inputs
+    line (str): a single line of an LST file
+
+    outputs
+    fields (list): the fields of the line without the quotation marks
+    """
+    if '"' not in line:
+        return line.split()  # Most LST lines have no quotation marks, str.split is much faster than the regex.
+    return [quoted or bare for quoted, bare in LST_FIELD_PATTERN.findall(line)]
+
+
+def file_signature(path):
+    """Return [modification time in ns, size in bytes] of a file, or None if it cannot be read."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def find_folder(parent, name):
+    """Find a sub folder without regard to case, as YSFlight installations are mostly made on Windows."""
+    if os.path.isdir(os.path.join(parent, name)):
+        return os.path.join(parent, name)
+    try:
+        for item in os.listdir(parent):
+            if item.lower() == name.lower() and os.path.isdir(os.path.join(parent, item)):
+                return os.path.join(parent, item)
+    except OSError:
+        pass
+    return None
+
+
+def find_lst_files(install_directory):
+    """List the LST files of an installation.
+
+    outputs
+    lst_files (dict): LST type to the sorted paths of its LST files
+    """
+    lst_files = dict()
+    for lst_type, folder_name in LST_FOLDERS.items():
+        folder = find_folder(install_directory, folder_name)
+        lst_files[lst_type] = list()
+        if folder is not None:
+            lst_files[lst_type] = sorted(os.path.join(folder, name) for name in os.listdir(folder)
+                                         if name.lower().endswith('.lst'))
+    return lst_files
+
+
+def read_lst_names(lst_file_path):
+    """Read the first field of every line of an LST file.
+
+    outputs
+    names (list): DAT file paths as written in the LST file for aircraft and ground objects, map names for sceneries
+    """
+    names = list()
+    with open(lst_file_path, mode='r', errors='ignore') as lst_file:
+        for line in lst_file:
+            fields = split_lst_line(line)
+            if len(fields) > 0 and fields[0]:
+                names.append(fields[0])
+    return names
+
+
+def read_dat_identify(dat_file_path):
+    """Return the IDENTIFY name of a DAT file, or "" if it does not have one."""
+    return " ".join(read_dat_keys(dat_file_path, ['IDENTIFY']).get('IDENTIFY', []))
+
+
+class InstallIndex:
+    """IDENTIFY and map names of the content installed in a YSFlight installation.
+
+    inputs
+    install_directory (str): folder holding the YSFlight executable and the aircraft, ground and scenery folders
+    """
+    def __init__(self, install_directory):
+        self.install_directory = os.path.normpath(install_directory)
+        self.lst_files = dict()  # LST path to {'type', 'signature', 'names'}
+        self.dat_files = dict()  # DAT path to {'signature', 'identify'}
+        self.names = {lst_type: dict() for lst_type in LST_FOLDERS}  # Upper case name to [[name, source, lst], ...]
+
+    @classmethod
+    def load(cls, index_file_path, install_directory):
+        """Load a saved index. An empty index is returned if the file is missing, outdated or for another folder."""
+        index = cls(install_directory)
+        try:
+            with open(index_file_path, mode='r') as index_file:
+                data = json.load(index_file)
+        except (OSError, ValueError):
+            return index
+
+        if data.get('version') != INDEX_VERSION or data.get('install_directory') != index.install_directory:
+            return index
+        index.lst_files = data.get('lst_files', dict())
+        index.dat_files = data.get('dat_files', dict())
+        index.build_names()
+        return index
+
+    def save(self, index_file_path):
+        """Write the index to a JSON file, replacing the previous file only once the new one is complete."""
+        data = {'version': INDEX_VERSION,
+                'install_directory': self.install_directory,
+                'lst_files': self.lst_files,
+                'dat_files': self.dat_files}
+        with open(index_file_path + ".tmp", mode='w') as index_file:
+            json.dump(data, index_file)
+        os.replace(index_file_path + ".tmp", index_file_path)
+
+    def resolve_path(self, lst_path):
+        """Convert a path written in an LST file to a path in the installation."""
+        return os.path.normpath(os.path.join(self.install_directory, *lst_path.replace("\\", "/").split("/")))
+
+    def refresh(self, max_workers=8):
+        """Bring the index up to date, only reading the LST and DAT files whose modification time or size changed.
+
+        inputs
+        max_workers (int): number of threads used to check and read the files
+
+        outputs
+        num_read (int): number of LST and DAT files that were read
+        """
+        num_read = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # LST files
+            lst_types = {path: lst_type for lst_type, paths in find_lst_files(self.install_directory).items()
+                         for path in paths}
+            signatures = dict(zip(lst_types, executor.map(file_signature, lst_types)))
+            changed = [path for path, signature in signatures.items()
+                       if signature is not None and (path not in self.lst_files or
+                                                     self.lst_files[path]['signature'] != signature)]
+            for path, names in zip(changed, executor.map(read_lst_names, changed)):
+                self.lst_files[path] = {'type': lst_types[path], 'signature': signatures[path], 'names': names}
+            num_read += len(changed)
+            self.lst_files = {path: value for path, value in self.lst_files.items() if signatures.get(path) is not None}
+
+            # DAT files referenced by the aircraft and ground object LST files
+            dat_paths = sorted({self.resolve_path(name) for value in self.lst_files.values()
+                                if value['type'] != 'Scenery' for name in value['names']})
+            signatures = dict(zip(dat_paths, executor.map(file_signature, dat_paths)))
+            changed = [path for path, signature in signatures.items()
+                       if signature is not None and (path not in self.dat_files or
+                                                     self.dat_files[path]['signature'] != signature)]
+            for path, identify in zip(changed, executor.map(read_dat_identify, changed)):
+                self.dat_files[path] = {'signature': signatures[path], 'identify': identify}
+            num_read += len(changed)
+            self.dat_files = {path: value for path, value in self.dat_files.items() if signatures.get(path) is not None}
+
+        self.build_names()
+        return num_read
+
+    def build_names(self):
+        """Rebuild the name lookup from the LST and DAT file data."""
+        self.names = {lst_type: dict() for lst_type in LST_FOLDERS}
+        for lst_path, value in sorted(self.lst_files.items()):
+            lst_type = value['type']
+            for name in value['names']:
+                source = "{}: {}".format(os.path.basename(lst_path), name)
+                if lst_type != 'Scenery':
+                    dat = self.dat_files.get(self.resolve_path(name))
+                    if dat is None or not dat['identify']:
+                        continue  # Missing DAT file, the game cannot load this entry either.
+                    name = dat['identify']
+                self.names[lst_type].setdefault(name.strip().upper(), list()).append([name, source,
+                                                                                      os.path.basename(lst_path)])
+
+    def lookup(self, lst_type, name, ignore_lst_files=()):
+        """Return [[installed name, source], ...] for the installed content matching name, without regard to case.
+
+        inputs
+        lst_type (str): 'Aircraft', 'Ground' or 'Scenery'
+        name (str): IDENTIFY or map name to look for
+        ignore_lst_files (list): LST file names whose entries are ignored (ex: the pack's own LST files)
+        """
+        ignore = {lst_name.lower() for lst_name in ignore_lst_files}
+        return [[installed_name, source]
+                for installed_name, source, lst_name in self.names.get(lst_type, dict()).get(name.strip().upper(), list())
+                if lst_name.lower() not in ignore]
+
+    def known_names(self):
+        """Return the installed names of each LST type, for use as known names by the ReferenceIndex."""
+        return {lst_type: set(names) for lst_type, names in self.names.items()}
@@ -0,0 +1,1418 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Helpers for reading YSFlight SRF and DNM model files and for checking them against their DAT files.
+
+SRF files hold a single mesh: a SURF header, the vertex list (V x y z [R]) and the face blocks (F ... E). DNM files
+pack several SRF meshes into PCK blocks, followed by SRF nodes that place the packed meshes relative to their parent.
+"""
+
+
+import hashlib
+import os
+import numpy as np
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from YSF_DAT_Tools import POSITION_KEYS, read_dat_geometry
+from YSF_Source_Files import open_source, source_size
+
+
+class SurfFace:
+    """A single face (F ... E block) of an SRF mesh."""
+    def __init__(self):
+        self.vertex_ids = list()
+        # All non-vertex lines of the face block (C, N, B, ...) in their original order. None marks where the
+        # vertex index line goes.
+        self.lines = list()
+
+
+class SurfModel:
+    """An SRF mesh. Vertices are stored as an (n, 3) array so that whole meshes can be processed at once."""
+    def __init__(self):
+        self.vertices = np.zeros((0, 3))
+        self.smooth = np.zeros(0, dtype=bool)  # Vertices flagged with R (rounded/smooth shading)
+        self.header_lines = list()  # Unrecognized lines between SURF and the first face
+        self.faces = list()
+        self.tail_lines = list()  # Closing E and everything after it (ZA, ZL, ZZ lines, blank lines)
+
+
+class DynaModel:
+    """A DNM file: the header lines, the PCK blocks in file order and the SRF node lines."""
+    def __init__(self):
+        self.header_lines = list()
+        self.packs = list()  # [name, SurfModel or list of raw lines]
+        self.node_lines = list()
+
+    def pack_offsets(self):
+        """Determine the translation of each packed mesh by walking the SRF node hierarchy.
+
+        Node rotations are ignored, so the offsets are only exact for parts that are not rotated relative to their
+        parent. This is good enough for bounding box checks.
+
+        outputs
+        offsets (list): [pack name, (3,) array] for every node that references a packed mesh.
+        """
+        nodes = dict()
+        order = list()
+        current = None
+        for line in self.node_lines:
+            parts = line.split()
+            if len(parts) == 0:
+                continue
+            if parts[0] == 'SRF' and len(parts) > 1:
+                current = {'FIL': None, 'POS': np.zeros(3), 'CLD': list()}
+                name = line.strip()[3:].strip().strip('"')
+                nodes[name] = current
+                order.append(name)
+            elif current is None:
+                continue
+            elif parts[0] == 'FIL' and len(parts) > 1:
+                current['FIL'] = parts[1]
+            elif parts[0] == 'POS' and len(parts) >= 4:
+                current['POS'] = np.array([float(i) for i in parts[1:4]])
+            elif parts[0] == 'CLD' and len(parts) > 1:
+                current['CLD'].append(line.strip()[3:].strip().strip('"'))
+            elif parts[0] == 'END':
+                current = None
+
+        # Roots are nodes that are not the child of any other node.
+        children = set(child for node in nodes.values() for child in node['CLD'])
+        offsets = list()
+        stack = [(name, np.zeros(3)) for name in reversed(order) if name not in children]
+        visited = set()
+        while stack:
+            name, parent_offset = stack.pop()
+            if name not in nodes or name in visited:
+                continue  # Missing child definition or a loop in the hierarchy.
+            visited.add(name)
+            offset = parent_offset + nodes[name]['POS']
+            if nodes[name]['FIL']:
+                offsets.append([nodes[name]['FIL'], offset])
+            for child in reversed(nodes[name]['CLD']):
+                stack.append((child, offset))
+        return offsets
+
+
+def read_surf(lines):
+    """Parse the lines of an SRF mesh.
+
+    inputs
+    lines (iterable): lines of an SRF file or of a DNM PCK block, with or without line endings
+
+    outputs
+    model (SurfModel): parsed mesh
+    """
+    model = SurfModel()
+    vertex_lines = list()
+    smooth = list()
+    face = None
+    closed = False
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if closed is True:
+            model.tail_lines.append(line)
+            continue
+
+        parts = line.split()
+        keyword = parts[0] if parts else ""
+
+        if face is not None:
+            if keyword == 'E':
+                model.faces.append(face)
+                face = None
+            elif keyword == 'V':
+                if None not in face.lines:
+                    face.lines.append(None)
+                face.vertex_ids.extend(int(i) for i in parts[1:])
+            else:
+                face.lines.append(line)
+        elif keyword == 'V':
+            vertex_lines.append(parts[1:4])
+            smooth.append(len(parts) > 4 and parts[4] == 'R')
+        elif keyword == 'F':
+            face = SurfFace()
+        elif keyword == 'E':
+            closed = True
+            model.tail_lines.append(line)
+        elif keyword == 'SURF':
+            continue
+        else:
+            model.header_lines.append(line)
+
+    if vertex_lines:
+        model.vertices = np.array(vertex_lines, dtype=float)
+        model.smooth = np.array(smooth, dtype=bool)
+    return model
+
+
+def read_srf_file(srf_file_path):
+    """Read an SRF file from disk.
+
+    inputs
+    srf_file_path (str): path to where the srf file is
+
+    outputs
+    model (SurfModel): parsed mesh
+    """
+    with open_source(srf_file_path, mode='r', errors='ignore') as srf_file:
+        return read_surf(srf_file)
+
+
+def read_dnm_file(dnm_file_path):
+    """Read a DNM file from disk. PCK blocks that do not contain an SRF mesh are kept as raw lines.
+
+    inputs
+    dnm_file_path (str): path to where the dnm file is
+
+    outputs
+    model (DynaModel): parsed model
+    """
+    model = DynaModel()
+    with open_source(dnm_file_path, mode='r', errors='ignore') as dnm_file:
+        lines = iter(dnm_file)
+        for line in lines:
+            line = line.rstrip("\r\n")
+            parts = line.split()
+            if len(parts) >= 3 and parts[0] == 'PCK':
+                # The PCK line gives the number of lines that belong to the packed file.
+                num_lines = int(parts[-1])
+                name = line.strip()[3:].rsplit(None, 1)[0].strip().strip('"')
+                pack_lines = [next(lines, "").rstrip("\r\n") for _ in range(num_lines)]
+                first_line = next((i.strip() for i in pack_lines if i.strip()), "")
+                if first_line == 'SURF':
+                    model.packs.append([name, read_surf(pack_lines)])
+                else:
+                    model.packs.append([name, pack_lines])
+            elif len(model.packs) == 0 and (len(parts) == 0 or parts[0] != 'SRF'):
+                model.header_lines.append(line)
+            else:
+                model.node_lines.append(line)
+    return model
+
+
+def format_number(value, precision=4):
+    """Format a coordinate the way YSFlight model files write them: fixed decimals without trailing zeros.
+
+    inputs
+    value (float): number to format
+    precision (int): maximum number of decimals
+
+    outputs
+    text (str): formatted number. Negative zero is written as 0.
+    """
+    text = "{:.{}f}".format(value, precision)
+    if '.' in text:
+        text = text.rstrip('0').rstrip('.')
+    if text in ('-0', ''):
+        text = '0'
+    return text
+
+
+def format_surf(model, precision=4):
+    """Convert an SRF mesh back into the lines of an SRF file.
+
+    inputs
+    model (SurfModel): mesh to write
+    precision (int): maximum number of decimals for the vertex coordinates
+
+    outputs
+    lines (list): lines of the SRF file without line endings
+    """
+    lines = ['SURF']
+    for vertex, smooth in zip(model.vertices, model.smooth):
+        line = "V {} {} {}".format(*[format_number(i, precision) for i in vertex])
+        if smooth:
+            line += " R"
+        lines.append(line)
+    lines.extend(model.header_lines)
+    for face in model.faces:
+        lines.append('F')
+        for line in face.lines:
+            if line is None:
+                lines.append("V " + " ".join(str(i) for i in face.vertex_ids))
+            else:
+                lines.append(line)
+        if None not in face.lines:
+            lines.append("V " + " ".join(str(i) for i in face.vertex_ids))
+        lines.append('E')
+    if len(model.tail_lines) > 0:
+        lines.extend(model.tail_lines)
+    else:
+        lines.append('E')
+    return lines
+
+
+def format_dnm(model, precision=4):
+    """Convert a DNM model back into the lines of a DNM file. PCK line counts are recalculated.
+
+    inputs
+    model (DynaModel): model to write
+    precision (int): maximum number of decimals for the vertex coordinates
+
+    outputs
+    lines (list): lines of the DNM file without line endings
+    """
+    lines = list(model.header_lines)
+    for name, mesh in model.packs:
+        if isinstance(mesh, SurfModel):
+            pack_lines = format_surf(mesh, precision)
+        else:
+            pack_lines = mesh
+        if ' ' in name:
+            name = '"{}"'.format(name)
+        lines.append("PCK {} {}".format(name, len(pack_lines)))
+        lines.extend(pack_lines)
+    lines.extend(model.node_lines)
+    return lines
+
+
+def write_model_file(model, model_file_path, precision=4):
+    """Write an SRF or DNM model to disk.
+
+    inputs
+    model (SurfModel or DynaModel): model to write
+    model_file_path (str): path to write the model to
+    precision (int): maximum number of decimals for the vertex coordinates
+    """
+    if isinstance(model, DynaModel):
+        lines = format_dnm(model, precision)
+    else:
+        lines = format_surf(model, precision)
+    with open(model_file_path, mode='w') as model_file:
+        model_file.write("\n".join(lines) + "\n")
+
+
+def read_model_file(model_file_path):
+    """Read an SRF or DNM model from disk based on the file extension."""
+    if model_file_path.lower().endswith(".dnm"):
+        return read_dnm_file(model_file_path)
+    return read_srf_file(model_file_path)
+
+
+def read_model_vertices(model_file_path):
+    """Read every vertex of an SRF or DNM model. DNM meshes are moved into place using the SRF node positions.
+
+    inputs
+    model_file_path (str): path to where the srf or dnm file is
+
+    outputs
+    vertices (np.ndarray): (n, 3) array of vertex positions
+    """
+    if model_file_path.lower().endswith(".dnm"):
+        model = read_dnm_file(model_file_path)
+        meshes = {name: mesh for name, mesh in model.packs if isinstance(mesh, SurfModel)}
+        offsets = model.pack_offsets()
+        if len(offsets) > 0:
+            parts = [meshes[name].vertices + offset for name, offset in offsets if name in meshes]
+        else:
+            parts = [mesh.vertices for mesh in meshes.values()]
+    else:
+        parts = [read_srf_file(model_file_path).vertices]
+
+    parts = [part for part in parts if len(part) > 0]
+    if len(parts) == 0:
+        return np.zeros((0, 3))
+    return np.concatenate(parts)
+
+
+def check_model_geometry(entries, tolerance=0.1, min_radius_ratio=0.5):
+    """Check the DAT positional variables of aircraft and ground objects against their collision and visual models.
+
+    All entries are loaded first and then checked together with array operations:
+    - LEFTGEAR, RIGHGEAR and WHELGEAR must be inside the collision model's bounding box. Aircraft must have them,
+      ground objects usually do not, so they are only checked for ground objects that have them.
+    - COCKPITP must be inside the visual model's bounding box.
+    - HTRADIUS must enclose the collision model and must not be far smaller than the visual model.
+
+    inputs
+    entries (list): [name, lst type, dat path, visual model path, collision model path] for each entry to check, where
+                    lst type is 'Aircraft' or 'Ground'
+    tolerance (float): distance in meters that a point may be outside of a bounding box before it is reported
+    min_radius_ratio (float): smallest allowed HTRADIUS as a fraction of the visual model's radius
+
+    outputs
+    issues (list): [name, message] for every problem found. Entries whose files could not be read are reported too.
+    """
+    # Models are often shared between entries, so only read and reduce each model once.
+    bounds_cache = dict()
+
+    def model_bounds(path):
+        if path not in bounds_cache:
+            vertices = read_model_vertices(path)
+            if len(vertices) == 0:
+                bounds_cache[path] = np.full(7, np.nan)
+            else:
+                bounds_cache[path] = np.concatenate([vertices.min(axis=0),
+                                                     vertices.max(axis=0),
+                                                     [np.sqrt((vertices ** 2).sum(axis=1).max())]])
+        return bounds_cache[path]
+
+    issues = list()
+    names = list()
+    is_aircraft = list()
+    points = list()
+    radii = list()
+    collision_bounds = list()
+    visual_bounds = list()
+    for name, lst_type, dat_path, visual_path, collision_path in entries:
+        try:
+            positions, radius = read_dat_geometry(dat_path)
+            collision = model_bounds(collision_path)
+            visual = model_bounds(visual_path)
+        except (OSError, ValueError, IndexError) as error:
+            issues.append([name, "Could not read files for geometry check: {}".format(error)])
+            continue
+        names.append(name)
+        is_aircraft.append(lst_type == 'Aircraft')
+        points.append(positions)
+        radii.append(radius)
+        collision_bounds.append(collision)
+        visual_bounds.append(visual)
+
+    if len(names) == 0:
+        return issues
+
+    points = np.array(points)  # (entries, len(POSITION_KEYS), 3)
+    radii = np.array(radii)
+    collision_bounds = np.array(collision_bounds)  # (entries, 7): min xyz, max xyz, radius
+    visual_bounds = np.array(visual_bounds)
+
+    def outside(positions, bounds):
+        low = bounds[:, None, 0:3] - tolerance
+        high = bounds[:, None, 3:6] + tolerance
+        return np.any((positions < low) | (positions > high), axis=-1)
+
+    gear_idx = [POSITION_KEYS.index(key) for key in ['LEFTGEAR', 'RIGHGEAR', 'WHELGEAR']]
+    cockpit_idx = POSITION_KEYS.index('COCKPITP')
+
+    missing_points = np.isnan(points).any(axis=-1)
+    gear_outside = outside(points[:, gear_idx], collision_bounds) & ~missing_points[:, gear_idx]
+    cockpit_outside = outside(points[:, [cockpit_idx]], visual_bounds)[:, 0] & ~missing_points[:, cockpit_idx]
+    radius_below_collision = radii + tolerance < collision_bounds[:, 6]
+    radius_too_small = radii < min_radius_ratio * visual_bounds[:, 6]
+    empty_collision = np.isnan(collision_bounds[:, 0])
+    empty_visual = np.isnan(visual_bounds[:, 0])
+
+    for idx, name in enumerate(names):
+        if empty_collision[idx]:
+            issues.append([name, "Collision model has no vertices."])
+        if empty_visual[idx]:
+            issues.append([name, "Visual model has no vertices."])
+        for key_idx, key in enumerate(POSITION_KEYS):
+            if missing_points[idx, key_idx] and key != 'COCKPITP' and is_aircraft[idx]:
+                issues.append([name, "{} is missing or could not be read from the DAT file.".format(key)])
+        for col, key_idx in enumerate(gear_idx):
+            if gear_outside[idx, col]:
+                issues.append([name, "{} {} is outside of the collision model bounds {} to {}.".format(
+                    POSITION_KEYS[key_idx], format_point(points[idx, key_idx]),
+                    format_point(collision_bounds[idx, 0:3]), format_point(collision_bounds[idx, 3:6]))])
+        if cockpit_outside[idx]:
+            issues.append([name, "COCKPITP {} is outside of the visual model bounds {} to {}.".format(
+                format_point(points[idx, cockpit_idx]),
+                format_point(visual_bounds[idx, 0:3]), format_point(visual_bounds[idx, 3:6]))])
+        if np.isnan(radii[idx]):
+            issues.append([name, "HTRADIUS is missing or could not be read from the DAT file."])
+        elif radius_below_collision[idx]:
+            issues.append([name, "HTRADIUS {:.2f}m does not enclose the collision model (radius {:.2f}m).".format(
+                radii[idx], collision_bounds[idx, 6])])
+        elif radius_too_small[idx]:
+            issues.append([name, "HTRADIUS {:.2f}m is far smaller than the visual model (radius {:.2f}m).".format(
+                radii[idx], visual_bounds[idx, 6])])
+
+    return issues
+
+
+def format_point(point):
+    """Format an xyz point for reports."""
+    return "({})".format(", ".join("{:.2f}".format(i) for i in point))
+
+
+def face_arrays(faces):
+    """Flatten the vertex indices of all faces into arrays so that whole meshes can be processed at once.
+
+    inputs
+    faces (list): SurfFace instances
+
+    outputs
+    ids (np.ndarray): vertex index of every face corner, face after face
+    face_of (np.ndarray): face index of every face corner
+    starts (np.ndarray): position in ids of the first corner of each face
+    """
+    counts = np.array([len(face.vertex_ids) for face in faces], dtype=np.int64)
+    ids = np.fromiter((i for face in faces for i in face.vertex_ids), dtype=np.int64, count=int(counts.sum()))
+    face_of = np.repeat(np.arange(len(faces)), counts)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int64)
+    return ids, face_of, starts
+
+
+def collapse_face_corners(ids, face_of, starts, num_faces):
+    """Remove repeated corners from faces after vertices were merged.
+
+    A corner is removed when it uses the same vertex as the corner before it (the first corner is compared against the
+    last corner of the same face).
+
+    outputs
+    keep (np.ndarray): boolean mask of the corners to keep
+    corner_counts (np.ndarray): number of corners left for each face
+    """
+    if len(ids) == 0:
+        return np.zeros(0, dtype=bool), np.zeros(num_faces, dtype=np.int64)
+    previous = np.arange(len(ids)) - 1
+    counts = np.bincount(face_of, minlength=num_faces)
+    previous[starts[counts > 0]] = (starts + counts - 1)[counts > 0]
+    keep = ids != ids[previous]
+    corner_counts = np.bincount(face_of[keep], minlength=num_faces)
+    return keep, corner_counts
+
+
+def face_normal_line(vertices, ids):
+    """Build the N line (face center and normal) for a face using Newell's method."""
+    points = vertices[ids]
+    center = points.mean(axis=0)
+    following = np.roll(points, -1, axis=0)
+    normal = np.array([((points[:, 1] - following[:, 1]) * (points[:, 2] + following[:, 2])).sum(),
+                       ((points[:, 2] - following[:, 2]) * (points[:, 0] + following[:, 0])).sum(),
+                       ((points[:, 0] - following[:, 0]) * (points[:, 1] + following[:, 1])).sum()])
+    length = np.sqrt((normal ** 2).sum())
+    if length > 0:
+        normal = normal / length
+    return "N " + " ".join(format_number(i) for i in np.concatenate([center, normal]))
+
+
+def remap_face_lines(tail_lines, face_map):
+    """Update the face numbers in ZA, ZL and ZZ lines after faces were removed or reordered.
+
+    inputs
+    tail_lines (list): SurfModel.tail_lines
+    face_map (np.ndarray): new face index for every old face index, -1 for removed faces
+
+    outputs
+    lines (list): updated lines. Lines that no longer reference any face are removed.
+    """
+    lines = list()
+    for line in tail_lines:
+        parts = line.split()
+        if len(parts) > 1 and parts[0] == 'ZA':
+            # Pairs of face index and alpha value
+            values = list()
+            for face, alpha in zip(parts[1::2], parts[2::2]):
+                face = int(face)
+                if 0 <= face < len(face_map) and face_map[face] >= 0:
+                    values.extend([str(face_map[face]), alpha])
+            if values:
+                lines.append("ZA " + " ".join(values))
+        elif len(parts) > 1 and parts[0] in ('ZL', 'ZZ'):
+            values = [str(face_map[int(i)]) for i in parts[1:] if 0 <= int(i) < len(face_map) and face_map[int(i)] >= 0]
+            if values:
+                lines.append(parts[0] + " " + " ".join(values))
+        else:
+            lines.append(line)
+    return lines
+
+
+def merge_vertices(model, cluster, update_normals=True):
+    """Merge groups of vertices into single vertices, remap the faces and drop the geometry that is no longer used.
+
+    Each group of vertices is moved to its average position. Faces that lose corners because of the merge are dropped
+    when they no longer have enough corners to be drawn, and vertices that are not used by any face are removed.
+
+    inputs
+    model (SurfModel): mesh to process. It is not modified.
+    cluster (np.ndarray): group number of every vertex, numbered from 0
+    update_normals (bool): recalculate the N line of every face from the merged vertices
+
+    outputs
+    merged (SurfModel): processed mesh
+    """
+    merged = SurfModel()
+    merged.header_lines = list(model.header_lines)
+    num_clusters = cluster.max() + 1
+    members = np.bincount(cluster, minlength=num_clusters)
+    positions = np.stack([np.bincount(cluster, weights=model.vertices[:, axis], minlength=num_clusters)
+                          for axis in range(3)], axis=1) / np.maximum(members, 1)[:, None]
+    smooth = np.bincount(cluster, weights=model.smooth, minlength=num_clusters) > 0
+
+    # Remap the face corners. Polygons need 3 corners left, lines and points keep their original number of corners.
+    ids, face_of, starts = face_arrays(model.faces)
+    valid = (ids >= 0) & (ids < len(cluster))
+    mapped = np.where(valid, cluster[np.clip(ids, 0, len(cluster) - 1)], -1)
+    keep, corner_counts = collapse_face_corners(mapped, face_of, starts, len(model.faces))
+    original_counts = np.array([len(face.vertex_ids) for face in model.faces], dtype=np.int64)
+    kept_faces = (corner_counts >= np.minimum(original_counts, 3)) & (original_counts > 0)
+
+    # Only keep vertices that are still used by a face.
+    used = np.zeros(num_clusters, dtype=bool)
+    corner_mask = keep & kept_faces[face_of] & (mapped >= 0)
+    used[mapped[corner_mask]] = True
+    new_index = np.cumsum(used) - 1
+    merged.vertices = positions[used]
+    merged.smooth = smooth[used]
+
+    face_map = np.full(len(model.faces), -1, dtype=np.int64)
+    for face_idx in np.flatnonzero(kept_faces):
+        face = model.faces[face_idx]
+        corners = mapped[starts[face_idx]:starts[face_idx] + len(face.vertex_ids)]
+        corner_keep = keep[starts[face_idx]:starts[face_idx] + len(face.vertex_ids)]
+        if corner_counts[face_idx] < len(face.vertex_ids) and corner_counts[face_idx] < 3:
+            corner_keep = np.ones(len(corners), dtype=bool)  # Keep lines and points as they were written.
+        new_face = SurfFace()
+        new_face.vertex_ids = [int(i) for i in new_index[corners[corner_keep]]]
+        for line in face.lines:
+            if update_normals is True and line is not None and line.split()[:1] == ['N'] and \
+                    len(new_face.vertex_ids) >= 3:
+                new_face.lines.append(face_normal_line(merged.vertices, new_face.vertex_ids))
+            else:
+                new_face.lines.append(line)
+        face_map[face_idx] = len(merged.faces)
+        merged.faces.append(new_face)
+
+    merged.tail_lines = remap_face_lines(model.tail_lines, face_map)
+    return merged
+
+
+def copy_surf(model):
+    """Shallow copy of an SRF mesh with its own vertex arrays and line lists."""
+    copy = SurfModel()
+    copy.vertices = model.vertices.copy()
+    copy.smooth = model.smooth.copy()
+    copy.header_lines = list(model.header_lines)
+    copy.faces = list(model.faces)
+    copy.tail_lines = list(model.tail_lines)
+    return copy
+
+
+def cluster_surf(model, cell_size):
+    """Merge all vertices that fall into the same grid cell and drop the faces that collapse.
+
+    Merging every vertex inside a cell collapses all of the edges inside that cell at once, which lets a whole mesh be
+    simplified with a few array operations instead of one edge at a time.
+
+    inputs
+    model (SurfModel): mesh to simplify. It is not modified.
+    cell_size (float): edge length of the grid cells in meters
+
+    outputs
+    simplified (SurfModel): simplified mesh, with unreferenced vertices removed
+    """
+    if len(model.vertices) == 0 or len(model.faces) == 0:
+        return copy_surf(model)
+
+    cells = np.floor((model.vertices - model.vertices.min(axis=0)) / cell_size).astype(np.int64)
+    _, cluster = np.unique(cells, axis=0, return_inverse=True)
+    return merge_vertices(model, cluster.reshape(-1), update_normals=True)
+
+
+def weld_surf(model, tolerance):
+    """Weld coincident vertices and remove the vertices that no face uses.
+
+    Vertices are coincident when their coordinates round to the same multiple of tolerance. Vertices with and without
+    the R (smooth) flag are never welded together so that hard edges stay hard.
+
+    inputs
+    model (SurfModel): mesh to process. It is not modified.
+    tolerance (float): distance in meters below which vertices are treated as the same vertex
+
+    outputs
+    welded (SurfModel): processed mesh
+    """
+    if len(model.vertices) == 0:
+        return copy_surf(model)
+
+    keys = np.concatenate([np.round(model.vertices / tolerance).astype(np.int64), model.smooth[:, None]], axis=1)
+    _, cluster = np.unique(keys, axis=0, return_inverse=True)
+    return merge_vertices(model, cluster.reshape(-1), update_normals=False)
+
+
+def weld_model(model, tolerance):
+    """Weld the vertices of an SRF mesh, or of every packed mesh of a DNM model. The model is not modified."""
+    if isinstance(model, SurfModel):
+        return weld_surf(model, tolerance)
+
+    welded = DynaModel()
+    welded.header_lines = list(model.header_lines)
+    welded.node_lines = list(model.node_lines)
+    for name, mesh in model.packs:
+        if isinstance(mesh, SurfModel):
+            mesh = weld_surf(mesh, tolerance)
+        welded.packs.append([name, mesh])
+    return welded
+
+
+def count_model_vertices(model):
+    """Count the vertices of an SRF or DNM model."""
+    if isinstance(model, SurfModel):
+        return len(model.vertices)
+    return sum(len(mesh.vertices) for _, mesh in model.packs if isinstance(mesh, SurfModel))
+
+
+def weld_model_file(source_path, output_path, tolerance=0.0005, precision=4):
+    """Weld the vertices of an SRF or DNM file and write the result.
+
+    inputs
+    source_path (str): path of the srf or dnm file to read
+    output_path (str): path to write the processed model to
+    tolerance (float): distance in meters below which vertices are treated as the same vertex
+    precision (int): maximum number of decimals for the vertex coordinates
+
+    outputs
+    counts (tuple): vertex and face counts before, and vertex and face counts after
+    """
+    model = read_model_file(source_path)
+    welded = weld_model(model, tolerance)
+    write_model_file(welded, output_path, precision)
+    return count_model_vertices(model), count_model_faces(model), count_model_vertices(welded), \
+        count_model_faces(welded)
+
+
+def run_jobs(function, jobs, *args, max_workers=None):
+    """Call function(*job, *args) for each job in parallel worker processes.
+
+    A job that raises keeps the exception as its result, so one bad file does not stop the rest of the jobs.
+
+    inputs
+    function (function): module level function, so that it can be sent to the worker processes
+    jobs (list): list of the arguments that differ between the jobs, for each job
+    args: arguments passed to every job after its own
+    max_workers (int): number of worker processes. Defaults to the number of processors.
+
+    outputs
+    results (list): [job arguments..., result or the exception raised] for each job, in the order of jobs
+    """
+    results = list()
+    if len(jobs) == 0:
+        return results
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(function, *job, *args) for job in jobs]
+        for job, future in zip(jobs, futures):
+            try:
+                results.append(list(job) + [future.result()])
+            except Exception as error:  # Report the failure for this job and keep the rest of the results.
+                results.append(list(job) + [error])
+    return results
+
+
+def weld_model_files(jobs, tolerance=0.0005, precision=4, max_workers=None):
+    """Weld several SRF and DNM files in parallel worker processes.
+
+    inputs
+    jobs (list): [source path, output path] pairs
+    tolerance (float): distance in meters below which vertices are treated as the same vertex
+    precision (int): maximum number of decimals for the vertex coordinates
+    max_workers (int): number of worker processes. Defaults to the number of processors.
+
+    outputs
+    results (list): [source path, output path, counts or the exception raised] for each job
+    """
+    return run_jobs(weld_model_file, jobs, tolerance, precision, max_workers=max_workers)
+
+
+def count_clustered_faces(model, cell_size):
+    """Count the faces that would be left by cluster_surf without building the simplified mesh."""
+    if len(model.vertices) == 0 or len(model.faces) == 0:
+        return len(model.faces)
+    cells = np.floor((model.vertices - model.vertices.min(axis=0)) / cell_size).astype(np.int64)
+    _, cluster = np.unique(cells, axis=0, return_inverse=True)
+    cluster = cluster.reshape(-1)
+    ids, face_of, starts = face_arrays(model.faces)
+    valid = (ids >= 0) & (ids < len(cluster))
+    mapped = np.where(valid, cluster[np.clip(ids, 0, len(cluster) - 1)], -1)
+    _, corner_counts = collapse_face_corners(mapped, face_of, starts, len(model.faces))
+    original_counts = np.array([len(face.vertex_ids) for face in model.faces], dtype=np.int64)
+    return int(((corner_counts >= np.minimum(original_counts, 3)) & (original_counts > 0)).sum())
+
+
+def decimate_surf(model, target_faces, iterations=20):
+    """Simplify an SRF mesh to at most target_faces faces.
+
+    The grid cell size is found with a bisection search so that the mesh keeps as much detail as the face budget
+    allows.
+
+    inputs
+    model (SurfModel): mesh to simplify. It is not modified.
+    target_faces (int): maximum number of faces of the simplified mesh
+    iterations (int): number of bisection steps
+
+    outputs
+    simplified (SurfModel): simplified mesh
+    """
+    if len(model.faces) <= target_faces or len(model.vertices) == 0:
+        return model
+
+    size = np.ptp(model.vertices, axis=0).max()
+    if size <= 0:
+        return cluster_surf(model, 1.0)
+
+    # Fine cells keep detail, coarse cells remove faces. Find the finest cell that meets the face budget.
+    fine, coarse = size * 1e-4, size * 2.0
+    for _ in range(iterations):
+        middle = np.sqrt(fine * coarse)  # Bisect in log space since face counts scale with the cell size.
+        if count_clustered_faces(model, middle) > target_faces:
+            fine = middle
+        else:
+            coarse = middle
+    return cluster_surf(model, coarse)
+
+
+def decimate_model(model, target_faces):
+    """Simplify an SRF or DNM model to about target_faces faces in total.
+
+    For DNM models the face budget is shared between the packed meshes in proportion to their face counts so that
+    small parts are not removed entirely. Every mesh keeps at least one face if it had any.
+
+    inputs
+    model (SurfModel or DynaModel): model to simplify. It is not modified.
+    target_faces (int): face budget for the whole model
+
+    outputs
+    simplified (SurfModel or DynaModel): simplified model
+    """
+    if isinstance(model, SurfModel):
+        return decimate_surf(model, target_faces)
+
+    meshes = [mesh for _, mesh in model.packs if isinstance(mesh, SurfModel)]
+    total_faces = sum(len(mesh.faces) for mesh in meshes)
+
+    simplified = DynaModel()
+    simplified.header_lines = list(model.header_lines)
+    simplified.node_lines = list(model.node_lines)
+    for name, mesh in model.packs:
+        if isinstance(mesh, SurfModel) and total_faces > 0:
+            budget = max(1, int(target_faces * len(mesh.faces) / total_faces))
+            mesh = decimate_surf(mesh, budget)
+        simplified.packs.append([name, mesh])
+    return simplified
+
+
+def count_model_faces(model):
+    """Count the faces of an SRF or DNM model."""
+    if isinstance(model, SurfModel):
+        return len(model.faces)
+    return sum(len(mesh.faces) for _, mesh in model.packs if isinstance(mesh, SurfModel))
+
+
+def generate_coarse_model(visual_model_path, output_path, target_faces):
+    """Write a simplified copy of a visual model to use as the coarse model.
+
+    inputs
+    visual_model_path (str): path to the visual srf or dnm file
+    output_path (str): path to write the coarse model to
+    target_faces (int): face budget for the coarse model
+
+    outputs
+    face_counts (tuple): number of faces before and after simplification
+    """
+    model = read_model_file(visual_model_path)
+    coarse = decimate_model(model, target_faces)
+    write_model_file(coarse, output_path)
+    return count_model_faces(model), count_model_faces(coarse)
+
+
+def generate_coarse_models(jobs, target_faces, max_workers=None):
+    """Generate several coarse models in parallel worker processes.
+
+    inputs
+    jobs (list): [visual model path, output path] pairs
+    target_faces (int): face budget for each coarse model
+    max_workers (int): number of worker processes. Defaults to the number of processors.
+
+    outputs
+    results (list): [visual model path, output path, face counts or the exception raised] for each job
+    """
+    return run_jobs(generate_coarse_model, jobs, target_faces, max_workers=max_workers)
+
+
+def coarse_model_filename(visual_model_path):
+    """Name for a generated coarse model. Includes 'coarse' so that it follows the pack file naming checks."""
+    name, extension = os.path.splitext(os.path.basename(visual_model_path))
+    return "{}_coarse{}".format(name, extension.lower())
+
+
+def convex_hull(points, eps=1e-7):
+    """Find the convex hull of a set of points with the Quickhull algorithm.
+
+    inputs
+    points (np.ndarray): (n, 3) array of points
+    eps (float): distance tolerance, relative to the size of the point cloud
+
+    outputs
+    triangles (np.ndarray): (f, 3) array of point indices. Triangles are wound counter clockwise when viewed from
+                            outside of the hull. Returns None if the points do not span a volume.
+    """
+    points = np.asarray(points, dtype=float)
+    if len(points) < 4:
+        return None
+    eps = eps * max(np.ptp(points, axis=0).max(), 1.0)
+
+    # Initial tetrahedron from extreme points.
+    a = int(points[:, 0].argmin())
+    b = int(points[:, 0].argmax())
+    if np.allclose(points[a], points[b]):
+        b = int(((points - points[a]) ** 2).sum(axis=1).argmax())
+    direction = points[b] - points[a]
+    if np.sqrt((direction ** 2).sum()) <= eps:
+        return None
+    line_distance = np.sqrt((np.cross(points - points[a], direction) ** 2).sum(axis=1))
+    c = int(line_distance.argmax())
+    if line_distance[c] <= eps:
+        return None
+    normal = np.cross(points[b] - points[a], points[c] - points[a])
+    normal /= np.sqrt((normal ** 2).sum())
+    plane_distance = (points - points[a]) @ normal
+    d = int(np.abs(plane_distance).argmax())
+    if abs(plane_distance[d]) <= eps:
+        return None
+    if plane_distance[d] > 0:
+        b, c = c, b  # Make the base face point away from the fourth point.
+
+    faces = [[a, b, c], [a, d, b], [b, d, c], [c, d, a]]
+
+    def face_planes(face_list):
+        corners = points[np.array(face_list)]
+        normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+        normals /= np.maximum(np.sqrt((normals ** 2).sum(axis=1)), 1e-300)[:, None]
+        return normals, (normals * corners[:, 0]).sum(axis=1)
+
+    normals, offsets = face_planes(faces)
+
+    # Assign every point outside of the tetrahedron to the first face that it is in front of.
+    def assign(candidates, face_normals, face_offsets):
+        if len(candidates) == 0:
+            return [np.zeros(0, dtype=np.int64) for _ in range(len(face_normals))]
+        distances = points[candidates] @ face_normals.T - face_offsets
+        outside = distances > eps
+        owner = np.where(outside.any(axis=1), outside.argmax(axis=1), -1)
+        return [candidates[owner == idx] for idx in range(len(face_normals))]
+
+    outside_sets = assign(np.arange(len(points)), normals, offsets)
+
+    while True:
+        pending = [idx for idx, outside in enumerate(outside_sets) if len(outside) > 0]
+        if len(pending) == 0:
+            break
+        face_idx = pending[0]
+        candidates = outside_sets[face_idx]
+        eye = int(candidates[(points[candidates] @ normals[face_idx]).argmax()])
+
+        # Faces that can see the eye point are replaced by a cone of faces from the horizon to the eye point.
+        visible = (normals @ points[eye] - offsets) > eps
+        visible[face_idx] = True
+        visible_edges = set()
+        for idx in np.flatnonzero(visible):
+            i, j, k = faces[idx]
+            visible_edges.update([(i, j), (j, k), (k, i)])
+        horizon = [edge for edge in visible_edges if (edge[1], edge[0]) not in visible_edges]
+
+        orphans = np.concatenate([outside_sets[idx] for idx in np.flatnonzero(visible)])
+        orphans = orphans[orphans != eye]
+        faces = [face for face, hidden in zip(faces, visible) if not hidden]
+        outside_sets = [outside for outside, hidden in zip(outside_sets, visible) if not hidden]
+        new_faces = [[i, j, eye] for i, j in horizon]
+        new_normals, new_offsets = face_planes(new_faces)
+        faces.extend(new_faces)
+        outside_sets.extend(assign(orphans, new_normals, new_offsets))
+        normals = np.concatenate([normals[~visible], new_normals])
+        offsets = np.concatenate([offsets[~visible], new_offsets])
+
+    return np.array(faces, dtype=np.int64)
+
+
+def merge_coplanar_triangles(points, triangles, angle_tolerance=1e-3):
+    """Merge the coplanar triangles of a convex hull into convex polygons.
+
+    inputs
+    points (np.ndarray): (n, 3) array of points
+    triangles (np.ndarray): (f, 3) hull triangles from convex_hull
+    angle_tolerance (float): largest difference between unit normals for two triangles to be merged
+
+    outputs
+    polygons (list): lists of point indices wound counter clockwise when viewed from outside of the hull
+    normals (list): unit normal of each polygon
+    """
+    corners = points[triangles]
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    normals /= np.maximum(np.sqrt((normals ** 2).sum(axis=1)), 1e-300)[:, None]
+    scale = max(np.ptp(points, axis=0).max(), 1e-9)
+    offsets = (normals * corners[:, 0]).sum(axis=1) / scale
+
+    # Group triangles that share a plane. Quantizing the plane equations lets np.unique do the grouping.
+    keys = np.round(np.concatenate([normals, offsets[:, None]], axis=1) / angle_tolerance).astype(np.int64)
+    _, group = np.unique(keys, axis=0, return_inverse=True)
+    group = group.reshape(-1)
+
+    polygons = list()
+    polygon_normals = list()
+    for group_idx in range(group.max() + 1):
+        members = np.flatnonzero(group == group_idx)
+        normal = normals[members].mean(axis=0)
+        normal /= np.sqrt((normal ** 2).sum())
+        ids = np.unique(triangles[members])
+
+        # The facet of a convex hull is convex, so its outline is the 2D convex hull of its points.
+        u = np.cross(normal, [1.0, 0.0, 0.0] if abs(normal[0]) < 0.9 else [0.0, 1.0, 0.0])
+        u /= np.sqrt((u ** 2).sum())
+        v = np.cross(normal, u)
+        projected = np.stack([points[ids] @ u, points[ids] @ v], axis=1)
+        outline = ids[convex_hull_2d(projected)]
+        if len(outline) >= 3:
+            polygons.append([int(i) for i in outline])
+            polygon_normals.append(normal)
+    return polygons, polygon_normals
+
+
+def convex_hull_2d(points):
+    """Andrew's monotone chain convex hull. Returns indices in counter clockwise order."""
+    order = np.lexsort((points[:, 1], points[:, 0]))
+
+    def cross(o, a, b):
+        return (points[a, 0] - points[o, 0]) * (points[b, 1] - points[o, 1]) - \
+               (points[a, 1] - points[o, 1]) * (points[b, 0] - points[o, 0])
+
+    lower = list()
+    for idx in order:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], idx) <= 0:
+            lower.pop()
+        lower.append(idx)
+    upper = list()
+    for idx in order[::-1]:
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], idx) <= 0:
+            upper.pop()
+        upper.append(idx)
+    return np.array(lower[:-1] + upper[:-1], dtype=np.int64)
+
+
+def select_extreme_points(points, cell_size):
+    """Reduce a point cloud to one point per grid cell, keeping the point farthest from the center of the cloud.
+
+    Keeping the outermost point of each cell instead of the average keeps the simplified hull close to the original.
+    """
+    center = (points.min(axis=0) + points.max(axis=0)) / 2
+    cells = np.floor((points - points.min(axis=0)) / cell_size).astype(np.int64)
+    _, cell = np.unique(cells, axis=0, return_inverse=True)
+    cell = cell.reshape(-1)
+    distance = ((points - center) ** 2).sum(axis=1)
+    order = np.lexsort((-distance, cell))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = cell[order][1:] != cell[order][:-1]
+    return points[order[first]]
+
+
+def hull_polygons(points):
+    """Convex hull of a point cloud as merged polygons. Falls back to the bounding box for flat point clouds."""
+    triangles = convex_hull(points)
+    if triangles is None:
+        # Flat or degenerate model: use the bounding box, given a minimal thickness.
+        low, high = points.min(axis=0), points.max(axis=0)
+        thickness = max(np.ptp(points, axis=0).max() * 0.01, 0.01)
+        high = np.maximum(high, low + thickness)
+        points = np.array([[x, y, z] for x in (low[0], high[0]) for y in (low[1], high[1]) for z in (low[2], high[2])])
+        triangles = convex_hull(points)
+    polygons, normals = merge_coplanar_triangles(points, triangles)
+    return points, polygons, normals
+
+
+def make_hull_surf(vertices, face_budget, iterations=12):
+    """Build a convex hull collision mesh with at most face_budget faces.
+
+    If the exact hull has too many faces, the points are reduced to one extreme point per grid cell, and the grid cell
+    size is found with a bisection search.
+
+    inputs
+    vertices (np.ndarray): (n, 3) array of model vertices
+    face_budget (int): maximum number of faces of the collision mesh
+    iterations (int): number of bisection steps
+
+    outputs
+    model (SurfModel): collision mesh
+    """
+    points = np.unique(np.round(vertices, 6), axis=0)
+    if len(points) == 0:
+        raise ValueError("Cannot build a collision model from a model without vertices.")
+
+    hull_points, polygons, normals = hull_polygons(points)
+    if len(polygons) > face_budget:
+        size = np.ptp(points, axis=0).max()
+        fine, coarse = size * 1e-4, size
+        best = None
+        for _ in range(iterations):
+            middle = np.sqrt(fine * coarse)
+            result = hull_polygons(select_extreme_points(points, middle))
+            if len(result[1]) > face_budget:
+                fine = middle
+            else:
+                coarse = middle
+                best = result
+        if best is None:
+            best = hull_polygons(select_extreme_points(points, coarse))
+        hull_points, polygons, normals = best
+
+    # Only write the points used by the hull.
+    used = np.unique(np.concatenate([np.array(polygon) for polygon in polygons]))
+    new_index = np.full(len(hull_points), -1, dtype=np.int64)
+    new_index[used] = np.arange(len(used))
+
+    model = SurfModel()
+    model.vertices = hull_points[used]
+    model.smooth = np.zeros(len(used), dtype=bool)
+    for polygon, normal in zip(polygons, normals):
+        face = SurfFace()
+        face.vertex_ids = [int(i) for i in new_index[polygon]]
+        center = model.vertices[face.vertex_ids].mean(axis=0)
+        face.lines = ["C 128 128 128",
+                      "N " + " ".join(format_number(i) for i in np.concatenate([center, normal])),
+                      None]
+        model.faces.append(face)
+    model.tail_lines = ['E']
+    return model
+
+
+def generate_collision_model(visual_model_path, output_path, face_budget):
+    """Write a convex hull collision SRF for a visual model.
+
+    inputs
+    visual_model_path (str): path to the visual srf or dnm file
+    output_path (str): path to write the collision srf file to
+    face_budget (int): maximum number of faces of the collision model
+
+    outputs
+    counts (tuple): number of vertices of the visual model, and number of faces of the collision model
+    """
+    vertices = read_model_vertices(visual_model_path)
+    model = make_hull_surf(vertices, face_budget)
+    write_model_file(model, output_path)
+    return len(vertices), len(model.faces)
+
+
+def generate_collision_models(jobs, face_budget, max_workers=None):
+    """Generate several collision models in parallel worker processes.
+
+    inputs
+    jobs (list): [visual model path, output path] pairs
+    face_budget (int): maximum number of faces of each collision model
+    max_workers (int): number of worker processes. Defaults to the number of processors.
+
+    outputs
+    results (list): [visual model path, output path, counts or the exception raised] for each job
+    """
+    return run_jobs(generate_collision_model, jobs, face_budget, max_workers=max_workers)
+
+
+def collision_model_filename(visual_model_path):
+    """Name for a generated collision model. Includes 'coll' so that it follows the pack file naming checks."""
+    name = os.path.splitext(os.path.basename(visual_model_path))[0]
+    return "{}_coll.srf".format(name)
+
+
+# Keywords of SRF and DNM lines whose decimal values are coordinates that can be written with less precision.
+COMPACT_KEYWORDS = {'V', 'N', 'POS', 'CNT', 'STA'}
+
+
+def compact_token(token, precision, tolerance):
+    """Rewrite a decimal number token with fewer characters if the value stays within tolerance.
+
+    Integers and non-numeric tokens are returned unchanged so that vertex indices, angles and flags are not touched.
+    """
+    if '.' not in token and 'e' not in token.lower():
+        return token
+    try:
+        value = float(token)
+    except ValueError:
+        return token
+    compact = format_number(value, precision)
+    if abs(float(compact) - value) > tolerance or len(compact) > len(token):
+        return token
+    return compact
+
+
+def compact_model_line(line, precision, tolerance):
+    """Normalize the whitespace of a model file line and compact its coordinates.
+
+    Quoted names (ex: SRF "left wing") are kept as they are.
+    """
+    tokens = list()
+    token = ""
+    in_quotes = False
+    for character in line.rstrip("\r\n"):
+        if character == '"':
+            in_quotes = not in_quotes
+        if in_quotes is False and character in " \t":
+            if token:
+                tokens.append(token)
+                token = ""
+            continue
+        token += character
+    if token:
+        tokens.append(token)
+
+    if tokens and tokens[0] in COMPACT_KEYWORDS:
+        tokens = tokens[:1] + [compact_token(i, precision, tolerance) for i in tokens[1:]]
+    return " ".join(tokens)
+
+
+def compact_model_file(source_path, output_path, precision=4, tolerance=None):
+    """Rewrite an SRF or DNM file with compact coordinates and normalized whitespace.
+
+    The file is processed one line at a time, so memory use does not depend on the model size. Line counts are kept,
+    so PCK blocks stay valid without recounting. Every rewritten value is within tolerance of the original value,
+    otherwise the original token is kept.
+
+    inputs
+    source_path (str): path of the srf or dnm file to read
+    output_path (str): path to write the compact file to. Can be the source path.
+    precision (int): maximum number of decimals for coordinates
+    tolerance (float): largest allowed change of a coordinate. Defaults to half of the last kept decimal.
+
+    outputs
+    sizes (tuple): file size in bytes before and after
+    """
+    if tolerance is None:
+        tolerance = 0.5 * 10 ** -precision * (1 + 1e-9)
+
+    # Compacting a file in place goes through a temporary file that replaces the original once it is complete.
+    in_place = os.path.abspath(source_path) == os.path.abspath(output_path)
+    write_path = output_path + ".tmp" if in_place else output_path
+    size_before = source_size(source_path)
+
+    # latin-1 maps every byte to a character, so names in other encodings are written back unchanged.
+    with open_source(source_path, mode='r', encoding='latin-1', newline='') as source, \
+            open(write_path, mode='w', encoding='latin-1', newline='\n') as output:
+        for line in source:
+            output.write(compact_model_line(line, precision, tolerance) + "\n")
+    if in_place:
+        os.replace(write_path, output_path)
+    return size_before, os.path.getsize(output_path)
+
+
+def compact_model_files(jobs, precision=4, tolerance=None, max_workers=None):
+    """Compact several SRF and DNM files in parallel worker processes.
+
+    inputs
+    jobs (list): [source path, output path] pairs
+    precision (int): maximum number of decimals for coordinates
+    tolerance (float): largest allowed change of a coordinate
+    max_workers (int): number of worker processes. Defaults to the number of processors.
+
+    outputs
+    results (list): [source path, output path, sizes or the exception raised] for each job
+    """
+    return run_jobs(compact_model_file, jobs, precision, tolerance, max_workers=max_workers)
+
+
+# Number of MinHash values in a model fingerprint, split into LSH bands of MINHASH_BAND_SIZE values. Two models end up
+# in the same bucket of a band with a probability of similarity ** MINHASH_BAND_SIZE, so models with a similarity above
+# roughly (1 / number of bands) ** (1 / MINHASH_BAND_SIZE), about 0.5, are almost always compared.
+NUM_MINHASHES = 64
+MINHASH_BAND_SIZE = 4
+
+# Seeds of the MinHash functions. Fixed so that fingerprints made in different worker processes can be compared.
+MINHASH_SEEDS = np.random.default_rng(20240601).integers(1, 2 ** 63, size=NUM_MINHASHES, dtype=np.uint64)
+
+
+def mix_hashes(values):
+    """Scramble uint64 values with the splitmix64 finalizer, so that nearby inputs give unrelated hashes."""
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def geometry_tokens(mesh, precision=3):
+    """Turn the geometry of a mesh into a set of hashed tokens, one per face, ignoring colours and other face settings.
+
+    A face token depends on the rounded positions of its corners but not on their order or on the vertex numbering, so
+    meshes that were re-exported or had their faces reordered give the same tokens.
+
+    inputs
+    mesh (SurfModel): mesh to tokenize
+    precision (int): number of decimals the vertex positions are rounded to
+
+    outputs
+    tokens (np.ndarray): uint64 token of every face
+    """
+    if len(mesh.faces) == 0 or len(mesh.vertices) == 0:
+        return np.zeros(0, dtype=np.uint64)
+    quantized = np.round(mesh.vertices * 10 ** precision).astype(np.int64).view(np.uint64)
+    vertex_hashes = mix_hashes(mix_hashes(mix_hashes(quantized[:, 0]) ^ quantized[:, 1]) ^ quantized[:, 2])
+
+    ids, face_of, starts = face_arrays(mesh.faces)
+    valid = (ids >= 0) & (ids < len(vertex_hashes))
+    corner_hashes = np.where(valid, vertex_hashes[np.clip(ids, 0, len(vertex_hashes) - 1)], np.uint64(0))
+    # Sums wrap around in 64 bits, which keeps them independent of the corner order.
+    face_sums = np.zeros(len(mesh.faces), dtype=np.uint64)
+    np.add.at(face_sums, face_of, mix_hashes(corner_hashes))
+    counts = np.bincount(face_of, minlength=len(mesh.faces)).astype(np.uint64)
+    return mix_hashes(face_sums ^ counts)
+
+
+def minhash_signature(tokens):
+    """Compute the MinHash signature of a set of tokens: the smallest hash of the set under each of the hash functions.
+
+    The fraction of equal values in the signatures of two sets estimates the Jaccard similarity of the sets.
+    """
+    signature = np.full(NUM_MINHASHES, np.iinfo(np.uint64).max, dtype=np.uint64)
+    tokens = np.unique(tokens)
+    # Hash functions are applied a few at a time to bound the memory used by very large models.
+    step = max(1, 4 * 1024 * 1024 // max(1, len(tokens)))
+    for idx in range(0, NUM_MINHASHES, step):
+        if len(tokens) > 0:
+            seeds = MINHASH_SEEDS[idx:idx + step]
+            signature[idx:idx + step] = mix_hashes(tokens[None, :] ^ seeds[:, None]).min(axis=1)
+    return signature
+
+
+def model_fingerprint(model_file_path, precision=3):
+    """Fingerprint the geometry of an SRF or DNM file for duplicate detection.
+
+    inputs
+    model_file_path (str): path to the srf or dnm file
+    precision (int): number of decimals the vertex positions are rounded to
+
+    outputs
+    fingerprint (dict): 'size' of the file in bytes, 'file_hash' of its bytes, 'geometry_hash' of its meshes and node
+                        placements without colours, 'num_faces', and the 'minhash' signature of its face tokens
+    """
+    file_hash = hashlib.blake2b(digest_size=16)
+    with open_source(model_file_path, mode='rb') as model_file:
+        for chunk in iter(lambda: model_file.read(1024 * 1024), b""):
+            file_hash.update(chunk)
+
+    model = read_model_file(model_file_path)
+    if isinstance(model, SurfModel):
+        meshes = [["", model]]
+        node_lines = list()
+    else:
+        meshes = [[name, mesh] for name, mesh in model.packs if isinstance(mesh, SurfModel)]
+        node_lines = [line.strip() for line in model.node_lines if line.strip()]
+
+    # The exact geometry hash covers the rounded vertices, the face corners and the node hierarchy, in file order.
+    geometry_hash = hashlib.blake2b(digest_size=16)
+    tokens = list()
+    for name, mesh in meshes:
+        geometry_hash.update(name.encode('utf-8', errors='ignore') + b"\0")
+        geometry_hash.update(np.round(mesh.vertices * 10 ** precision).astype(np.int64).tobytes())
+        for face in mesh.faces:
+            geometry_hash.update(np.array(face.vertex_ids + [-1], dtype=np.int64).tobytes())
+        tokens.append(geometry_tokens(mesh, precision))
+    geometry_hash.update("\n".join(node_lines).encode('utf-8', errors='ignore'))
+
+    tokens = np.concatenate(tokens) if tokens else np.zeros(0, dtype=np.uint64)
+    return {'size': source_size(model_file_path),
+            'file_hash': file_hash.hexdigest(),
+            'geometry_hash': geometry_hash.hexdigest(),
+            'num_faces': len(tokens),
+            'minhash': minhash_signature(tokens)}
+
+
+def fingerprint_model_files(model_file_paths, precision=3, max_workers=None):
+    """Fingerprint several SRF and DNM files in parallel worker processes.
+
+    outputs
+    results (list): [model path, fingerprint or the exception raised] for each file
+    """
+    return run_jobs(model_fingerprint, [[path] for path in model_file_paths], precision,
+                    max_workers=max_workers)
+
+
+def find_duplicate_models(fingerprints, threshold=0.8):
+    """Group models whose geometry is identical or nearly identical.
+
+    Models are only compared when they share an LSH bucket, and then only with the first model of the bucket, so the
+    work grows with the number of models rather than with the number of pairs of models. Models whose estimated
+    similarity reaches the threshold are joined into clusters.
+
+    inputs
+    fingerprints (dict): model path to its fingerprint from model_fingerprint
+    threshold (float): smallest estimated Jaccard similarity of the face tokens for two models to be grouped
+
+    outputs
+    clusters (list): one dict per group of two or more models, largest savings first, with
+                     'base': the suggested shared model, the one with the most copies of its geometry in the group,
+                     'members': [path, 'identical', 'geometry' or 'similar', estimated similarity to the base] for the
+                                other models, where 'identical' files are byte for byte the same and 'geometry' files
+                                only differ in colours or other face settings,
+                     'reusable_bytes': size of the members that are identical to the base or only differ in colours
+    """
+    paths = sorted(fingerprints)
+    parents = list(range(len(paths)))
+
+    def find(idx):
+        while parents[idx] != idx:
+            parents[idx] = parents[parents[idx]]
+            idx = parents[idx]
+        return idx
+
+    def union(idx_a, idx_b):
+        root_a, root_b = find(idx_a), find(idx_b)
+        if root_a != root_b:
+            parents[max(root_a, root_b)] = min(root_a, root_b)
+
+    if len(paths) == 0:
+        return list()
+
+    # Models with the same geometry hash are grouped straight away and only one of them goes through the LSH buckets.
+    by_geometry = dict()
+    for idx, path in enumerate(paths):
+        by_geometry.setdefault(fingerprints[path]['geometry_hash'], list()).append(idx)
+    representatives = list()
+    for group in by_geometry.values():
+        representatives.append(group[0])
+        for idx in group[1:]:
+            union(group[0], idx)
+
+    signatures = np.array([fingerprints[paths[idx]]['minhash'] for idx in representatives], dtype=np.uint64)
+    rejected = set()  # Candidate pairs below the threshold, so that they are not compared again in other bands.
+    for start in range(0, NUM_MINHASHES, MINHASH_BAND_SIZE):
+        buckets = dict()
+        for position, band in enumerate(signatures[:, start:start + MINHASH_BAND_SIZE]):
+            buckets.setdefault(band.tobytes(), list()).append(position)
+        for bucket in buckets.values():
+            # Each model is compared with the bucket's first model only, so a bucket of k models takes at most k - 1
+            # comparisons. Similar models that miss each other here usually meet in the bucket of another band.
+            leader = bucket[0]
+            for position in bucket[1:]:
+                if find(representatives[leader]) == find(representatives[position]) or (leader, position) in rejected:
+                    continue
+                if np.mean(signatures[leader] == signatures[position]) >= threshold:
+                    union(representatives[leader], representatives[position])
+                else:
+                    rejected.add((leader, position))
+
+    groups = dict()
+    for idx in range(len(paths)):
+        groups.setdefault(find(idx), list()).append(paths[idx])
+
+    clusters = list()
+    for group in groups.values():
+        if len(group) < 2:
+            continue
+        # The base model is the one whose geometry has the most copies, ties going to the model with the most byte
+        # for byte copies and then to the model with the most faces.
+        geometry_counts = Counter(fingerprints[path]['geometry_hash'] for path in group)
+        file_counts = Counter(fingerprints[path]['file_hash'] for path in group)
+        base_idx = max(range(len(group)), key=lambda idx: (geometry_counts[fingerprints[group[idx]]['geometry_hash']],
+                                                          file_counts[fingerprints[group[idx]]['file_hash']],
+                                                          fingerprints[group[idx]]['num_faces']))
+        base = group[base_idx]
+        group_signatures = np.array([fingerprints[path]['minhash'] for path in group], dtype=np.uint64)
+        similarity = (group_signatures == group_signatures[base_idx]).mean(axis=1)
+
+        members = list()
+        reusable_bytes = 0
+        for idx, path in enumerate(group):
+            if idx == base_idx:
+                continue
+            if fingerprints[path]['file_hash'] == fingerprints[base]['file_hash']:
+                kind = 'identical'
+            elif fingerprints[path]['geometry_hash'] == fingerprints[base]['geometry_hash']:
+                kind = 'geometry'
+            else:
+                kind = 'similar'
+            if kind != 'similar':
+                reusable_bytes += fingerprints[path]['size']
+            members.append([path, kind, float(similarity[idx])])
+        members.sort(key=lambda member: (-member[2], member[0]))
+        clusters.append({'base': base, 'members': members, 'reusable_bytes': reusable_bytes})
+
+    clusters.sort(key=lambda cluster: (-cluster['reusable_bytes'], cluster['base']))
+    return clusters
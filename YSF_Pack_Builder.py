@@ -21,20 +21,24 @@ __author__ = "Decaff42"
 __copyright__ = "2024 by Decaff_42"
 __license__ = """Only non-commercial use with attribution is allowed without prior written permission from Decaff_42."""
 
-import csv
 import json
 import sys
+import tempfile
+import time
 from pathlib import PosixPath
 # Import standard Python Modules
 from tkinter import filedialog, messagebox
 from tkinter import ttk
 from tkinter import *
 from tkinter.ttk import *
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, fields
 from enum import Enum
-from typing import Union, List
+from typing import Dict, Iterator, Union, List
 import os
 
+from YSF_Install_Tools import find_lst_files, split_lst_line
+
 FILE_TYPES = {
     "srf": [("SRF File", "*.srf")],
     "dat": [("DAT File", "*.dat")],
@@ -487,10 +491,10 @@ class LSTBuilderGUI(Frame):
 
 
 def determine_lst_type_from_filename(path: os.PathLike):
-    filename = os.path.split()[-1]
+    filename = os.path.split(path)[-1]
 
     fname, ext = os.path.splitext(filename)
-    if ext.lower() != "lst":
+    if ext.lower() != ".lst":
         raise ValueError(f"File with location {path} must have the file extension '.lst'")
 
     if filename.lower().startswith("air"):
@@ -520,6 +524,20 @@ def lst_serialize(attribute):
         raise ValueError(f"Could not perform lst file serialization for attribute {attribute}")
 
 
+def format_lst_line(values: List[str]) -> str:
+    """
+    Helper function for writing the serialized entries of an LSTLine object as a line of an LST file.
+    Trailing empty entries are dropped, other empty entries are written as "" to keep the position of the entries
+    that follow them, and entries with spaces are quoted.
+    :param values: serialized entries of the line.
+    :return: LST file line without the line ending.
+    """
+    values = [str(value) for value in values]
+    while values and values[-1] == "":
+        values.pop()
+    return " ".join(f'"{value}"' if value == "" or " " in value else value for value in values)
+
+
 """
 ================ LST Classes ===================
 """
@@ -554,7 +572,7 @@ class AirLSTLine:
     _aircraft_name = None
 
     def get_csv_line(self):
-        return [lst_serialize(a) for a in self.__dict__.keys()]
+        return [lst_serialize(getattr(self, field.name)) for field in fields(self)]
 
     def aircraft_name(self):
         self._aircraft_name = (None, None)
@@ -599,7 +617,7 @@ class GroundLSTLine:
     _ground_object_name = None
 
     def get_csv_line(self):
-        return [lst_serialize(a) for a in self.__dict__.keys()]
+        return [lst_serialize(getattr(self, field.name)) for field in fields(self)]
 
 
 
@@ -634,7 +652,10 @@ class SceneryLSTLine:
     game_mode: str = ''
 
     def get_csv_line(self):
-        return [lst_serialize(a) for a in self.__dict__.keys()]
+        values = [lst_serialize(getattr(self, field.name)) for field in fields(self) if field.name != 'game_mode']
+        if self.game_mode:
+            values.append(self.game_mode)  # AIRRACE is a keyword, so it has to follow the mission file slot.
+        return values
 
 
 class LSTType(Enum):
@@ -657,39 +678,113 @@ class LSTFile:
                 raise ValueError("Scenery lines were provided but declared as type: {}".format(lst_type))
 
         self.lines = lines
+        self.lst_type = lst_type
 
     @staticmethod
-    def from_file(filepath: os.PathLike):
+    def parse_line(values: List[str], lst_type: LSTType) -> Union[AirLSTLine, GroundLSTLine, SceneryLSTLine]:
+        """
+        Build the LST line object for the tokens of an LST file line.
+        :param values: tokens of the line, as returned by split_lst_line.
+        :param lst_type: type of the LST file the line comes from.
+        :return: LST line object. Empty optional entries are None.
+        """
+        if lst_type == LSTType.SCENERY:
+            game_mode = ''
+            if len(values) > 3 and values[-1].upper() == "AIRRACE":
+                game_mode = values[-1].upper()
+                values = values[:-1]
+            if len(values) < 3 or len(values) > 4:
+                raise ValueError(f"Expected a name, fld, stp and optional yfs file but found {len(values)} entries")
+            return SceneryLSTLine(*[value or None for value in values], game_mode=game_mode)
+
+        if len(values) < 3 or len(values) > 5:
+            raise ValueError(f"Expected 3 to 5 files but found {len(values)} entries")
+        values = [value or None for value in values]
+        if lst_type == LSTType.AIRCRAFT:
+            return AirLSTLine(*values)
+        elif lst_type == LSTType.GROUND:
+            return GroundLSTLine(*values)
+        raise ValueError(f"Unrecognized LST type: {lst_type}")
+
+    @staticmethod
+    def iter_lines(filepath: os.PathLike, lst_type: LSTType = None) -> Iterator[Union[AirLSTLine, GroundLSTLine,
+                                                                                       SceneryLSTLine]]:
+        """
+        Lazily read the lines of an LST file, one line at a time, so that large files are not held in memory.
+        :param filepath: path to the LST file.
+        :param lst_type: type of the LST file. Determined from the file name if not provided.
+        :return: iterator over the LST line objects. Blank lines are skipped.
+        """
+        if lst_type is None:
+            lst_type = determine_lst_type_from_filename(filepath)
+
+        with open(filepath, "r", encoding="utf-8", errors="ignore") as file:
+            for line_number, line in enumerate(file, start=1):
+                values = split_lst_line(line)
+                if len(values) == 0:
+                    continue  # Empty line, skip
+                try:
+                    yield LSTFile.parse_line(values, lst_type)
+                except ValueError as e:
+                    raise ValueError(f"Fatal error when reading file '{filepath}', line {line_number}: {e}")
 
-        lst_type = determine_lst_type_from_filename(filepath)
+    @staticmethod
+    def from_file(filepath: os.PathLike, lst_type: LSTType = None):
+        if lst_type is None:
+            lst_type = determine_lst_type_from_filename(filepath)
+        return LSTFile(lines=list(LSTFile.iter_lines(filepath, lst_type)), lst_type=lst_type)
 
-        with open(filepath, "r", encoding="utf-8") as file:
-            csv_reader = csv.reader(file, delimiter=" ", quotechar="\"")
+    @staticmethod
+    def from_install_directory(install_directory: os.PathLike, max_workers: int = 8) -> Dict[str, "LSTFile"]:
+        """
+        Read every LST file of a YSFlight installation's aircraft, ground and scenery folders.
+        :param install_directory: the YSFlight installation folder.
+        :param max_workers: number of threads used to read the files.
+        :return: LST file path to LSTFile, or to the ValueError raised while reading it.
+        """
+        jobs = [(path, LSTType(lst_type)) for lst_type, paths in find_lst_files(install_directory).items()
+                for path in paths]
 
-            lines = []
+        def read(job):
+            try:
+                return LSTFile.from_file(*job)
+            except (OSError, ValueError) as e:
+                return e
 
-            for line_number, line in enumerate(csv_reader):
-                try:
-                    if len(line) == 0:
-                        continue  # Empty line, skip
-                    if lst_type == LSTType.AIRCRAFT:
-                        lines.append(AirLSTLine(**line))
-                    elif lst_type == LSTType.GROUND:
-                        lines.append(GroundLSTLine(**line))
-                    elif lst_type == LSTType.SCENERY:
-                        lines.append(SceneryLSTLine(**line))
-                    else:
-                        raise ValueError(f"Unrecognized LST type: {lst_type}")
-                except ValueError as e:
-                    raise ValueError(f"Fatal error when reading file '{filepath}', line {line_number + 1}: {e.message}")
-            return LSTFile(lines=lines, lst_type=lst_type)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return {path: result for (path, _), result in zip(jobs, executor.map(read, jobs))}
 
     def write_file(self, filepath: os.PathLike):
         with open(filepath, "w", encoding="utf-8") as file:
-            csv_writer = csv.writer(file, delimiter=" ", quotechar="\"", quoting=csv.QUOTE_ALL)
+            file.writelines(format_lst_line(line.get_csv_line()) + "\n" for line in self.lines)
 
-            csv_writer.writerows([line.get_csv_line() for line in self.lines])
+
+def benchmark_lst_reader(num_lines: int = 200000):
+    """
+    Time the LST reader on a generated aircraft LST file with a mix of quoted and unquoted lines.
+    :param num_lines: number of lines to generate.
+    :return: lines read per second.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        filepath = os.path.join(directory, "air_benchmark.lst")
+        with open(filepath, "w", encoding="utf-8") as file:
+            for i in range(num_lines):
+                if i % 4 == 0:
+                    file.write(f'"aircraft/my plane {i}.dat" "aircraft/my plane {i}.dnm" aircraft/coll{i}.srf "" '
+                               f'aircraft/coarse{i}.srf\n')
+                else:
+                    file.write(f"aircraft/plane{i}.dat aircraft/plane{i}.dnm aircraft/coll{i}.srf\n")
+
+        start = time.perf_counter()
+        count = sum(1 for _ in LSTFile.iter_lines(filepath))
+        elapsed = time.perf_counter() - start
+
+    print(f"Read {count} LST lines in {elapsed:.3f} s ({count / elapsed:,.0f} lines/s)")
+    return count / elapsed
 
 
 if __name__ == "__main__":
-    main()
+    if "--benchmark" in sys.argv:
+        benchmark_lst_reader()
+    else:
+        main()
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Helpers for working with assembled YSFlight packs.
+
+An assembled pack has the same layout as a YSFlight installation: LST files in the aircraft, ground and scenery
+folders, with lines referencing the pack's files relative to the pack folder (ex: users/UserName/PackName/plane.dat).
+"""
+
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from YSF_Install_Tools import find_lst_files, split_lst_line, read_dat_identify
+
+
+# Names of the LST line fields, in order, as used by the AirGndLSTEntry and SceLSTEntry classes.
+AIR_GND_LST_FIELDS = ['DAT', 'Visual_Model', 'Collision', 'Cockpit', 'Coarse']
+SCENERY_LST_FIELDS = ['map_name', 'Map', 'Start_Position', 'Mission']
+
+# First folder of the paths in LST files. Packs have been made with both, so either one is tried when resolving paths.
+USER_FOLDER_NAMES = ['users', 'user']
+
+
+def find_path_ignoring_case(root, parts):
+    """Find a file below root whose path matches parts without regard to case.
+
+    outputs
+    path (str): the matching path, or None if there is no match
+    """
+    path = root
+    for part in parts:
+        if os.path.exists(os.path.join(path, part)):
+            path = os.path.join(path, part)
+            continue
+        try:
+            matches = [item for item in os.listdir(path) if item.lower() == part.lower()]
+        except OSError:
+            return None
+        if len(matches) == 0:
+            return None
+        path = os.path.join(path, matches[0])
+    return path
+
+
+def resolve_pack_path(pack_directory, lst_path):
+    """Convert a path written in a pack's LST file to the file's path on disk.
+
+    LST files written by YSFlight and by this tool are not consistent about the case of the paths nor about the name of
+    the users/user folder, so all of these variations are tried.
+
+    inputs
+    pack_directory (str): folder holding the pack's aircraft, ground and scenery folders
+    lst_path (str): path as written in the LST file
+
+    outputs
+    path (str): path to the file. If it cannot be found, the path is returned as written, relative to the pack.
+    """
+    if not lst_path:
+        return ""
+    parts = [part for part in lst_path.replace("\\", "/").split("/") if part]
+    candidates = [parts]
+    if len(parts) > 1 and parts[0].lower() in USER_FOLDER_NAMES:
+        candidates += [[name] + parts[1:] for name in USER_FOLDER_NAMES if name != parts[0].lower()]
+
+    for candidate in candidates:
+        path = find_path_ignoring_case(pack_directory, candidate)
+        if path is not None and os.path.isfile(path):
+            return os.path.normpath(path)
+    return os.path.normpath(os.path.join(pack_directory, *parts))
+
+
+def read_pack_lst_entries(pack_directory):
+    """Read the LST files of an assembled pack and resolve the paths of their files.
+
+    inputs
+    pack_directory (str): folder holding the pack's aircraft, ground and scenery folders
+
+    outputs
+    entries (list): [LST type, dict of entry values] for each LST line, in the order of the LST files
+    """
+    entries = list()
+    for lst_type, lst_paths in find_lst_files(pack_directory).items():
+        for lst_path in lst_paths:
+            with open(lst_path, mode='r', errors='ignore') as lst_file:
+                for line in lst_file:
+                    fields = split_lst_line(line)
+                    if len(fields) == 0:
+                        continue
+                    if lst_type == 'Scenery':
+                        values = {'air_race': False}
+                        if len(fields) > 3 and fields[-1].upper() == 'AIRRACE':
+                            values['air_race'] = True
+                            fields = fields[:-1]
+                        for key, field in zip(SCENERY_LST_FIELDS, fields):
+                            values[key] = resolve_pack_path(pack_directory, field) if key != 'map_name' else field
+                    else:
+                        values = {key: resolve_pack_path(pack_directory, field)
+                                  for key, field in zip(AIR_GND_LST_FIELDS, fields)}
+                    entries.append([lst_type, values])
+    return entries
+
+
+def read_assembled_pack(pack_directory, max_workers=8):
+    """Read an assembled pack back into LST entry values, reading the IDENTIFY lines of the DAT files in parallel.
+
+    inputs
+    pack_directory (str): folder holding the pack's aircraft, ground and scenery folders
+    max_workers (int): number of threads used to read the DAT files
+
+    outputs
+    entries (list): [LST type, dict of entry values] for each LST line. Aircraft and ground object values include the
+                    IDENTIFY, which is "" if the DAT file could not be read.
+    """
+    entries = read_pack_lst_entries(pack_directory)
+    dat_paths = sorted({values['DAT'] for lst_type, values in entries if lst_type != 'Scenery'})
+
+    def read_identify(path):
+        try:
+            return read_dat_identify(path)
+        except OSError:
+            return ""
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        identifies = dict(zip(dat_paths, executor.map(read_identify, dat_paths)))
+
+    for lst_type, values in entries:
+        if lst_type != 'Scenery':
+            values['IDENTIFY'] = identifies[values['DAT']]
+    return entries
+
+
+def link_file(source_path, link_path):
+    """Make link_path point at source_path without copying any data, replacing any existing file at link_path.
+
+    Symbolic links are tried first because they follow the source file even when a modelling tool saves it by replacing
+    the file. Hard links are used when symbolic links are not allowed (ex: Windows without Developer Mode), and only
+    work when both paths are on the same drive.
+
+    outputs
+    method (str): 'symlink' or 'hardlink'. Raises OSError if neither kind of link can be made.
+    """
+    source_path = os.path.abspath(source_path)
+    if os.path.lexists(link_path):
+        os.remove(link_path)
+    try:
+        os.symlink(source_path, link_path)
+        return 'symlink'
+    except (OSError, NotImplementedError):
+        os.link(source_path, link_path)
+        return 'hardlink'
+
+
+def remove_stale_files(folder, keep_paths):
+    """Delete the files in a folder that are not in keep_paths, so that files from a previous deployment of the pack
+    do not linger.
+
+    outputs
+    removed (list): names of the deleted files
+    """
+    keep = {os.path.normcase(os.path.abspath(path)) for path in keep_paths}
+    removed = list()
+    for name in sorted(os.listdir(folder)):
+        path = os.path.join(folder, name)
+        if (os.path.islink(path) or os.path.isfile(path)) and os.path.normcase(os.path.abspath(path)) not in keep:
+            os.remove(path)
+            removed.append(name)
+    return removed
+
+
+def find_output_owners(pack_directory, built_entries, output_paths, listed_paths=()):
+    """Find the outputs of a partial build that belong to entries of an assembled pack that are not being built.
+
+    An LST line of the pack belongs to the build when it has the IDENTIFY or map name of a built entry, or uses the DAT
+    file a built entry writes. The files used by the other lines are theirs. Files listed by the pack's manifest that
+    no line of the build uses are the pack's, as their owner cannot be told.
+
+    inputs
+    pack_directory (str): folder holding the pack's aircraft, ground and scenery folders
+    built_entries (list): [LST type, IDENTIFY or map name, DAT output path or ""] for each entry being built
+    output_paths (iterable): paths the build writes
+    listed_paths (iterable): paths of the files in the pack's manifest
+
+    outputs
+    claimed (dict): output path to the names of the other entries using it, empty for files only in the manifest
+    shared (dict): output path to the names of the other entries that share it with a built entry
+    """
+    def path_key(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    built_names = {(lst_type, name.strip().upper()) for lst_type, name, _ in built_entries}
+    built_dats = {path_key(dat_path) for _, _, dat_path in built_entries if dat_path}
+    own = set()
+    others = dict()
+    for lst_type, values in read_assembled_pack(pack_directory):
+        name = values['map_name'] if lst_type == 'Scenery' else values['IDENTIFY']
+        fields = SCENERY_LST_FIELDS[1:] if lst_type == 'Scenery' else AIR_GND_LST_FIELDS
+        paths = [path_key(values[field]) for field in fields if values.get(field)]
+        if (lst_type, name.strip().upper()) in built_names or \
+                (lst_type != 'Scenery' and values.get('DAT') and path_key(values['DAT']) in built_dats):
+            own.update(paths)
+        else:
+            for path in paths:
+                others.setdefault(path, list()).append(name)
+    listed = {path_key(path) for path in listed_paths}
+
+    claimed = dict()
+    shared = dict()
+    for output in output_paths:
+        key = path_key(output)
+        if key in own and key in others:
+            shared[output] = sorted(set(others[key]))
+        elif key in others:
+            claimed[output] = sorted(set(others[key]))
+        elif key in listed and key not in own:
+            claimed[output] = list()
+    return claimed, shared
+
+
+def find_mod_folder(pack_directory, pack_name, username=None):
+    """Find the folder holding the files of an assembled pack (ex: [PackName]/user/[UserName]/[PackName]).
+
+    inputs
+    pack_directory (str): folder holding the pack's aircraft, ground and scenery folders
+    pack_name (str): name of the pack
+    username (str): YSFlight username of the pack. Every user folder is searched if None.
+
+    outputs
+    path (str): path to the mod folder, or None if the pack does not have one
+    """
+    for user_folder_name in USER_FOLDER_NAMES:
+        user_folder = find_path_ignoring_case(pack_directory, [user_folder_name])
+        if user_folder is None or os.path.isdir(user_folder) is False:
+            continue
+        usernames = [username] if username else sorted(os.listdir(user_folder))
+        for name in usernames:
+            path = find_path_ignoring_case(user_folder, [name, pack_name])
+            if path is not None and os.path.isdir(path):
+                return path
+    return None
+
+
+def replace_lst_lines(lst_file_path, pack_directory, lst_type, new_lines):
+    """Replace the lines of an LST file that belong to the given entries, keeping the other lines and their order.
+
+    Lines are matched by their first field, which is the DAT file path for aircraft and ground objects and the map name
+    for sceneries. Aircraft and ground object lines that do not match, because the DAT file was renamed, are matched by
+    the IDENTIFY of their DAT file instead. Entries that are not in the LST file yet are added to the end of it.
+
+    A coarse model on the old line is kept if the new line has none, as coarse models are generated for the whole pack.
+
+    inputs
+    lst_file_path (str): path to the LST file, which is created if it does not exist
+    pack_directory (str): folder holding the pack's aircraft, ground and scenery folders
+    lst_type (str): 'Aircraft', 'Ground' or 'Scenery'
+    new_lines (list): [IDENTIFY or map name, new LST line] for each entry
+
+    outputs
+    num_replaced (int): number of lines that were replaced
+    num_added (int): number of lines added to the end of the file
+    """
+    old_lines = list()
+    if os.path.isfile(lst_file_path):
+        with open(lst_file_path, mode='r', errors='ignore') as lst_file:
+            old_lines = [line.rstrip("\r\n") for line in lst_file if line.strip()]
+    old_fields = [split_lst_line(line) for line in old_lines]
+    first_fields = {fields[0].lower(): idx for idx, fields in enumerate(old_fields) if fields}
+
+    replacements = dict()
+    unmatched = list()
+    for name, line in new_lines:
+        idx = first_fields.get(split_lst_line(line)[0].lower())
+        if idx is None:
+            unmatched.append([name, line])
+        else:
+            replacements[idx] = line
+
+    added = list()
+    if len(unmatched) > 0 and lst_type != 'Scenery':
+        # Only read the DAT files of the remaining lines when an entry could not be matched by its DAT path.
+        identifies = dict()
+        for idx, fields in enumerate(old_fields):
+            if idx in replacements or not fields:
+                continue
+            try:
+                identify = read_dat_identify(resolve_pack_path(pack_directory, fields[0]))
+            except OSError:
+                continue
+            identifies.setdefault(identify.strip().upper(), idx)
+        for name, line in unmatched:
+            idx = identifies.get(name.strip().upper())
+            if idx is None or idx in replacements:
+                added.append(line)
+            else:
+                replacements[idx] = line
+    else:
+        added = [line for _, line in unmatched]
+
+    if lst_type != 'Scenery':
+        for idx, line in replacements.items():
+            fields = split_lst_line(line)
+            if len(old_fields[idx]) > 4 and old_fields[idx][4] and (len(fields) < 5 or not fields[4]):
+                fields = (fields + [""] * 5)[:5]
+                fields[4] = old_fields[idx][4]
+                replacements[idx] = " ".join('"{}"'.format(field) for field in fields)
+
+    lines = [replacements.get(idx, line) for idx, line in enumerate(old_lines)] + added
+    with open(lst_file_path + ".tmp", mode='w') as lst_file:
+        lst_file.writelines(line + "\n" for line in lines)
+    os.replace(lst_file_path + ".tmp", lst_file_path)
+    return len(replacements), len(added)
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Helpers for suggesting the model files that belong with a DAT file.
+
+Modders usually name the files of an aircraft after each other (ex: MiG-23MF.dat, MiG-23MF.dnm, mig23cl.srf and
+mig23cpt.srf), and mark the collision, cockpit and coarse models with short markers in the file name. The index keeps
+the file name trigrams of every model file under the indexed folders, so that the files with names close to a DAT file
+can be found without comparing the DAT against every file.
+
+Folders are only listed again when their modification time changes, which happens when files are added, removed or
+renamed in them, so refreshing the index of a large tree only takes one stat call per folder.
+"""
+
+
+import os
+import re
+import threading
+from collections import Counter
+
+
+# Extensions of the files that are indexed.
+MODEL_EXTENSIONS = ('.dnm', '.srf')
+
+# LST slots that model files are suggested for, in the order of the LST line after the DAT file.
+MODEL_SLOTS = ['Visual', 'Collision', 'Cockpit', 'Coarse']
+
+# Name tokens, and the start of longer words, that mark the model slot of a file. Visual models have no marker.
+SLOT_MARKERS = {'Collision': (('cl', 'col', 'hit'), ('coll',)),
+                'Cockpit': (('cp', 'cpt', 'ckpt'), ('cock',)),
+                'Coarse': (('crs', 'lod'), ('coar',))}
+
+# Runs of letters or digits, so that mig23cl splits into mig, 23 and cl.
+NAME_TOKEN_PATTERN = re.compile(r'[a-z]+|[0-9]+')
+
+# Weights of the name similarity, the slot marker and the directory proximity in the score of a suggestion.
+NAME_WEIGHT = 0.45
+MARKER_WEIGHT = 0.35
+PROXIMITY_WEIGHT = 0.2
+
+# Largest number of name matches scored for each suggestion, the files in the DAT's folder are always scored.
+MAX_CANDIDATES = 500
+
+
+def name_tokens(path):
+    """Split the file name of path, without its extension, into lower case letter and digit tokens."""
+    return NAME_TOKEN_PATTERN.findall(os.path.splitext(os.path.basename(path))[0].lower())
+
+
+def slot_markers(tokens):
+    """Return the set of model slots whose markers appear in the name tokens."""
+    slots = set()
+    for slot, (words, prefixes) in SLOT_MARKERS.items():
+        if any(token in words or token.startswith(prefixes) for token in tokens):
+            slots.add(slot)
+    return slots
+
+
+def trigrams(tokens):
+    """Return the set of three character substrings of the joined tokens, padded so that short names still have some."""
+    text = " {} ".format("".join(tokens))
+    return {text[idx:idx + 3] for idx in range(len(text) - 2)}
+
+
+def folder_distance(folder_a, folder_b):
+    """Count the folder steps between two folders, or None if they are on different drives."""
+    try:
+        common = os.path.commonpath([folder_a, folder_b])
+    except ValueError:
+        return None
+    steps = 0
+    for folder in (folder_a, folder_b):
+        relative = os.path.relpath(folder, common)
+        if relative != os.curdir:
+            steps += len(relative.split(os.sep))
+    return steps
+
+
+class ModelFileIndex:
+    """File name index of the model files under one or more folders, for suggesting the model files of a DAT file.
+
+    The index can be refreshed from a background thread while suggestions are made, and only lists the folders that
+    changed since the last refresh.
+
+    inputs
+    extensions (tuple): lower case extensions, with the dot, of the files to index
+    """
+    def __init__(self, extensions=MODEL_EXTENSIONS):
+        self.extensions = extensions
+        self.roots = list()
+        self.folders = dict()  # Folder to [modification time in ns, sub folders, indexed files]
+        self.files = dict()  # File path to {'folder', 'markers', 'trigrams'}. Trigrams do not include slot markers.
+        self.postings = dict()  # Trigram to the set of file paths whose name has it
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def add_root(self, folder):
+        """Add a folder to index with its sub folders. Returns False if it is already covered by an indexed folder."""
+        folder = os.path.normpath(os.path.abspath(folder))
+        with self.lock:
+            for root in self.roots:
+                if is_sub_folder(folder, root):
+                    return False
+            self.roots = [root for root in self.roots if not is_sub_folder(root, folder)] + [folder]
+        return True
+
+    def is_indexed(self, folder):
+        """Return True if folder is under one of the indexed folders."""
+        folder = os.path.normpath(os.path.abspath(folder))
+        return any(is_sub_folder(folder, root) for root in self.roots)
+
+    def add_file(self, path, folder):
+        """Add a file to the lookups. The lock must be held."""
+        tokens = name_tokens(path)
+        markers = slot_markers(tokens)
+        plain_tokens = [token for token in tokens if len(slot_markers([token])) == 0]
+        name_trigrams = trigrams(plain_tokens if plain_tokens else tokens)
+        self.files[path] = {'folder': folder, 'markers': markers, 'trigrams': name_trigrams}
+        for trigram in name_trigrams:
+            self.postings.setdefault(trigram, set()).add(path)
+
+    def remove_file(self, path):
+        """Remove a file from the lookups, if it is in them. The lock must be held."""
+        info = self.files.pop(path, None)
+        if info is None:
+            return
+        for trigram in info['trigrams']:
+            paths = self.postings.get(trigram)
+            if paths is not None:
+                paths.discard(path)
+                if len(paths) == 0:
+                    del self.postings[trigram]
+
+    def refresh_folder(self, folder):
+        """List a folder again if it changed since it was last listed.
+
+        outputs
+        sub_folders (list): sub folders of the folder, empty if it cannot be read
+        """
+        try:
+            modified = os.stat(folder).st_mtime_ns
+        except OSError:
+            modified = None
+
+        with self.lock:
+            cached = self.folders.get(folder)
+        if cached is not None and cached[0] == modified:
+            return cached[1]
+
+        sub_folders = list()
+        files = list()
+        if modified is not None:
+            try:
+                with os.scandir(folder) as entries:
+                    for entry in entries:
+                        try:
+                            # Links to folders are not followed, so that a link loop cannot be walked forever.
+                            if entry.is_dir(follow_symlinks=False):
+                                sub_folders.append(entry.path)
+                            elif entry.name.lower().endswith(self.extensions):
+                                files.append(entry.path)
+                        except OSError:
+                            continue
+            except OSError:
+                modified = None
+
+        # The folder may have been refreshed by another thread while it was listed, so the diff is taken against what
+        # is cached now.
+        with self.lock:
+            cached = self.folders.get(folder)
+            old_files = set(cached[2]) if cached is not None else set()
+            for path in old_files.difference(files):
+                self.remove_file(path)
+            for path in set(files).difference(old_files):
+                self.add_file(path, folder)
+            if modified is None:
+                self.folders.pop(folder, None)
+            else:
+                self.folders[folder] = [modified, sub_folders, files]
+        return sub_folders
+
+    def refresh(self):
+        """Bring the index up to date with the files under the indexed folders.
+
+        outputs
+        num_files (int): number of indexed files
+        """
+        visited = set()
+        stack = list(self.roots)
+        while stack:
+            folder = stack.pop()
+            if folder in visited:
+                continue
+            visited.add(folder)
+            stack.extend(self.refresh_folder(folder))
+
+        # Folders that were removed, or are no longer under an indexed folder.
+        with self.lock:
+            for folder in [folder for folder in self.folders if folder not in visited]:
+                for path in self.folders.pop(folder)[2]:
+                    self.remove_file(path)
+        return len(self.files)
+
+    def start_refresh(self):
+        """Refresh the index in a background thread, unless a refresh is already running."""
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.thread = threading.Thread(target=self.refresh, daemon=True)
+        self.thread.start()
+
+    def suggest(self, dat_file_path, num_suggestions=5):
+        """Rank the indexed model files for each model slot of a DAT file.
+
+        A file's score combines how close its name is to the DAT file's name, whether its name carries the marker of
+        the slot (ex: cl or coll for the collision model), and how many folders away it is from the DAT file.
+
+        inputs
+        dat_file_path (str): path to the DAT file
+        num_suggestions (int): largest number of suggestions for each slot
+
+        outputs
+        suggestions (dict): slot name to [[file path, score], ...], best first
+        """
+        dat_folder = os.path.dirname(os.path.abspath(dat_file_path))
+        tokens = name_tokens(dat_file_path)
+        dat_trigrams = trigrams(tokens)
+
+        with self.lock:
+            counts = Counter()
+            for trigram in dat_trigrams:
+                counts.update(self.postings.get(trigram, ()))
+            candidates = {path for path, _ in counts.most_common(MAX_CANDIDATES)}
+            if dat_folder in self.folders:
+                candidates.update(self.folders[dat_folder][2])
+            candidates = {path: self.files[path] for path in candidates if path in self.files}
+
+        suggestions = {slot: list() for slot in MODEL_SLOTS}
+        for path, info in candidates.items():
+            union = len(dat_trigrams | info['trigrams'])
+            name_score = len(dat_trigrams & info['trigrams']) / union if union > 0 else 0.0
+            distance = folder_distance(dat_folder, info['folder'])
+            proximity_score = 0.0 if distance is None else 1.0 / (1 + distance)
+            for slot in MODEL_SLOTS:
+                if slot == 'Visual':
+                    marker_score = 1.0 if len(info['markers']) == 0 else -1.0
+                elif slot in info['markers']:
+                    marker_score = 1.0
+                else:
+                    marker_score = -1.0 if len(info['markers']) > 0 else 0.0
+                score = NAME_WEIGHT * name_score + MARKER_WEIGHT * marker_score + PROXIMITY_WEIGHT * proximity_score
+                if score > 0:
+                    suggestions[slot].append([path, score])
+
+        for slot in MODEL_SLOTS:
+            suggestions[slot].sort(key=lambda suggestion: (-suggestion[1], suggestion[0]))
+            del suggestions[slot][num_suggestions:]
+        return suggestions
+
+
+def is_sub_folder(folder, parent):
+    """Return True if folder is parent or one of its sub folders."""
+    try:
+        return os.path.commonpath([folder, parent]) == parent
+    except ValueError:
+        return False  # Different drives
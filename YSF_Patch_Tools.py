@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Helpers for making and applying update patches between two versions of an assembled pack.
+
+The two versions are compared by the hashes in their manifests, so no file is read to find what changed. The patch is a
+zip archive holding patch.json, which lists the removed, added and modified files with their hashes, and the data of
+the new and modified files. Large modified files (ex: an edited DNM model) are stored as binary deltas against the old
+version of the file instead of in full.
+
+Deltas work like rsync: the old file is split into blocks, and a rolling checksum is computed at every offset of the
+new file. Offsets whose checksum matches a block of the old file, and whose strong hash confirms the match, are copied
+from the old file, and everything else is stored as literal data. The rolling checksums for the whole file are computed
+at once with numpy cumulative sums.
+
+Applying a patch checks that the installed files match the old version, writes every new file next to the file it
+replaces, checks its hash, and only then moves the new files into place and writes the new manifest.
+"""
+
+
+import hashlib
+import json
+import math
+import os
+import zipfile
+
+import numpy as np
+
+from YSF_Build_Tools import hash_file, read_manifest, write_manifest
+
+
+# Increment when the layout of patch.json changes.
+PATCH_VERSION = 1
+
+# Modified files at least this large are stored as deltas, smaller files are stored in full.
+DELTA_MIN_SIZE = 64 * 1024
+
+# Smallest and largest block size of the deltas. The block size grows with the square root of the file size.
+MIN_BLOCK_SIZE = 256
+MAX_BLOCK_SIZE = 16384
+
+# Suffix of the new files written while a patch is applied, before they are moved into place.
+PATCH_TEMP_SUFFIX = ".patch-tmp"
+
+
+def choose_block_size(file_size):
+    """Return the delta block size for an old file of file_size bytes."""
+    return int(min(MAX_BLOCK_SIZE, max(MIN_BLOCK_SIZE, math.sqrt(file_size))))
+
+
+def rolling_checksums(data, block_size):
+    """Compute the weak checksum of every block_size window of data.
+
+    The checksum is the Adler-32 style pair (a, b), where a is the sum of the bytes of the window and b the sum of the
+    bytes weighted by their distance from the end of the window, so both can be found for every offset from two
+    cumulative sums instead of updating them one byte at a time.
+
+    inputs
+    data (ndarray): uint8 array of the file's bytes
+    block_size (int): window size
+
+    outputs
+    checksums (ndarray): uint32 checksum of the window starting at each offset, len(data) - block_size + 1 values
+    """
+    if len(data) < block_size:
+        return np.zeros(0, dtype=np.uint32)
+    # Only the low 16 bits of a and b are kept, so the sums can wrap around in 32 bit integers, which halves the memory
+    # used compared to 64 bit sums without changing the result.
+    with np.errstate(over='ignore'):
+        values = data.astype(np.uint32)
+        sums = np.zeros(len(values) + 1, dtype=np.uint32)
+        np.cumsum(values, out=sums[1:])
+        weighted_sums = np.zeros(len(values) + 1, dtype=np.uint32)
+        np.cumsum(values * np.arange(len(values), dtype=np.uint32), out=weighted_sums[1:])
+        num_windows = len(data) - block_size + 1
+        a = sums[block_size:] - sums[:num_windows]
+        b = (np.arange(block_size, block_size + num_windows, dtype=np.uint32) * a -
+             (weighted_sums[block_size:] - weighted_sums[:num_windows]))
+    return (a & 0xFFFF) | ((b & 0xFFFF) << 16)
+
+
+def block_checksums(data, block_size):
+    """Compute the weak checksums of the consecutive whole blocks of data, the same as every block_size-th value of
+    rolling_checksums."""
+    num_blocks = len(data) // block_size
+    blocks = data[:num_blocks * block_size].reshape(num_blocks, block_size).astype(np.uint32)
+    a = blocks.sum(axis=1, dtype=np.uint32)
+    b = blocks @ np.arange(block_size, 0, -1, dtype=np.uint32)
+    return (a & 0xFFFF) | ((b & 0xFFFF) << 16)
+
+
+def strong_hash(data):
+    """Return the strong hash used to confirm that a block matches."""
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def make_delta(old_data, new_data, block_size=None):
+    """Describe new_data as copies of ranges of old_data and literal data.
+
+    inputs
+    old_data (bytes): old version of the file
+    new_data (bytes): new version of the file
+    block_size (int): delta block size, chosen from the old file's size if None
+
+    outputs
+    operations (list): [old offset, length] to copy from the old file, or [-1, length] to read from the literal data
+    literals (bytes): literal data of the [-1, length] operations, in order
+    """
+    if block_size is None:
+        block_size = choose_block_size(len(old_data))
+
+    # Weak checksum to the starting offsets of the old file's blocks. The old file is split at block boundaries.
+    old_array = np.frombuffer(old_data, dtype=np.uint8)
+    old_checksums = block_checksums(old_array, block_size)
+    blocks = dict()
+    for idx, checksum in enumerate(old_checksums.tolist()):
+        blocks.setdefault(checksum, list()).append(idx * block_size)
+
+    # Offsets of the new file whose weak checksum is one of the old file's blocks. A binary search in the sorted block
+    # checksums is much faster than np.isin for the millions of offsets of a large model.
+    new_checksums = rolling_checksums(np.frombuffer(new_data, dtype=np.uint8), block_size)
+    candidates = np.zeros(0, dtype=np.int64)
+    if len(blocks) > 0 and len(new_checksums) > 0:
+        sorted_checksums = np.unique(old_checksums)
+        positions = np.minimum(np.searchsorted(sorted_checksums, new_checksums), len(sorted_checksums) - 1)
+        candidates = np.flatnonzero(sorted_checksums[positions] == new_checksums)
+
+    operations = list()
+    literals = bytearray()
+
+    def add_operation(offset, length):
+        if length == 0:
+            return
+        if len(operations) > 0 and operations[-1][0] >= 0 and offset >= 0 and \
+                operations[-1][0] + operations[-1][1] == offset:
+            operations[-1][1] += length  # Consecutive blocks of the old file
+        elif len(operations) > 0 and operations[-1][0] < 0 and offset < 0:
+            operations[-1][1] += length
+        else:
+            operations.append([offset, length])
+
+    position = 0  # Start of the new data that is not described yet
+    idx = 0
+    while idx < len(candidates):
+        offset = int(candidates[idx])
+        if offset < position:
+            idx = int(np.searchsorted(candidates, position))
+            continue
+        window = new_data[offset:offset + block_size]
+        digest = strong_hash(window)
+        match = None
+        for old_offset in blocks.get(int(new_checksums[offset]), list()):
+            if strong_hash(old_data[old_offset:old_offset + block_size]) == digest:
+                match = old_offset
+                break
+        if match is None:
+            idx += 1
+            continue
+        literals += new_data[position:offset]
+        add_operation(-1, offset - position)
+        add_operation(match, block_size)
+        position = offset + block_size
+        idx = int(np.searchsorted(candidates, position))
+
+    literals += new_data[position:]
+    add_operation(-1, len(new_data) - position)
+    return operations, bytes(literals)
+
+
+def apply_delta(old_data, operations, literals):
+    """Rebuild the new version of a file from the old version and a delta from make_delta."""
+    output = bytearray()
+    literal_position = 0
+    for offset, length in operations:
+        if offset < 0:
+            output += literals[literal_position:literal_position + length]
+            literal_position += length
+        else:
+            output += old_data[offset:offset + length]
+    return bytes(output)
+
+
+def read_file(root_folder, relative_path):
+    """Read a file of a pack given its manifest path."""
+    with open(os.path.join(root_folder, *relative_path.split("/")), mode='rb') as file:
+        return file.read()
+
+
+def make_patch(old_manifest_path, new_manifest_path, patch_path, delta_min_size=DELTA_MIN_SIZE):
+    """Make an update patch from the old version of a pack to the new version.
+
+    inputs
+    old_manifest_path (str): manifest of the old version of the pack
+    new_manifest_path (str): manifest of the new version of the pack
+    patch_path (str): path of the zip archive to write
+    delta_min_size (int): modified files at least this large are stored as deltas
+
+    outputs
+    summary (dict): number of 'added', 'removed', 'replaced' and 'delta' files, the 'patch_size' and the 'full_size' of
+                    the new version of the pack in bytes
+    """
+    old_root, old_files = read_manifest(old_manifest_path)
+    new_root, new_files = read_manifest(new_manifest_path)
+    with open(new_manifest_path, mode='r') as manifest_file:
+        new_manifest_name = json.load(manifest_file)['manifest']
+    with open(old_manifest_path, mode='r') as manifest_file:
+        old_manifest_name = json.load(manifest_file)['manifest']
+
+    patch = {'version': PATCH_VERSION,
+             'old_manifest': old_manifest_name,
+             'new_manifest': new_manifest_name,
+             'old_files': old_files,
+             'new_files': new_files,
+             'removed': sorted(set(old_files) - set(new_files)),
+             'added': sorted(set(new_files) - set(old_files)),
+             'replaced': list(),
+             'delta': dict()}
+
+    with zipfile.ZipFile(patch_path, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for path in patch['added']:
+            archive.writestr("files/" + path, read_file(new_root, path))
+
+        for path in sorted(set(old_files).intersection(new_files)):
+            if old_files[path] == new_files[path]:
+                continue
+            new_data = read_file(new_root, path)
+            if new_files[path][0] >= delta_min_size:
+                operations, literals = make_delta(read_file(old_root, path), new_data)
+                if len(literals) < len(new_data) // 2:
+                    patch['delta'][path] = operations
+                    archive.writestr("deltas/" + path, literals)
+                    continue
+            patch['replaced'].append(path)
+            archive.writestr("files/" + path, new_data)
+
+        archive.writestr("patch.json", json.dumps(patch, indent=1))
+
+    return {'added': len(patch['added']),
+            'removed': len(patch['removed']),
+            'replaced': len(patch['replaced']),
+            'delta': len(patch['delta']),
+            'patch_size': os.path.getsize(patch_path),
+            'full_size': sum(size for size, _ in new_files.values())}
+
+
+def apply_patch(patch_path, manifest_path):
+    """Update an installed or assembled pack in place with a patch from make_patch.
+
+    Nothing is changed unless every file the patch removes or modifies matches the old version of the pack, and every
+    new file is written and checked before any of them is moved into place.
+
+    inputs
+    patch_path (str): path to the patch archive
+    manifest_path (str): manifest of the installed pack
+
+    outputs
+    num_changed (int): number of files that were added, removed or modified
+    """
+    root_folder, _ = read_manifest(manifest_path)
+    with zipfile.ZipFile(patch_path) as archive:
+        patch = json.loads(archive.read("patch.json"))
+        if patch.get('version') != PATCH_VERSION:
+            raise ValueError("{} is not a version {} pack patch".format(patch_path, PATCH_VERSION))
+
+        def full_path(path):
+            return os.path.join(root_folder, *path.split("/"))
+
+        # The installed files must be the ones the patch was made from.
+        changed = patch['removed'] + patch['replaced'] + list(patch['delta'])
+        wrong = [path for path in changed
+                 if os.path.isfile(full_path(path)) is False or hash_file(full_path(path)) != patch['old_files'][path]]
+        if len(wrong) > 0:
+            raise ValueError("The installed pack does not match the version this patch updates: " + ", ".join(wrong))
+
+        # Write every new file next to the file it replaces and check it.
+        new_paths = list()
+        try:
+            for path in patch['added'] + patch['replaced'] + list(patch['delta']):
+                if path in patch['delta']:
+                    data = apply_delta(read_file(root_folder, path), patch['delta'][path], archive.read("deltas/" + path))
+                else:
+                    data = archive.read("files/" + path)
+                temp_path = full_path(path) + PATCH_TEMP_SUFFIX
+                os.makedirs(os.path.dirname(temp_path), exist_ok=True)
+                with open(temp_path, mode='wb') as output:
+                    output.write(data)
+                new_paths.append(path)
+                if hash_file(temp_path) != patch['new_files'][path]:
+                    raise ValueError("{} does not match the new version after patching".format(path))
+        except (OSError, ValueError, KeyError):
+            for path in new_paths:
+                os.remove(full_path(path) + PATCH_TEMP_SUFFIX)
+            raise
+
+    for path in new_paths:
+        os.replace(full_path(path) + PATCH_TEMP_SUFFIX, full_path(path))
+    for path in patch['removed']:
+        os.remove(full_path(path))
+
+    new_manifest_path = full_path(patch['new_manifest'])
+    write_manifest(new_manifest_path, root_folder, patch['new_files'])
+    if os.path.normcase(new_manifest_path) != os.path.normcase(os.path.abspath(manifest_path)):
+        os.remove(manifest_path)
+    return len(new_paths) + len(patch['removed'])
@@ -0,0 +1,706 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Helpers for reading and checking YSFlight scenery files.
+
+FLD files start with FIELD and end with END. Embedded files (pictures, terrain meshes, surfaces and sub-fields) are
+stored in PCK blocks whose header gives the number of lines that belong to the embedded file. The embedded files are
+then placed with blocks such as PC2, TER, SRF and FLD that reference them by name (FIL), while RGN blocks define
+regions (runways, taxiways) and GOB blocks place ground objects. Each placement block is closed by END.
+
+YFS mission files reference the scenery with FIELDNAM, and the aircraft and ground objects with AIRPLANE and GROUNDOB
+followed by their IDENTIFY names.
+
+STP start position files list start positions, each starting with an N line holding its name followed by C lines with
+the initial conditions (POSITION, ATTITUDE, INITSPED, ...).
+"""
+
+
+import itertools
+import math
+from collections import Counter
+
+import numpy as np
+
+from YSF_DAT_Tools import LENGTH_UNITS, parse_dat_value, split_dat_tokens
+from YSF_Model_Tools import run_jobs
+from YSF_Source_Files import open_source
+
+
+# Placement blocks at the field level, and the statistic that each one counts towards.
+PLACEMENT_BLOCKS = {'PC2': 'pictures',
+                    'PLT': 'pictures',
+                    'TER': 'terrain meshes',
+                    'SRF': 'surfaces',
+                    'FLD': 'fields',
+                    'RGN': 'regions',
+                    'GOB': 'ground objects',
+                    'AOB': 'air objects'}
+
+# First line of an embedded file, the type it identifies and the line that must close it.
+PACKED_FILE_TYPES = {'PICT2': ['picture', 'ENDPICT'],
+                     'TERRMESH': ['terrain mesh', 'END'],
+                     'SURF': ['surface', 'E'],
+                     'FIELD': ['field', 'END']}
+
+# Largest number of distances between placements computed at once, and of close pairs joined at once.
+MAX_DISTANCE_CHUNK = 256 * 1024
+
+# YFS mission keywords that reference other objects by name, and the LST type that defines the name.
+MISSION_REFERENCE_KEYS = {'AIRPLANE': 'Aircraft',
+                          'GROUNDOB': 'Ground',
+                          'FIELDNAM': 'Scenery'}
+
+
+class FieldSummary:
+    """Statistics, placements and structural errors of an FLD file."""
+    def __init__(self, path=""):
+        self.path = path
+        self.name = ""
+        self.counts = {statistic: 0 for statistic in sorted(set(PLACEMENT_BLOCKS.values()))}
+        self.packed_files = dict()  # Embedded file name to type
+        self.ground_objects = list()  # [name, x, y, z, heading] in field coordinates
+        self.regions = list()  # [id, tag, [(x, z) for the 4 corners]] in field coordinates
+        self.errors = list()  # [line number, message]
+
+    def add_error(self, line_number, message):
+        self.errors.append([line_number, message])
+
+    def merge_placed_field(self, sub_field, position):
+        """Add the contents of a sub-field placed by an FLD block, moved by the placement's position and heading.
+
+        Pitch and bank of the placement are ignored, as sub-fields are placed flat.
+        """
+        for statistic, count in sub_field.counts.items():
+            self.counts[statistic] = self.counts.get(statistic, 0) + count
+        for name, x, y, z, heading in sub_field.ground_objects:
+            x, z = rotate_heading(x, z, position[3], position[0], position[2])
+            self.ground_objects.append([name, x, y + position[1], z, heading + position[3]])
+        for region_id, tag, corners in sub_field.regions:
+            self.regions.append([region_id, tag, [rotate_heading(x, z, position[3], position[0], position[2])
+                                                  for x, z in corners]])
+
+    def report(self):
+        """Single line summary of the statistics."""
+        counts = ", ".join("{} {}".format(count, statistic) for statistic, count in sorted(self.counts.items())
+                           if count > 0)
+        return "{}: {}".format(self.name or self.path, counts or "empty")
+
+
+def rotate_heading(x, z, heading, dx=0.0, dz=0.0):
+    """Rotate a point about the vertical axis by a heading in degrees, then move it by (dx, dz)."""
+    angle = math.radians(heading)
+    return (x * math.cos(angle) - z * math.sin(angle) + dx,
+            x * math.sin(angle) + z * math.cos(angle) + dz)
+
+
+def parse_fld_number(token):
+    """Convert an FLD value (ex: 10.00m or 90deg) to a float, ignoring the unit."""
+    return float(token.rstrip("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+
+
+def read_placement_block(lines, keyword, start_line, summary):
+    """Read a placement block up to its END line.
+
+    outputs
+    block (dict): block values (FIL, POS, NAM, ARE, ID, TAG) that were found
+    """
+    block = {'keyword': keyword, 'line': start_line}
+    for line_number, line in lines:
+        tokens = split_dat_tokens(line, comments=False)
+        if len(tokens) == 0:
+            continue
+        key = tokens[0].upper()
+        if key == 'END':
+            return block
+        if key in ('POS', 'ARE'):
+            try:
+                block[key] = [parse_fld_number(i) for i in tokens[1:]]
+            except ValueError:
+                summary.add_error(line_number, "Could not read the {} values of the {} block.".format(key, keyword))
+        elif key in ('FIL', 'NAM', 'ID', 'TAG') and len(tokens) > 1:
+            block[key] = tokens[1]
+    summary.add_error(start_line, "{} block is not closed by END.".format(keyword))
+    return block
+
+
+def skip_packed_file(lines, name, count, start_line, summary):
+    """Skip the lines of an embedded file that is not a field, checking that it is complete.
+
+    outputs
+    file_type (str): type of the embedded file
+    """
+    first, last = None, None
+    consumed = 0
+    for _, line in itertools.islice(lines, count):
+        consumed += 1
+        stripped = line.strip()
+        if stripped:
+            if first is None:
+                first = stripped.split()[0].upper()
+            last = stripped.split()[0].upper()
+
+    if consumed < count:
+        summary.add_error(start_line, "PCK {} expects {} lines but the file ends after {}.".format(name, count, consumed))
+    if first not in PACKED_FILE_TYPES:
+        return 'unknown'
+
+    file_type, closing = PACKED_FILE_TYPES[first]
+    if last != closing and consumed == count:
+        summary.add_error(start_line, "Embedded {} {} does not end with {}. Check the PCK line count.".format(
+            file_type, name, closing))
+    return file_type
+
+
+def parse_field(lines, summary, nested=False):
+    """Walk the blocks of a FIELD, adding statistics, placements and errors to summary.
+
+    Lines are read one at a time from the iterator, so only the placements are kept in memory.
+
+    inputs
+    lines (iterator): (line number, line) pairs, positioned after the FIELD line
+    summary (FieldSummary): summary to fill in
+    nested (bool): True when parsing a sub-field embedded in a PCK block
+    """
+    sub_fields = dict()
+    for line_number, line in lines:
+        tokens = split_dat_tokens(line, comments=False)
+        if len(tokens) == 0:
+            continue
+        key = tokens[0].upper()
+
+        if key == 'END':
+            return
+        elif key == 'FLDNAME' and len(tokens) > 1:
+            summary.name = tokens[1]
+        elif key == 'PCK':
+            if len(tokens) < 3 or tokens[-1].isdigit() is False:
+                summary.add_error(line_number, "Could not read PCK line: {}".format(line.strip()))
+                continue
+            name, count = tokens[1], int(tokens[-1])
+            if name in summary.packed_files:
+                summary.add_error(line_number, "Embedded file {} is defined more than once.".format(name))
+
+            # Peek at the first non-blank line of the embedded file to determine if it is a sub-field.
+            packed_lines = itertools.islice(lines, count)
+            first = None
+            skipped = 0
+            for first in packed_lines:
+                skipped += 1
+                if first[1].strip():
+                    break
+            if first is not None and first[1].strip().upper() == 'FIELD':
+                sub_field = FieldSummary(summary.path)
+                parse_field(packed_lines, sub_field, nested=True)
+                for extra_line_number, extra_line in packed_lines:
+                    if extra_line.strip():
+                        sub_field.add_error(extra_line_number, "Line after the END of the embedded field. Check the "
+                                                               "PCK line count.")
+                        break
+                for _ in packed_lines:
+                    pass
+                sub_fields[name] = sub_field
+                summary.packed_files[name] = 'field'
+                for error in sub_field.errors:
+                    summary.add_error(error[0] or line_number, "In embedded field {}: {}".format(name, error[1]))
+            else:
+                # Put the peeked line back in front of the rest of the embedded file.
+                rest = itertools.chain([first] if first is not None else [], lines)
+                summary.packed_files[name] = skip_packed_file(rest, name, count - skipped + (first is not None),
+                                                              line_number, summary)
+        elif key in PLACEMENT_BLOCKS and len(tokens) == 1:
+            block = read_placement_block(lines, key, line_number, summary)
+            summary.counts[PLACEMENT_BLOCKS[key]] += 1
+            position = block.get('POS', [0.0, 0.0, 0.0])
+            if len(position) < 3:
+                summary.add_error(line_number, "{} block POS needs at least 3 values.".format(key))
+                position = [0.0, 0.0, 0.0]
+            position = (list(position) + [0.0, 0.0, 0.0])[:6]  # Missing attitude angles default to 0.
+
+            if 'FIL' in block and block['FIL'] not in summary.packed_files:
+                summary.add_error(line_number, "{} block references {} which is not embedded in the field.".format(
+                    key, block['FIL']))
+            if key in ('PC2', 'PLT', 'TER', 'SRF', 'FLD') and 'FIL' not in block:
+                summary.add_error(line_number, "{} block does not reference an embedded file (FIL).".format(key))
+
+            if key == 'FLD' and block.get('FIL') in sub_fields:
+                summary.merge_placed_field(sub_fields[block['FIL']], position)
+            elif key == 'GOB':
+                if 'NAM' not in block:
+                    summary.add_error(line_number, "GOB block does not name a ground object (NAM).")
+                summary.ground_objects.append([block.get('NAM', ""), position[0], position[1], position[2],
+                                               position[3]])
+            elif key == 'RGN':
+                area = block.get('ARE', [])
+                if len(area) < 4:
+                    summary.add_error(line_number, "RGN block needs an ARE line with 4 values.")
+                else:
+                    x0, z0, x1, z1 = area[:4]
+                    corners = [(x0, z0), (x1, z0), (x1, z1), (x0, z1)]
+                    summary.regions.append([block.get('ID', ""), block.get('TAG', ""),
+                                            [rotate_heading(x, z, position[3], position[0], position[2])
+                                             for x, z in corners]])
+
+    summary.add_error(0, "{} is not closed by END.".format("Embedded FIELD" if nested else "FIELD"))
+
+
+def read_fld_file(fld_file_path):
+    """Read an FLD file and check its structure.
+
+    inputs
+    fld_file_path (str): path to where the fld file is
+
+    outputs
+    summary (FieldSummary): statistics, placements and errors of the file
+    """
+    summary = FieldSummary(fld_file_path)
+    with open_source(fld_file_path, mode='r', errors='ignore') as fld_file:
+        lines = enumerate(fld_file, start=1)
+        for line_number, line in lines:
+            if line.strip():
+                if line.strip().upper() != 'FIELD':
+                    summary.add_error(line_number, "File does not start with FIELD.")
+                    return summary
+                break
+        else:
+            summary.add_error(0, "File is empty.")
+            return summary
+
+        parse_field(lines, summary)
+
+        for line_number, line in lines:
+            if line.strip():
+                summary.add_error(line_number, "Unexpected line after the end of the FIELD: {}".format(line.strip()))
+                break
+    return summary
+
+
+def read_yfs_references(yfs_file_path):
+    """Read the aircraft, ground object and scenery names referenced by a YFS mission file.
+
+    inputs
+    yfs_file_path (str): path to where the yfs file is
+
+    outputs
+    references (list): [category, name, line number] for each reference, category being an LST type
+    """
+    references = list()
+    with open_source(yfs_file_path, mode='r', errors='ignore') as yfs_file:
+        for line_number, line in enumerate(yfs_file, start=1):
+            tokens = split_dat_tokens(line, comments=False)
+            if len(tokens) > 1 and tokens[0].upper() in MISSION_REFERENCE_KEYS:
+                references.append([MISSION_REFERENCE_KEYS[tokens[0].upper()], tokens[1], line_number])
+    return references
+
+
+class StartPositions:
+    """Start positions of an STP file, stored as arrays so that they can be checked in bulk."""
+    def __init__(self, path=""):
+        self.path = path
+        self.names = list()
+        self.positions = np.zeros((0, 3))  # x, y, z in meters
+        self.speeds = np.zeros(0)  # Initial speed, in the units used by the file
+        self.line_numbers = np.zeros(0, dtype=int)  # Line of the N line of each start position
+        self.errors = list()  # [line number, message]
+
+
+def read_stp_file(stp_file_path):
+    """Read the names, positions and initial speeds of the start positions in an STP file.
+
+    inputs
+    stp_file_path (str): path to where the stp file is
+
+    outputs
+    start_positions (StartPositions): start positions and any lines that could not be read
+    """
+    start_positions = StartPositions(stp_file_path)
+    names, positions, speeds, line_numbers = list(), list(), list(), list()
+    with open_source(stp_file_path, mode='r', errors='ignore') as stp_file:
+        for line_number, line in enumerate(stp_file, start=1):
+            tokens = split_dat_tokens(line, comments=False)
+            if len(tokens) == 0:
+                continue
+            key = tokens[0].upper()
+            if key == 'N':
+                names.append(" ".join(tokens[1:]))
+                positions.append([np.nan, np.nan, np.nan])
+                speeds.append(0.0)
+                line_numbers.append(line_number)
+            elif key == 'C' and len(tokens) > 1 and len(names) > 0:
+                try:
+                    if tokens[1].upper() == 'POSITION' and len(tokens) >= 5:
+                        positions[-1] = [parse_dat_value(token, LENGTH_UNITS) for token in tokens[2:5]]
+                    elif tokens[1].upper() == 'INITSPED' and len(tokens) >= 3:
+                        speeds[-1] = parse_dat_value(tokens[2])
+                except ValueError as error:
+                    start_positions.errors.append([line_number, str(error)])
+
+    start_positions.names = names
+    if len(names) > 0:
+        start_positions.positions = np.array(positions, dtype=float)
+        start_positions.speeds = np.array(speeds, dtype=float)
+        start_positions.line_numbers = np.array(line_numbers, dtype=int)
+    return start_positions
+
+
+def points_in_regions(points, regions):
+    """Test which points lie inside at least one region.
+
+    inputs
+    points (np.ndarray): (n, 2) x and z coordinates
+    regions (list): [id, tag, corners] regions from a FieldSummary
+
+    outputs
+    inside (np.ndarray): (n,) bool array
+    """
+    if len(regions) == 0 or len(points) == 0:
+        return np.zeros(len(points), dtype=bool)
+    corners = np.array([region[2] for region in regions], dtype=float)  # (r, 4, 2)
+    edges = np.roll(corners, -1, axis=1) - corners
+    relative = points[:, None, None, :] - corners[None]  # (n, r, 4, 2)
+    cross = edges[None, :, :, 0] * relative[..., 1] - edges[None, :, :, 1] * relative[..., 0]
+    inside = np.all(cross >= -1e-6, axis=2) | np.all(cross <= 1e-6, axis=2)  # Either winding of the corners
+    return np.any(inside, axis=1)
+
+
+class PlacementGrid:
+    """Uniform grid over the horizontal (x, z) plane for finding nearby placements without comparing every pair.
+
+    inputs
+    points (np.ndarray): (n, 3) x, y, z positions
+    cell_size (float): width of the grid cells in meters
+    """
+    def __init__(self, points, cell_size):
+        self.points = np.asarray(points, dtype=float).reshape(-1, 3)
+        self.cell_size = float(cell_size)
+        self.cells = dict()  # (cell x, cell z) to array of point indices
+        if len(self.points) == 0:
+            return
+        keys = np.floor(self.points[:, [0, 2]] / self.cell_size).astype(np.int64)
+        unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+        order = np.argsort(inverse.ravel(), kind='stable')
+        splits = np.cumsum(np.bincount(inverse.ravel(), minlength=len(unique)))[:-1]
+        for key, indices in zip(unique, np.split(order, splits)):
+            self.cells[(int(key[0]), int(key[1]))] = indices
+
+    def query(self, x_min, z_min, x_max, z_max):
+        """Return the sorted indices of the points inside a rectangle of the x-z plane."""
+        found = list()
+        cx_min, cz_min = int(np.floor(x_min / self.cell_size)), int(np.floor(z_min / self.cell_size))
+        cx_max, cz_max = int(np.floor(x_max / self.cell_size)), int(np.floor(z_max / self.cell_size))
+        if (cx_max - cx_min + 1) * (cz_max - cz_min + 1) > len(self.cells):
+            candidates = list(self.cells.items())  # Rectangle spans more cells than are occupied.
+        else:
+            candidates = [(key, self.cells[key]) for key in itertools.product(range(cx_min, cx_max + 1),
+                                                                             range(cz_min, cz_max + 1))
+                          if key in self.cells]
+        for key, indices in candidates:
+            if cx_min <= key[0] <= cx_max and cz_min <= key[1] <= cz_max:
+                x, z = self.points[indices, 0], self.points[indices, 2]
+                found.append(indices[(x >= x_min) & (x <= x_max) & (z >= z_min) & (z <= z_max)])
+        if len(found) == 0:
+            return np.zeros(0, dtype=int)
+        return np.sort(np.concatenate(found))
+
+    def iter_close_pairs(self, distance, max_chunk=MAX_DISTANCE_CHUNK):
+        """Find the pairs of points closer than distance to each other, only comparing points in neighbouring cells.
+
+        Cells are compared a few rows at a time, so at most max_chunk distances are held in memory even when many
+        points share a cell.
+
+        outputs
+        pairs (iterator): (p, 2) index arrays, not sorted, each pair found once
+        """
+        reach = int(np.ceil(distance / self.cell_size))
+        offsets = [(dx, dz) for dx in range(-reach, reach + 1) for dz in range(-reach, reach + 1) if (dx, dz) > (0, 0)]
+        for (cx, cz), indices in self.cells.items():
+            # Pairs within the cell, then with the neighbouring cells. Each neighbouring pair of cells is visited once.
+            others = [[indices, True]] + [[self.cells[(cx + dx, cz + dz)], False] for dx, dz in offsets
+                                          if (cx + dx, cz + dz) in self.cells]
+            for other, same_cell in others:
+                step = max(1, max_chunk // len(other))
+                for start in range(0, len(indices), step):
+                    rows = indices[start:start + step]
+                    squared = np.sum((self.points[rows][:, None, :] - self.points[other][None, :, :]) ** 2, axis=2)
+                    close = squared < distance ** 2
+                    if same_cell:
+                        close &= np.arange(len(other))[None, :] > np.arange(start, start + len(rows))[:, None]
+                    row_idx, column_idx = np.nonzero(close)
+                    if len(row_idx) > 0:
+                        yield np.column_stack([rows[row_idx], other[column_idx]])
+
+    def close_pairs(self, distance):
+        """Find the pairs of points closer than distance to each other.
+
+        outputs
+        pairs (np.ndarray): (p, 2) indices with the first index lower than the second
+        """
+        pairs = list(self.iter_close_pairs(distance))
+        if len(pairs) == 0:
+            return np.zeros((0, 2), dtype=int)
+        pairs = np.sort(np.concatenate(pairs), axis=1)
+        return pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+
+
+def find_close_pairs(points, distance):
+    """Find the pairs of points that are closer than distance to each other.
+
+    outputs
+    pairs (np.ndarray): (p, 2) indices with the first index lower than the second
+    """
+    if len(points) == 0 or distance <= 0:
+        return np.zeros((0, 2), dtype=int)
+    return PlacementGrid(points, distance).close_pairs(distance)
+
+
+def find_roots(parents):
+    """Point every entry of a union-find parent array straight at its root, in place, and return the array."""
+    while True:
+        grandparents = parents[parents]
+        if np.array_equal(grandparents, parents):
+            return parents
+        parents[:] = grandparents
+
+
+def group_close_points(points, distance):
+    """Group points that are joined by chains of points closer than distance to each other.
+
+    Points at the same position, to the centimetre, are merged first, so stacked copies of an object cost nothing. The
+    close pairs of the remaining positions are joined with a union-find that works on whole arrays of pairs at a time.
+
+    inputs
+    points (np.ndarray): (n, 3) x, y, z positions
+    distance (float): points closer than this are in the same group
+
+    outputs
+    labels (np.ndarray): (n,) lowest merged position index of the group of each point
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 3)
+    if len(points) == 0:
+        return np.zeros(0, dtype=int)
+    positions, inverse = np.unique(np.round(points, 2), axis=0, return_inverse=True)
+    parents = np.arange(len(positions))
+
+    def join(pairs):
+        pairs = np.concatenate(pairs)
+        while True:
+            find_roots(parents)
+            roots_a, roots_b = parents[pairs[:, 0]], parents[pairs[:, 1]]
+            differ = roots_a != roots_b
+            if not np.any(differ):
+                return
+            # Hook the higher root of every pair under the lower one. Only one hook per root wins in each pass.
+            np.minimum.at(parents, np.maximum(roots_a[differ], roots_b[differ]),
+                          np.minimum(roots_a[differ], roots_b[differ]))
+
+    if distance > 0 and len(positions) > 1:
+        pending, num_pending = list(), 0
+        for pairs in PlacementGrid(positions, distance).iter_close_pairs(distance):
+            pending.append(pairs)
+            num_pending += len(pairs)
+            if num_pending >= MAX_DISTANCE_CHUNK:
+                join(pending)
+                pending, num_pending = list(), 0
+        if len(pending) > 0:
+            join(pending)
+    return find_roots(parents)[inverse.ravel()]
+
+
+def check_placement_overlaps(summary, distance=1.0, max_issues=50):
+    """Find ground objects that are placed on top of each other in an FLD file.
+
+    Placements closer than distance are grouped, and each group is reported once, so thousands of stacked copies of an
+    object give a single line.
+
+    inputs
+    summary (FieldSummary): summary of the fld file
+    distance (float): placements closer than this, in meters, overlap
+    max_issues (int): largest number of groups to describe, the rest are counted on a last line
+
+    outputs
+    issues (list): message for each group of overlapping placements, groups with the same object more than once first
+    """
+    placements = [placement for placement in summary.ground_objects if placement[0]]  # Unnamed ones are errors
+    if len(placements) == 0:
+        return list()
+    positions = np.array([placement[1:4] for placement in placements], dtype=float)
+    labels = group_close_points(positions, distance)
+
+    groups = dict()
+    for idx, label in enumerate(labels):
+        groups.setdefault(label, list()).append(idx)
+
+    duplicates, overlaps = list(), list()
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        counts = Counter(placements[idx][0].upper() for idx in members)
+        names = {placements[idx][0].upper(): placements[idx][0] for idx in reversed(members)}  # First spelling
+        location = "({:.1f}, {:.1f}, {:.1f})".format(*positions[members[0]])
+        if len(counts) == 1:
+            duplicates.append("{} copies of ground object {} are stacked at {}.".format(
+                len(members), names[next(iter(counts))], location))
+        else:
+            text = ", ".join("{} ({})".format(names[name], count) if count > 1 else names[name]
+                             for name, count in sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+            issue = "Ground objects {} overlap at {}.".format(text, location)
+            (duplicates if max(counts.values()) > 1 else overlaps).append(issue)
+
+    issues = duplicates + overlaps
+    if len(issues) > max_issues:
+        issues = issues[:max_issues] + ["... and {} more groups of overlapping ground objects.".format(
+            len(issues) - max_issues)]
+    return issues
+
+
+def check_start_positions(start_positions, regions, overlap_distance=5.0, ground_speed=0.5):
+    """Check the start positions of an STP file against the regions of its FLD file.
+
+    Start positions with an initial speed at or below ground_speed are treated as on the ground and must be inside a
+    region (runway, taxiway, ...) when the field defines any regions.
+
+    This is the only placement check. Airborne start positions, and ground start positions on fields without regions,
+    are not checked against the extent of the field: FLD files do not state their extent, and the size of the embedded
+    pictures and terrain meshes is not read, so it cannot be worked out reliably.
+
+    inputs
+    start_positions (StartPositions): start positions read from the stp file
+    regions (list): [id, tag, corners] regions from the FieldSummary of the fld file
+    overlap_distance (float): start positions closer than this, in meters, overlap
+    ground_speed (float): highest initial speed of a start position on the ground
+
+    outputs
+    issues (list): [line number, message] for each problem found
+    """
+    issues = list()
+    names = start_positions.names
+    positions = start_positions.positions
+    lines = start_positions.line_numbers
+
+    # Duplicate names, YSFlight only offers the first start position with a given name.
+    seen = set()
+    for idx, name in enumerate(names):
+        if name.upper() in seen:
+            issues.append([int(lines[idx]), "Start position {} is defined more than once.".format(name)])
+        seen.add(name.upper())
+
+    missing = np.any(np.isnan(positions), axis=1)
+    for idx in np.nonzero(missing)[0]:
+        issues.append([int(lines[idx]), "Start position {} has no POSITION.".format(names[idx])])
+    valid = np.nonzero(~missing)[0]
+
+    # Ground start positions outside of every region.
+    on_ground = valid[start_positions.speeds[valid] <= ground_speed]
+    if len(regions) > 0 and len(on_ground) > 0:
+        inside = points_in_regions(positions[on_ground][:, [0, 2]], regions)
+        for idx in on_ground[~inside]:
+            issues.append([int(lines[idx]), "Start position {} is on the ground but outside of every region of the "
+                                            "field.".format(names[idx])])
+
+    # Start positions on top of each other.
+    for i, j in find_close_pairs(positions[valid], overlap_distance):
+        issues.append([int(lines[valid[j]]), "Start position {} is within {}m of {}.".format(
+            names[valid[j]], overlap_distance, names[valid[i]])])
+
+    return sorted(issues)
+
+
+def read_scenery_file(file_type, path):
+    """Read an FLD, YFS or STP file with the reader for its file type ('fld', 'yfs' or 'stp')."""
+    return {'fld': read_fld_file, 'yfs': read_yfs_references, 'stp': read_stp_file}[file_type](path)
+
+
+def read_scenery_files(fld_file_paths, yfs_file_paths, stp_file_paths=(), max_workers=None):
+    """Read FLD, YFS and STP files in a single pool of worker processes.
+
+    inputs
+    fld_file_paths (list): paths to fld files
+    yfs_file_paths (list): paths to yfs files
+    stp_file_paths (list): paths to stp files
+    max_workers (int): number of worker processes. Defaults to the number of processors.
+
+    outputs
+    summaries (list): FieldSummary for each fld file, in the same order. Files that cannot be read get a summary with
+                      the error.
+    missions (list): [path, references or Exception] for each yfs file, in the same order.
+    start_positions (list): StartPositions for each stp file, in the same order. Files that cannot be read have the
+                            error in their errors.
+    """
+    jobs = [['fld', path] for path in fld_file_paths] + [['yfs', path] for path in yfs_file_paths] + \
+           [['stp', path] for path in stp_file_paths]
+    summaries = list()
+    missions = list()
+    start_positions = list()
+    for file_type, path, result in run_jobs(read_scenery_file, jobs, max_workers=max_workers):
+        if file_type == 'yfs':
+            missions.append([path, result])
+        elif isinstance(result, Exception) and file_type == 'fld':
+            summaries.append(FieldSummary(path))
+            summaries[-1].add_error(0, "Could not read file: {}".format(result))
+        elif isinstance(result, Exception):
+            start_positions.append(StartPositions(path))
+            start_positions[-1].errors.append([0, "Could not read file: {}".format(result)])
+        else:
+            (summaries if file_type == 'fld' else start_positions).append(result)
+    return summaries, missions, start_positions
+
+
+def reference_key(name):
+    """Return the form of a name that references are matched by, ignoring case and surrounding spaces."""
+    return name.strip().upper()
+
+
+class ReferenceIndex:
+    """Names referenced by scenery and mission files, mapped to the pack entries that define them.
+
+    Names are compared without regard to case, as YSFlight does.
+
+    inputs
+    definitions (dict): LST type to {name: entry key} for the names defined by the pack
+    known_names (dict): LST type to a set of names available outside of the pack (ex: the base game)
+    """
+    def __init__(self, definitions, known_names=None):
+        self.definitions = {category: {reference_key(name): key for name, key in names.items()}
+                            for category, names in definitions.items()}
+        self.known_names = {category: {reference_key(name) for name in names}
+                            for category, names in (known_names or dict()).items()}
+        self.references = {category: dict() for category in self.definitions}
+
+    def add_reference(self, category, name, source):
+        """Record that source references name."""
+        self.references.setdefault(category, dict()).setdefault(reference_key(name), list()).append(source)
+
+    def add_field_summary(self, summary, source):
+        """Record the ground objects placed by an FLD file."""
+        for placement in summary.ground_objects:
+            if placement[0]:
+                self.add_reference('Ground', placement[0], source)
+
+    def add_mission_references(self, references, source):
+        """Record the references read from a YFS file by read_yfs_references."""
+        for category, name, line_number in references:
+            self.add_reference(category, name, "{} line {}".format(source, line_number))
+
+    def resolve(self, category, name):
+        """Return the key of the pack entry that defines name, or None."""
+        return self.definitions.get(category, dict()).get(reference_key(name))
+
+    def dangling(self):
+        """List the referenced names that are neither defined by the pack nor known.
+
+        outputs
+        dangling (list): [category, name, sources] sorted by category and name
+        """
+        dangling = list()
+        for category, names in sorted(self.references.items()):
+            defined = self.definitions.get(category, dict())
+            known = self.known_names.get(category, set())
+            for name, sources in sorted(names.items()):
+                if name not in defined and name not in known:
+                    dangling.append([category, name, sources])
+        return dangling
+
+    def unused(self, category):
+        """List the keys of the pack entries whose names are never referenced."""
+        referenced = self.references.get(category, dict())
+        return sorted(key for name, key in self.definitions.get(category, dict()).items() if name not in referenced)
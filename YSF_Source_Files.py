@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Helpers for reading source files that are either on disk or inside zip archives.
+
+Files inside a zip archive are referenced with the path of the archive followed by "!/" and the path of the file in the
+archive (ex: C:/Mods/MiG-23.zip!/MiG-23/MiG-23MF.dnm). All functions accept both kinds of paths, so that archives sent
+by modders can be used as they are instead of being extracted first.
+"""
+
+
+import io
+import os
+import shutil
+import zipfile
+
+
+# Separator between the path of an archive and the path of a file inside of it.
+ARCHIVE_SEPARATOR = "!/"
+
+# Archive path to [modification time, size, {member name: ZipInfo}], so that the member list of an archive is only read
+# again when the archive changes.
+_archive_members = dict()
+
+
+def split_archive_path(path):
+    """Split a source path into the archive path and the member path.
+
+    outputs
+    archive_path (str): path to the zip archive, or the path unchanged if it does not point inside an archive
+    member (str): path of the file inside the archive, or None
+    """
+    idx = path.lower().find(".zip" + ARCHIVE_SEPARATOR)
+    if idx < 0:
+        return path, None
+    idx += len(".zip")
+    return path[:idx], path[idx + len(ARCHIVE_SEPARATOR):]
+
+
+def make_archive_path(archive_path, member):
+    """Build the source path of a file inside an archive."""
+    return "{}{}{}".format(archive_path, ARCHIVE_SEPARATOR, member)
+
+
+def is_archive(path):
+    """Return True if path is a zip archive on disk."""
+    return path.lower().endswith(".zip") and os.path.isfile(path) and zipfile.is_zipfile(path)
+
+
+def get_archive_members(archive_path):
+    """Return {member name: ZipInfo} for the files in an archive, reading the archive's directory only if it changed."""
+    stat = os.stat(archive_path)
+    cached = _archive_members.get(archive_path)
+    if cached is None or cached[0] != stat.st_mtime_ns or cached[1] != stat.st_size:
+        with zipfile.ZipFile(archive_path) as archive:
+            members = {info.filename: info for info in archive.infolist() if info.is_dir() is False}
+        cached = [stat.st_mtime_ns, stat.st_size, members]
+        _archive_members[archive_path] = cached
+    return cached[2]
+
+
+def list_archive_members(archive_path, extensions=None):
+    """List the files in an archive.
+
+    inputs
+    archive_path (str): path to the zip archive
+    extensions (list): lower case extensions without the dot (ex: ['dnm', 'srf']) to keep. All files if None or empty.
+
+    outputs
+    members (list): sorted paths of the files inside the archive
+    """
+    members = get_archive_members(archive_path)
+    if extensions:
+        suffixes = tuple("." + extension.lower() for extension in extensions)
+        return sorted(name for name in members if name.lower().endswith(suffixes))
+    return sorted(members)
+
+
+def source_exists(path):
+    """Return True if the source file exists, on disk or in its archive."""
+    if not path:
+        return False
+    archive_path, member = split_archive_path(path)
+    if member is None:
+        return os.path.isfile(path)
+    try:
+        return member in get_archive_members(archive_path)
+    except (OSError, zipfile.BadZipFile):
+        return False
+
+
+def source_size(path):
+    """Return the uncompressed size of a source file in bytes."""
+    archive_path, member = split_archive_path(path)
+    if member is None:
+        return os.path.getsize(path)
+    try:
+        return get_archive_members(archive_path)[member].file_size
+    except KeyError:
+        raise FileNotFoundError("{} is not in {}".format(member, archive_path))
+
+
+def source_signature(path):
+    """Return [modification time in ns, size in bytes] of a source file, or None if it cannot be found.
+
+    Files inside an archive use the modification time of the archive, so they count as changed when the archive does.
+    """
+    archive_path, member = split_archive_path(path)
+    try:
+        if member is None:
+            stat = os.stat(path)
+            return [stat.st_mtime_ns, stat.st_size]
+        return [os.stat(archive_path).st_mtime_ns, get_archive_members(archive_path)[member].file_size]
+    except (OSError, KeyError, zipfile.BadZipFile):
+        return None
+
+
+def open_source(path, mode='r', encoding=None, errors=None, newline=None):
+    """Open a source file for reading, on disk or straight from its archive without extracting it.
+
+    inputs
+    path (str): path to the source file
+    mode (str): 'r' for text or 'rb' for binary
+    encoding, errors, newline: as for open() in text mode
+
+    outputs
+    file: readable file object
+    """
+    if mode not in ('r', 'rb'):
+        raise ValueError("Source files can only be opened for reading, not with mode '{}'".format(mode))
+    archive_path, member = split_archive_path(path)
+    if member is None:
+        if mode == 'rb':
+            return open(path, mode='rb')
+        return open(path, mode='r', encoding=encoding, errors=errors, newline=newline)
+
+    # The archive's file handle stays open until the member is closed, even after the ZipFile is closed.
+    with zipfile.ZipFile(archive_path) as archive:
+        try:
+            member_file = archive.open(member)
+        except KeyError:
+            raise FileNotFoundError("{} is not in {}".format(member, archive_path))
+    if mode == 'rb':
+        return member_file
+    return io.TextIOWrapper(member_file, encoding=encoding, errors=errors, newline=newline)
+
+
+def copy_source(source_path, output_path, chunk_size=1024 * 1024):
+    """Copy a source file to a file on disk, streaming archive members straight into the output."""
+    archive_path, member = split_archive_path(source_path)
+    if member is None:
+        shutil.copy(source_path, output_path)
+        return
+    with open_source(source_path, mode='rb') as source, open(output_path, mode='wb') as output:
+        shutil.copyfileobj(source, output, chunk_size)
+
+
+def source_directory(path):
+    """Return a folder on disk near the source file, where files generated from it can be written."""
+    archive_path, member = split_archive_path(path)
+    return os.path.dirname(archive_path)